@@ -0,0 +1,188 @@
+"""Background sensor bring-up and acquisition
+
+Nothing touches the GPIO until start(). A bring-up thread then loads the
+backend, opens the gpiochip and brings each sensor up, retrying with
+exponential backoff, while the scheduler thread reads the sensors that
+are already up. Only the chip handle and lines opened here are released
+on close().
+"""
+import concurrent.futures
+import logging
+import threading
+
+from backend import load_backend
+from metrics import REGISTRY, Gauge
+from retry import HALF_OPEN, OPEN
+from scheduler import Scheduler
+from sensor import DHT11
+from store import LatestStore
+
+log = logging.getLogger(__name__)
+
+# Readiness states, in the order they are normally reached
+STARTING = 'starting'         # Backend and gpiochip not open yet
+WARMING_UP = 'warming_up'     # Sensors coming up, no reading yet
+READY = 'ready'               # At least one reading in the store
+STOPPED = 'stopped'
+
+# dht_breaker_state gauge values
+BREAKER_LEVELS = {HALF_OPEN: 1, OPEN: 2}
+
+
+class Acquisition:
+    """Brings sensors on pins up lazily and keeps them read
+
+    gpio is a GPIO backend or None for load_backend(). Failed bring-up
+    attempts are retried after retry_delay seconds, doubling up to
+    max_retry_delay.
+    """
+
+    def __init__(self, pins, on_result=None, store=None, filters=None, gpio=None,
+                 sensor_class=DHT11, retry_delay=0.5, max_retry_delay=30.0, alerts=None):
+        self.pins = list(pins)
+        self.gpio = gpio
+        self.sensor_class = sensor_class
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.store = store if store is not None else LatestStore()
+        self.scheduler = Scheduler([], on_result, self.store, filters, alerts=alerts)
+        self.chip = None
+        # pin -> sensor once up; replaced on change, read without locks
+        self.sensors = {}
+        # pin -> (attempts, last error) while not up
+        self.pending = {pin: (0, None) for pin in self.pins}
+        self.error = None
+        self.stopped = False
+        self._stop = threading.Event()
+        self._threads = []
+
+        # Gauges computed when the metrics are rendered
+        REGISTRY.register(Gauge(
+            'dht_reading_age_seconds', 'Seconds since the last good reading', ('sensor',),
+            lambda: {(str(pin),): s.age() for pin, s in self.store.snapshots().items()}))
+        REGISTRY.register(Gauge(
+            'dht_sample_rate', 'Start pulses per second reached', ('sensor',),
+            lambda: {(sensor.label,): sensor.sample_rate for sensor in self.sensors.values()}))
+        retry = self.scheduler.retry
+        REGISTRY.register(Gauge(
+            'dht_effective_sample_rate', 'Good readings per second over the recent reads', ('sensor',),
+            lambda: {(str(pin),): p.effective_rate() for pin, p in retry.policies.items()}))
+        REGISTRY.register(Gauge(
+            'dht_target_sample_rate', 'Readings per second at the minimum interval', ('sensor',),
+            lambda: {(str(pin),): p.target_rate for pin, p in retry.policies.items()}))
+        REGISTRY.register(Gauge(
+            'dht_breaker_state', 'Circuit breaker: 0 closed, 1 half open (probe due), 2 open',
+            ('sensor',),
+            lambda: {(str(pin),): BREAKER_LEVELS.get(p.state, 0) for pin, p in retry.policies.items()}))
+
+    def start(self):
+        """Start the bring-up and scheduler threads; returns at once"""
+        for target, name in ((self._bring_up, 'bring-up'), (self.scheduler.run, 'sensor')):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _open(self):
+        if self.gpio is None:
+            self.gpio = load_backend()
+        if self.chip is None:
+            self.chip = self.gpio.gpiochip_open(0)
+
+    def _bring_up(self):
+        delay = self.retry_delay
+        while self.pending and not self._stop.is_set():
+            try:
+                self._open()
+                self.error = None
+            except Exception as e:
+                self.error = f"GPIO unavailable: {e}"
+                log.warning("%s; retrying in %.1fs", self.error, delay)
+            else:
+                for pin in list(self.pending):
+                    self._bring_up_sensor(pin)
+                    if self._stop.is_set():
+                        return
+                if not self.pending:
+                    return
+                log.warning("GPIO%s not up; retrying in %.1fs",
+                            ', GPIO'.join(map(str, self.pending)), delay)
+            if self._stop.wait(delay):
+                return
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def _bring_up_sensor(self, pin):
+        attempts, _ = self.pending[pin]
+        try:
+            sensor = self.sensor_class(pin=pin, gpio=self.gpio, h=self.chip)
+        except Exception as e:
+            self.pending[pin] = (attempts + 1, str(e))
+            return
+        sensors = dict(self.sensors)
+        sensors[pin] = sensor
+        self.sensors = sensors
+        del self.pending[pin]
+        self.scheduler.add(sensor)
+        log.info("Sensor on GPIO%d up after %d failed attempts", pin, attempts)
+
+    @property
+    def state(self):
+        if self.stopped:
+            return STOPPED
+        if self.chip is None:
+            return STARTING
+        if any(s.has_reading for s in self.store.snapshots().values()):
+            return READY
+        return WARMING_UP
+
+    def status(self):
+        """JSON-ready readiness report"""
+        sensors = {str(pin): {'state': 'up'} for pin in self.sensors}
+        for pin, (attempts, error) in list(self.pending.items()):
+            sensors[str(pin)] = {'state': 'pending', 'attempts': attempts, 'error': error}
+        return {'state': self.state, 'error': self.error, 'sensors': sensors}
+
+    def details(self):
+        """JSON-ready bring-up status, last read timing, filter counts, breaker and alert states"""
+        filters = self.scheduler.filters
+        alerts = self.scheduler.alerts
+        return {
+            'alerts': alerts.state if alerts is not None else {'seq': 0, 'alerts': []},
+            'status': self.status(),
+            'timing': {str(pin): sensor.timing for pin, sensor in self.sensors.items()},
+            'filters': {str(pin): stats for pin, stats in filters.stats().items()} if filters else {},
+            'retry': {str(pin): stats for pin, stats in self.scheduler.retry.stats().items()},
+        }
+
+    def monitor(self, pin, duration=2.0):
+        """Watch the idle line of the sensor on pin; see DHT11.monitor_pin
+
+        Runs on the sensor thread between two reads. Raises KeyError if
+        the sensor is not up, concurrent.futures.TimeoutError if the
+        thread did not get to it within 5 seconds past the duration.
+        """
+        sensor = self.sensors[pin]
+        future = self.scheduler.diagnose(sensor, duration)
+        try:
+            return future.result(timeout=duration + 5.0)
+        except concurrent.futures.TimeoutError:
+            future.cancel()     # Not run later for nobody
+            raise
+
+    def metrics(self):
+        """Prometheus text exposition of the acquisition metrics"""
+        return REGISTRY.render()
+
+    def close(self):
+        """Stop reading and release the lines and chip handle opened here"""
+        self.stopped = True
+        self._stop.set()
+        self.scheduler.stop()
+        for thread in self._threads:
+            thread.join(timeout=5.0)
+        for sensor in self.sensors.values():
+            sensor.close()
+        if self.chip is not None:
+            try:
+                self.gpio.gpiochip_close(self.chip)
+            except Exception:
+                pass
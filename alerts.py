@@ -0,0 +1,287 @@
+"""Threshold alerts evaluated once per reading on the ingest path
+
+A Rule compares a reading field, or its rate of change per minute, with
+a threshold. It fires once the condition has held for `duration`
+seconds, and clears only when the value is back past the threshold by
+`hysteresis`, so a value hovering at the limit does not flap.
+
+Rules are compiled per sensor into closures with the operator,
+threshold and clear level bound, each keeping its own state. A reading
+runs only its own sensor's steps, so the cost per reading does not grow
+with the number of sensors. The alert state is rebuilt only when it
+changes: the state endpoint serves it as is, and the change is pushed
+to subscribers (webhook, SSE).
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+
+from publisher import HttpTransport, PublishError
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('humidity', 'temperature')
+
+# Alert states; rules start out OK
+OK = 'ok'
+PENDING = 'pending'     # Condition holds, not yet for duration seconds
+FIRING = 'firing'
+
+# Default rules: the dashboard warning thresholds
+TEMPERATURE_LIMIT = float(os.environ.get('DHT_TEMPERATURE_LIMIT', 40))
+HUMIDITY_LIMIT = float(os.environ.get('DHT_HUMIDITY_LIMIT', 89))
+
+
+class Rule:
+    """Alert when field (or its rate per minute) is above/below threshold
+
+    op is '>' or '<'. With rate=True the rate of change per minute over
+    the last window seconds is compared, by magnitude; it is only
+    measured once the readings span half the window, as one step over a
+    few seconds would extrapolate to a huge rate. sensors limits the
+    rule to those sensor ids; None applies it to all.
+    """
+
+    def __init__(self, name, field, op='>', threshold=0.0, hysteresis=0.0, duration=0.0,
+                 rate=False, window=60.0, sensors=None):
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field {field!r}; use one of {', '.join(FIELDS)}")
+        if op not in ('>', '<'):
+            raise ValueError(f"Unknown operator {op!r}; use '>' or '<'")
+        self.name = name
+        self.field = field
+        self.op = op
+        self.threshold = float(threshold)
+        self.hysteresis = float(hysteresis)
+        self.duration = float(duration)
+        self.rate = rate
+        self.window = float(window)
+        self.sensors = None if sensors is None else frozenset(sensors)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'field': self.field, 'op': self.op, 'threshold': self.threshold,
+            'hysteresis': self.hysteresis, 'duration': self.duration, 'rate': self.rate,
+            'window': self.window, 'sensors': None if self.sensors is None else sorted(self.sensors),
+        }
+
+    def applies_to(self, sensor_id):
+        return self.sensors is None or sensor_id in self.sensors
+
+    def compile(self):
+        """step(timestamp, values) -> (new state, measured value) on a change, else None
+
+        values is (humidity, temperature). Every call of compile() gets
+        its own state, so compile once per sensor.
+        """
+        index = FIELDS.index(self.field)
+        threshold, duration = self.threshold, self.duration
+        if self.op == '>':
+            clear_at = threshold - self.hysteresis
+            trigger = threshold.__lt__      # threshold < x
+            clears = clear_at.__ge__        # x <= clear_at
+        else:
+            clear_at = threshold + self.hysteresis
+            trigger = threshold.__gt__
+            clears = clear_at.__le__
+
+        if self.rate:
+            window = self.window
+            min_span = window / 2
+            recent = deque()    # (timestamp, value) over the last window seconds
+
+            def measure(timestamp, value):
+                recent.append((timestamp, value))
+                while timestamp - recent[0][0] > window:
+                    recent.popleft()
+                t0, v0 = recent[0]
+                if timestamp - t0 < min_span or timestamp <= t0:
+                    return None
+                return abs(value - v0) / (timestamp - t0) * 60.0
+        else:
+            measure = None
+
+        state, since = OK, 0.0
+
+        def step(timestamp, values):
+            nonlocal state, since
+            x = values[index]
+            if measure is not None:
+                x = measure(timestamp, x)
+                if x is None:
+                    return None
+            if state == FIRING:
+                if clears(x):
+                    state = OK
+                    return OK, x
+                return None
+            if not trigger(x):
+                if state == PENDING:
+                    state = OK
+                    return OK, x
+                return None
+            if state == OK:
+                since = timestamp
+                if duration > 0:
+                    state = PENDING
+                    return PENDING, x
+            if timestamp - since >= duration:
+                state = FIRING
+                return FIRING, x
+            return None
+
+        return step
+
+
+def default_rules():
+    """Rules from the JSON list in DHT_ALERT_RULES, else the two dashboard limits"""
+    path = os.environ.get('DHT_ALERT_RULES')
+    if path:
+        with open(path) as f:
+            return [Rule.from_dict(data) for data in json.load(f)]
+    return [
+        Rule('temperature_high', 'temperature', '>', TEMPERATURE_LIMIT, hysteresis=0.5),
+        Rule('humidity_high', 'humidity', '>', HUMIDITY_LIMIT, hysteresis=1.0),
+    ]
+
+
+class AlertEngine:
+    """Evaluates rules on every reading and keeps the current alert state
+
+    evaluate() is called from the sensor thread. subscribers are called
+    there with the list of changes, so they must not block.
+    """
+
+    def __init__(self, rules=None):
+        self.rules = list(default_rules() if rules is None else rules)
+        self.subscribers = []
+        self._steps = {}        # sensor id -> [(rule, step)]
+        self._active = {}       # (rule name, sensor id) -> alert dict, pending or firing
+        self.seq = 0            # Incremented on every change
+        # Served as is; replaced on change, read without locks
+        self.state = {'seq': 0, 'alerts': [], 'rules': [rule.to_dict() for rule in self.rules]}
+
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+
+    def _compile(self, sensor_id):
+        steps = [(rule, rule.compile()) for rule in self.rules if rule.applies_to(sensor_id)]
+        self._steps[sensor_id] = steps
+        return steps
+
+    def evaluate(self, sensor_id, timestamp, humidity, temperature):
+        """Run the sensor's rules on a reading; returns the changes"""
+        steps = self._steps.get(sensor_id)
+        if steps is None:
+            steps = self._compile(sensor_id)
+        values = (humidity, temperature)
+        changes = []
+        for rule, step in steps:
+            change = step(timestamp, values)
+            if change is not None:
+                changes.append(self._change(rule, sensor_id, timestamp, *change))
+        if changes:
+            self.seq += 1
+            self.state = {
+                'seq': self.seq,
+                'alerts': sorted(self._active.values(), key=lambda a: (a['sensor'], a['rule'])),
+                'rules': self.state['rules'],
+            }
+            for callback in self.subscribers:
+                try:
+                    callback(changes)
+                except Exception as e:
+                    log.warning("Alert subscriber failed: %s", e)
+        return changes
+
+    def _change(self, rule, sensor_id, timestamp, state, value):
+        key = (rule.name, sensor_id)
+        alert = {
+            'rule': rule.name, 'sensor': sensor_id, 'field': rule.field, 'rate': rule.rate,
+            'op': rule.op, 'threshold': rule.threshold, 'state': state, 'value': value,
+            'since': timestamp,
+        }
+        if state == OK:
+            self._active.pop(key, None)
+        else:
+            if state == FIRING and key in self._active:
+                alert['pending_since'] = self._active[key]['since']
+            self._active[key] = alert
+        if state == FIRING:
+            log.warning("Alert %s on GPIO%s: %s%s %s %s (%.2f)", rule.name, sensor_id, rule.field,
+                        ' change/min' if rule.rate else '', rule.op, rule.threshold, value)
+        elif state == OK:
+            log.info("Alert %s on GPIO%s cleared", rule.name, sensor_id)
+        return alert
+
+
+def summary(state, sensor_id):
+    """field -> worst alert state of one sensor, from an AlertEngine state"""
+    fields = {}
+    for alert in state.get('alerts', ()):
+        if alert['sensor'] == sensor_id and fields.get(alert['field']) != FIRING:
+            fields[alert['field']] = alert['state']
+    return fields
+
+
+class Webhook:
+    """POSTs alert changes as JSON to a URL from a thread of its own
+
+    Each change is tried a few times with backoff, then dropped; nothing
+    is spooled, as a late alert is of little use.
+    """
+
+    def __init__(self, url, attempts=3, retry_delay=1.0):
+        self.transport = HttpTransport(url, headers={'Content-Type': 'application/json',
+                                                     'X-DHT-Station': socket.gethostname()})
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        """Webhook to DHT_ALERT_WEBHOOK, None if unset"""
+        url = os.environ.get('DHT_ALERT_WEBHOOK')
+        return cls(url) if url else None
+
+    def __call__(self, changes):
+        """AlertEngine subscriber; never blocks"""
+        self._queue.put(changes)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='webhook', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            changes = self._queue.get()
+            if changes is None:
+                return
+            body = json.dumps({'changes': changes}, separators=(',', ':')).encode()
+            delay = self.retry_delay
+            for attempt in range(self.attempts):
+                try:
+                    self.transport.send(body)
+                    break
+                except PublishError as e:
+                    if not e.retry or attempt == self.attempts - 1:
+                        log.warning("Alert webhook failed, %d changes dropped: %s", len(changes), e)
+                        break
+                    time.sleep(delay)
+                    delay *= 2
+
+    def close(self):
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout=10.0)
+        self.transport.close()
@@ -1,34 +1,55 @@
-from flask import Flask, render_template_string, jsonify
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+import concurrent.futures
+import gzip
+import logging
+import math
+import os
 import time
-import lgpio
-from threading import Thread
+from acquisition import READY, Acquisition
+from alerts import FIRING, AlertEngine, Webhook, summary
+from broadcast import Broadcaster
+from export import FORMATS
+from filters import FilterBank
+from history import History
+from logs import setup_logging
+from metrics import CONTENT_TYPE
+from publisher import Publisher
+from rollup import Rollup
+from shared import DEFAULT_NAME, SharedAcquisition
+from store import LatestStore, Snapshot
+from worker import AcquisitionProcess, parse_cpus
+from werkzeug.serving import make_server
 import signal
 
-app = Flask(__name__)
+log = logging.getLogger(__name__)
 
-# Global variables to store sensor data
-current_temperature = 0
-current_humidity = 0
+# GPIO pins with a DHT11 data line attached; all share one gpiochip handle
+SENSOR_PINS = [23]
 
-def cleanup_gpio():
-    """Release all GPIO resources"""
-    try:
-        # Get list of all GPIO chips
-        for i in range(4):  # Usually there are 0-3 GPIO chips
-            try:
-                h = lgpio.gpiochip_open(i)
-                # Try to free our pin from each chip
-                try:
-                    lgpio.gpio_free(h, 4)   # Free GPIO4
-                    lgpio.gpio_free(h, 17)  # Free GPIO17
-                    lgpio.gpio_free(h, 23)  # Free GPIO23
-                except:
-                    pass
-                lgpio.gpiochip_close(h)
-            except:
-                pass
-    except Exception as e:
-        print(f"Cleanup error: {e}")
+# Readings older than this are shown as stale
+STALE_AFTER = 10.0
+
+# Longest a /sensor?wait= long-poll request is held open, in seconds
+LONG_POLL_MAX = 30.0
+
+# On-disk ring of past readings; bounded to HISTORY_CAPACITY records
+HISTORY_PATH = os.environ.get('DHT_HISTORY_PATH', 'history.bin')
+HISTORY_CAPACITY = int(os.environ.get('DHT_HISTORY_CAPACITY', 1 << 23))
+
+# Most readings one /sensor/history request returns
+HISTORY_LIMIT = 10000
+
+# Longest a /sensor/<pin>/monitor diagnostic may watch the line, in seconds
+MONITOR_MAX = 10.0
+
+# Where the sensors are read: 'thread' in this process, 'process' in a
+# child process started by the app, or 'attach' to a separately started
+# worker.py (for several web worker processes)
+ACQUISITION = os.environ.get('DHT_ACQUISITION', 'thread')
+SHARED_NAME = os.environ.get('DHT_SHARED_NAME', DEFAULT_NAME)
+# Acquisition process CPU affinity ('2,3') and SCHED_FIFO priority (0: off)
+ACQUISITION_CPUS = parse_cpus(os.environ.get('DHT_ACQUISITION_CPUS', ''))
+ACQUISITION_PRIORITY = int(os.environ.get('DHT_ACQUISITION_PRIORITY', 0))
 
 # HTML template with CSS styling
 HTML_TEMPLATE = '''
@@ -64,343 +85,530 @@ HTML_TEMPLATE = '''
             border-radius: 5px;
             display: inline-block;
         }
+        .stale {
+            color: gray;
+        }
     </style>
-    <meta http-equiv="refresh" content="5">
+    <noscript><meta http-equiv="refresh" content="5"></noscript>
 </head>
 <body>
+    {% macro status_box(name, status) %}
+    {% if status == 'warning' %}
+    <div id="{{ name }}-status" class="status-box warning">WARNING</div>
+    {% elif status == 'safe' %}
+    <div id="{{ name }}-status" class="status-box safe">IN LIMIT</div>
+    {% else %}
+    <div id="{{ name }}-status" class="status-box stale">NO DATA</div>
+    {% endif %}
+    {% endmacro %}
     <h1>DHT11 Sensor Dashboard</h1>
+    <p id="status-line" class="stale">{% if stale %}{% if last_reading is none %}No reading yet{% else %}Last reading at {{ last_reading }}{% endif %}{% if error %} ({{ error }}){% endif %}{% endif %}</p>
     
     <div class="sensor-data">
         <h2>Temperature</h2>
-        <p>{{ temperature }}°C</p>
-        <div class="status-box {% if temperature > 40 %}warning{% else %}safe{% endif %}">
-            {% if temperature > 40 %}WARNING{% else %}IN LIMIT{% endif %}
-        </div>
+        <p><span id="temperature">{% if temperature is none %}--{% else %}{{ temperature }}{% endif %}</span>°C</p>
+        {{ status_box('temperature', temperature_status) }}
     </div>
 
     <div class="sensor-data">
         <h2>Humidity</h2>
-        <p>{{ humidity }}%</p>
-        <div class="status-box {% if humidity > 89 %}warning{% else %}safe{% endif %}">
-            {% if humidity > 89 %}WARNING{% else %}IN LIMIT{% endif %}
-        </div>
+        <p><span id="humidity">{% if humidity is none %}--{% else %}{{ humidity }}{% endif %}</span>%</p>
+        {{ status_box('humidity', humidity_status) }}
     </div>
+
+    <script>
+        // Update the values in place whenever the server pushes a new reading
+        if (window.EventSource) {
+            var source = new EventSource('/sensor/stream');
+            var staleTimer = null;
+            var showStatus = function (data, stale) {
+                var line = '';
+                if (stale) {
+                    line = data.timestamp === null ? 'No reading yet'
+                        : 'Last reading at ' + new Date(data.timestamp * 1000).toLocaleString();
+                    if (data.error) {
+                        line += ' (' + data.error + ')';
+                    }
+                }
+                document.getElementById('status-line').textContent = line;
+            };
+            source.onmessage = function (event) {
+                var data = JSON.parse(event.data);
+                ['temperature', 'humidity'].forEach(function (name) {
+                    var value = data[name];
+                    var box = document.getElementById(name + '-status');
+                    document.getElementById(name).textContent = value === null ? '--' : value;
+                    if (value === null) {
+                        box.className = 'status-box stale';
+                        box.textContent = 'NO DATA';
+                    } else if (data.alerts[name] === 'firing') {
+                        box.className = 'status-box warning';
+                        box.textContent = 'WARNING';
+                    } else {
+                        box.className = 'status-box safe';
+                        box.textContent = 'IN LIMIT';
+                    }
+                });
+                // Same status line as the server renders; also shown once the
+                // reading turns stale without a new one coming in
+                clearTimeout(staleTimer);
+                showStatus(data, data.stale);
+                if (!data.stale) {
+                    staleTimer = setTimeout(function () { showStatus(data, true); },
+                                            ({{ stale_after }} - data.age) * 1000);
+                }
+            };
+        } else {
+            setTimeout(function () { location.reload(); }, 5000);
+        }
+    </script>
 </body>
 </html>
 '''
 
-class DHT11:
-    def __init__(self, pin=17):
-        """Initialize DHT11 sensor with specified GPIO pin"""
-        self.pin = pin
-        
-        # Clean up any existing GPIO resources
-        cleanup_gpio()
-        
-        try:
-            self.h = lgpio.gpiochip_open(0)
-        except Exception as e:
-            raise RuntimeError(f"Failed to open GPIO chip: {e}")
-            
-        self.temperature = None
-        self.humidity = None
-        self.last_reading = 0
-        
-        # Verify connection on initialization
-        if not self.verify_connection():
-            cleanup_gpio()
-            raise RuntimeError("Failed to verify sensor connection")
+def alert_status(value, state):
+    """'warning' while an alert on the field fires, 'safe' otherwise, None without a value"""
+    if value is None:
+        return None
+    return 'warning' if state == FIRING else 'safe'
 
-    def __enter__(self):
-        return self
-        
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Clean up GPIO resources"""
-        try:
-            lgpio.gpio_free(self.h, self.pin)
-            lgpio.gpiochip_close(self.h)
-        except:
-            pass
-
-    def _wait_for_edge(self, level, timeout):
-        """Wait for a signal edge (rising or falling) with timeout"""
-        start = time.time()
-        last_level = not level  # For debug output
-        
-        while lgpio.gpio_read(self.h, self.pin) != level:
-            current_level = lgpio.gpio_read(self.h, self.pin)
-            if current_level != last_level:
-                print(f"Signal changed to {current_level} after {(time.time() - start)*1000000:.0f}µs")
-                last_level = current_level
-            
-            if (time.time() - start) > timeout:
-                return False
-            time.sleep(0.000001)  # 1µs delay
-        return True
-
-    def read(self):
-        """Read temperature and humidity from DHT11 sensor"""
-        try:
-            current_time = time.time()
-            if current_time - self.last_reading < 2:
-                return self.humidity, self.temperature
-
-            print("\nAttempting to read DHT11 sensor...")
-            
-            # Free the pin first
-            try:
-                lgpio.gpio_free(self.h, self.pin)
-            except:
-                pass
-            
-            # Initialize the sensor with precise timing
-            try:
-                # Start with pin as input with pull-up
-                lgpio.gpio_claim_input(self.h, self.pin, lgpio.SET_PULL_UP)
-                time.sleep(1.0)  # Let voltage stabilize
-                
-                # Switch to output and send start signal
-                lgpio.gpio_free(self.h, self.pin)
-                lgpio.gpio_claim_output(self.h, self.pin)
-                print("Successfully claimed GPIO for output")
-                
-                # Pull down for at least 18ms
-                lgpio.gpio_write(self.h, self.pin, 0)
-                print("Sent start signal (LOW)")
-                time.sleep(0.018)
-                
-                # Pull up for 20-40µs
-                lgpio.gpio_write(self.h, self.pin, 1)
-                time.sleep(0.000040)
-                print("Released line (HIGH)")
-                
-                # Switch back to input mode to receive data
-                lgpio.gpio_free(self.h, self.pin)
-                lgpio.gpio_claim_input(self.h, self.pin)  # No pull-up this time
-                print("Switched to input mode")
-                
-            except Exception as e:
-                print(f"Error during initialization: {str(e)}")
-                return None, None
-            
-            # Wait for sensor response (should pull low within 20-40µs)
-            print("Waiting for sensor response...")
-            start_time = time.time()
-            timeout = start_time + 0.000100  # 100µs timeout
-            
-            # Wait for LOW (response start)
-            while lgpio.gpio_read(self.h, self.pin) == 1:
-                if time.time() > timeout:
-                    print("Timeout waiting for sensor response (still HIGH)")
-                    return None, None
-            response_time = (time.time() - start_time) * 1000000
-            print(f"Sensor pulled LOW after {response_time:.1f}µs")
-            
-            # Wait for HIGH (response signal)
-            start_time = time.time()
-            timeout = start_time + 0.000100  # 100µs timeout
-            while lgpio.gpio_read(self.h, self.pin) == 0:
-                if time.time() > timeout:
-                    print("Timeout waiting for sensor response (still LOW)")
-                    return None, None
-            response_time = (time.time() - start_time) * 1000000
-            print(f"Sensor pulled HIGH after {response_time:.1f}µs")
-            
-            # Read the data
-            data = []
-            for i in range(40):
-                if not self._wait_for_edge(0, 0.001):  # Wait for low
-                    print(f"Timeout waiting for bit {i} (LOW)")
-                    return None, None
-                t0 = time.time()
-                if not self._wait_for_edge(1, 0.001):  # Wait for high
-                    print(f"Timeout waiting for bit {i} (HIGH)")
-                    return None, None
-                t1 = time.time()
-                bit = 1 if (t1 - t0) > 0.00007 else 0
-                data.append(bit)
-            
-            print(f"Read {len(data)} bits")
-            
-            # Convert data to humidity and temperature
-            bytes_data = []
-            byte = 0
-            for i in range(40):
-                byte = (byte << 1) | data[i]
-                if (i + 1) % 8 == 0:
-                    bytes_data.append(byte)
-                    byte = 0
-            
-            print(f"Converted to bytes: {bytes_data}")
-                    
-            # Verify checksum
-            checksum = ((bytes_data[0] + bytes_data[1] + bytes_data[2] + bytes_data[3]) & 0xFF)
-            if bytes_data[4] == checksum:
-                self.humidity = bytes_data[0]
-                self.temperature = bytes_data[2]
-                self.last_reading = current_time
-                print(f"Checksum OK: {checksum}")
-                return self.humidity, self.temperature
+class Station:
+    """Everything the routes serve: acquisition, latest readings, history
+
+    Building it opens the history files but touches no GPIO; sensors
+    come up in the background once start() is called. With mode
+    'process' or 'attach' the readings come from the acquisition process
+    through shared memory, and the history files are only read here.
+    """
+
+    def __init__(self, pins=SENSOR_PINS, gpio=None, history_path=HISTORY_PATH, mode=ACQUISITION):
+        self.pins = list(pins)
+        self.mode = mode
+        # Pushes each new /sensor payload to SSE streams and long-poll requests
+        self.broadcaster = Broadcaster()
+        # Pushes the alert state to /alerts/stream whenever it changes
+        self.alert_broadcaster = Broadcaster()
+        local = mode == 'thread'
+        self.history = History(history_path, HISTORY_CAPACITY, readonly=not local)
+        # 1 minute / 1 hour / 1 day aggregates, kept next to the history file
+        self.rollup = Rollup(os.path.dirname(os.path.abspath(history_path)), readonly=not local)
+        self.worker = None
+        self.publisher = None
+        self.webhook = None
+        if local:
+            # Sends readings to DHT_COLLECTOR_URL and alerts to DHT_ALERT_WEBHOOK if
+            # set; in the other modes the worker does
+            self.publisher = Publisher.from_env(os.path.dirname(os.path.abspath(history_path)))
+            alerts = AlertEngine()
+            self.webhook = Webhook.from_env()
+            if self.webhook is not None:
+                alerts.subscribe(self.webhook)
+            # Drops out-of-range, outlier and too-fast readings before they are stored
+            self.acquisition = Acquisition(self.pins, self.on_result,
+                                           LatestStore(), FilterBank(), gpio, alerts=alerts)
+        elif mode in ('process', 'attach'):
+            self.acquisition = SharedAcquisition(SHARED_NAME, self.publish)
+            if mode == 'process':
+                self.worker = AcquisitionProcess(self.pins, history_path, HISTORY_CAPACITY, SHARED_NAME,
+                                                 ACQUISITION_CPUS, ACQUISITION_PRIORITY)
+        else:
+            raise ValueError(f"Unknown acquisition mode: {mode}")
+        # Latest reading per sensor; replaced atomically, read without locks
+        self.store = self.acquisition.store
+        # Set by create_app: the app's JSON encoder and the compiled dashboard
+        self.dumps = None
+        self.template = None
+        # (cache key, etag, body, gzipped body) of the last rendered dashboard
+        self.page_cache = (None, None, None, None)
+
+    def on_result(self, sensor, humidity, temperature):
+        """Log a sensor result, record it and push it to subscribers
+
+        The scheduler has already published it to the store.
+        """
+        if humidity is not None and temperature is not None:
+            log.info("GPIO%d: Temperature: %s°C, Humidity: %s%%", sensor.pin, temperature, humidity)
+            self.history.append(sensor.last_reading, sensor.pin, humidity, temperature)
+            self.rollup.add(sensor.last_reading, sensor.pin, humidity, temperature)
+            if self.publisher is not None:
+                self.publisher.submit(sensor.last_reading, sensor.pin, humidity, temperature)
+        else:
+            log.warning("GPIO%d: Failed to get reading", sensor.pin)
+        self.publish()
+
+    def version(self, seq=None):
+        """Broadcast version of a store (or alert) sequence number
+
+        Prefixed with the store epoch, so a restarted worker counting
+        from 0 again does not repeat the versions of the previous one.
+        """
+        store = self.store
+        return f'{store.epoch:x}-{store.seq if seq is None else seq}'
+
+    def publish(self):
+        """Push the current /sensor payload, and the alert state if changed, to subscribers"""
+        # Serialize once; every subscriber gets the same string
+        self.broadcaster.publish(self.version(), self.dumps(self.sensor_payload()))
+        self.publish_alerts()
+
+    def alerts(self):
+        """Current alert state, as kept up to date by the alert engine"""
+        return self.acquisition.details().get('alerts', {'seq': 0, 'alerts': [], 'rules': []})
+
+    def publish_alerts(self):
+        """Push the alert state to /alerts/stream if it changed"""
+        alerts = self.alerts()
+        broadcaster = self.alert_broadcaster
+        version = self.version(alerts['seq'])
+        if version != broadcaster.version:
+            broadcaster.publish(version, self.dumps(alerts))
+
+    def primary_snapshot(self):
+        """Latest snapshot of the dashboard sensor (the first configured pin)"""
+        pin = self.pins[0]
+        snapshot = self.store.get(pin)
+        if snapshot is None:
+            snapshot = Snapshot(None, None, None, 0, pin)
+        return snapshot
+
+    def sensor_state(self, now=None):
+        """(broadcast version, stale readings, seconds until the next turns stale)
+
+        The /sensor payload changes with every reading and whenever a
+        reading turns stale. Between two readings they only ever turn
+        stale, so the version and the stale count identify the payload.
+        The seconds are None if no reading is fresh.
+        """
+        now = time.time() if now is None else now
+        version = self.version()
+        stale, expires = 0, None
+        for snapshot in self.store.snapshots().values():
+            if snapshot.is_stale(STALE_AFTER, now):
+                stale += 1
             else:
-                print(f"Checksum failed: got {bytes_data[4]}, expected {checksum}")
-                return None, None
-            
-        except Exception as e:
-            print(f"Error reading sensor: {str(e)}")
-            return None, None
-        finally:
-            try:
-                lgpio.gpio_free(self.h, self.pin)
-            except:
-                pass
-
-    def verify_connection(self):
-        """Verify the sensor connection by testing GPIO control"""
-        try:
-            print("\nVerifying sensor connection...")
-            
-            # Free the pin first
-            try:
-                lgpio.gpio_free(self.h, self.pin)
-            except:
-                pass
-            
-            # Test output mode
-            lgpio.gpio_claim_output(self.h, self.pin)
-            print("Successfully set pin to output mode")
-            
-            # Test writing HIGH
-            lgpio.gpio_write(self.h, self.pin, 1)
-            time.sleep(0.1)
-            print("Set pin HIGH")
-            
-            # Test writing LOW
-            lgpio.gpio_write(self.h, self.pin, 0)
-            time.sleep(0.1)
-            print("Set pin LOW")
-            
-            # Free the pin before switching modes
-            lgpio.gpio_free(self.h, self.pin)
-            
-            # Test input mode
-            lgpio.gpio_claim_input(self.h, self.pin)
-            value = lgpio.gpio_read(self.h, self.pin)
-            print(f"Pin value in input mode: {value}")
-            
-            # Free the pin when done
-            lgpio.gpio_free(self.h, self.pin)
-            
-            return True
-        except Exception as e:
-            print(f"Connection verification failed: {str(e)}")
-            return False
-
-    def monitor_pin(self, duration=5.0):
-        """Monitor the pin state for a specified duration"""
-        print(f"\nMonitoring pin {self.pin} for {duration} seconds...")
-        
-        try:
-            # Free the pin first
-            try:
-                lgpio.gpio_free(self.h, self.pin)
-            except:
-                pass
-            
-            # Configure as input with pull-up
-            lgpio.gpio_claim_input(self.h, self.pin, lgpio.SET_PULL_UP)
-            
-            start_time = time.time()
-            last_state = lgpio.gpio_read(self.h, self.pin)
-            transitions = 0
-            
-            while (time.time() - start_time) < duration:
-                current_state = lgpio.gpio_read(self.h, self.pin)
-                if current_state != last_state:
-                    transitions += 1
-                    print(f"Pin changed to {current_state} at {(time.time() - start_time)*1000:.1f}ms")
-                    last_state = current_state
-                time.sleep(0.0001)  # 100µs sampling
-                
-            print(f"Monitoring complete. Observed {transitions} transitions.")
-            
-        except Exception as e:
-            print(f"Error monitoring pin: {str(e)}")
-        finally:
-            try:
-                lgpio.gpio_free(self.h, self.pin)
-            except:
-                pass
-
-# Create a global DHT11 instance
-dht11 = DHT11(pin=23)
-
-def read_sensor():
-    """Background thread function to continuously read sensor data"""
-    global current_temperature, current_humidity
-    
-    print("Starting sensor readings on GPIO23...")
-    
-    while True:
-        try:
-            # Read from DHT11 sensor
-            humidity, temperature = dht11.read()
-            
-            if humidity is not None and temperature is not None:
-                current_temperature = temperature
-                current_humidity = humidity
-                print(f"Temperature: {temperature}°C, Humidity: {humidity}%")
+                left = snapshot.timestamp + STALE_AFTER - now
+                expires = left if expires is None else min(expires, left)
+        return version, stale, expires
+
+    def sensor_payload(self):
+        """Data served by /sensor and pushed on /sensor/stream"""
+        now = time.time()
+        data = self.primary_snapshot().to_dict(STALE_AFTER, now)
+        # 'starting' or 'warming_up' until the first reading, then 'ready'
+        data['status'] = self.acquisition.state
+        details = self.acquisition.details()
+        data['timing'] = details.get('timing', {}).get(str(self.pins[0]), {})
+        data['filters'] = details.get('filters', {})
+        # Breaker state and effective vs target sample rate per sensor
+        data['retry'] = details.get('retry', {})
+        # Alert states of the dashboard sensor by field, e.g. {'temperature': 'firing'}
+        data['alerts'] = summary(details.get('alerts', {}), self.pins[0])
+        data['sensors'] = {
+            str(pin): snapshot.to_dict(STALE_AFTER, now)
+            for pin, snapshot in self.store.snapshots().items()
+        }
+        return data
+
+    def render_dashboard(self, snapshot, stale):
+        """Render the dashboard for one snapshot"""
+        alerts = summary(self.alerts(), snapshot.sensor_id)
+        last_reading = None
+        if snapshot.timestamp is not None:
+            last_reading = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(snapshot.timestamp))
+        return self.template.render(
+            temperature=snapshot.temperature,
+            humidity=snapshot.humidity,
+            temperature_status=alert_status(snapshot.temperature, alerts.get('temperature')),
+            humidity_status=alert_status(snapshot.humidity, alerts.get('humidity')),
+            last_reading=last_reading,
+            stale=stale,
+            stale_after=STALE_AFTER,
+            error=snapshot.error)
+
+    def start(self):
+        """Start the acquisition (process) in the background; returns at once"""
+        if self.worker is not None:
+            self.worker.start()
+        if self.publisher is not None:
+            self.publisher.start()
+        if self.webhook is not None:
+            self.webhook.start()
+        self.acquisition.start()
+
+    def close(self):
+        """Stop acquisition, release its GPIO and persist the history"""
+        self.acquisition.close()
+        if self.worker is not None:
+            self.worker.stop()
+        if self.publisher is not None:
+            self.publisher.close()
+        if self.webhook is not None:
+            self.webhook.close()
+        self.history.close()
+        self.rollup.close()
+
+bp = Blueprint('dashboard', __name__)
+
+def current_station():
+    """The Station of the app handling the current request"""
+    return current_app.extensions['dht']
+
+def sse_response(broadcaster, last_id=None):
+    """Server-Sent Events response streaming a Broadcaster's payloads
+
+    Starts with the current payload unless last_id (the Last-Event-ID of
+    a reconnecting browser) is its version; keepalive comments are sent
+    while nothing changes.
+    """
+    def events():
+        # Reconnect delay for the browser; also flushes the headers at once
+        yield 'retry: 3000\n\n'
+        for version, payload in broadcaster.subscribe(last_id):
+            if payload is None:
+                yield ': keepalive\n\n'
             else:
-                print("Failed to get reading (None values)")
-                # Monitor pin after failure
-                dht11.monitor_pin(2.0)
-                
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            try:
-                lgpio.gpio_free(dht11.h, dht11.pin)
-            except:
-                pass
-            
-        time.sleep(2.0)
-
-@app.route('/')
+                yield f'id: {version}\ndata: {payload}\n\n'
+    
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@bp.route('/')
 def index():
-    """Route for the main dashboard page"""
-    return render_template_string(HTML_TEMPLATE, 
-                                temperature=current_temperature,
-                                humidity=current_humidity)
+    """Route for the main dashboard page
 
-@app.route('/sensor')
+    The page only changes with a new reading or when the reading turns
+    stale, so it is rendered and gzipped once per (store epoch, sequence,
+    stale) and served from memory until then.
+    """
+    s = current_station()
+    snapshot = s.primary_snapshot()
+    key = (s.store.epoch, snapshot.seq, snapshot.is_stale(STALE_AFTER))
+    
+    cached_key, etag, body, gzipped = s.page_cache
+    if cached_key != key:
+        body = s.render_dashboard(snapshot, key[2]).encode()
+        gzipped = gzip.compress(body)
+        etag = f"{key[0]:x}-{key[1]}-{int(key[2])}"
+        s.page_cache = (key, etag, body, gzipped)
+    
+    use_gzip = 'gzip' in request.accept_encodings
+    if use_gzip:
+        etag += '-gz'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif use_gzip:
+        response = Response(gzipped, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@bp.route('/sensor')
 def get_sensor_data():
-    """API endpoint for getting current sensor data"""
-    return jsonify({
-        'temperature': current_temperature,
-        'humidity': current_humidity
-    })
+    """API endpoint for getting current sensor data
+
+    The ETag is the store epoch and sequence number plus the number of
+    stale readings. A request with a matching If-None-Match gets 304 Not
+    Modified, or with ?wait=<seconds> is held until a new reading
+    arrives or a reading turns stale (long-poll).
+    """
+    s = current_station()
+    version, stale, expires = s.sensor_state()
+    etag = f'{version}-{stale}'
+    if request.if_none_match.contains(etag):
+        wait = min(request.args.get('wait', 0.0, type=float), LONG_POLL_MAX)
+        if wait > 0:
+            if expires is not None:
+                wait = min(wait, expires)
+            s.broadcaster.wait(version, wait)
+            version, stale, _ = s.sensor_state()
+            etag = f'{version}-{stale}'
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+    
+    response = jsonify(s.sensor_payload())
+    response.set_etag(etag)
+    return response
+
+@bp.route('/sensor/stream')
+def sensor_stream():
+    """Server-Sent Events stream of /sensor payloads, one per new reading"""
+    return sse_response(current_station().broadcaster, request.headers.get('Last-Event-ID'))
+
+@bp.route('/sensor/history')
+def sensor_history():
+    """Readings between ?from= and ?to= (unix seconds), optionally for one ?sensor=
+
+    Defaults to the last hour of all sensors. With ?points=N the answer
+    comes from the coarsest rollup (1 min, 1 h, 1 day) that still gives
+    at least N buckets, or raw readings if none does. The rollup is never
+    so fine that the range would not fit in the limit.
+    """
+    s = current_station()
+    end = request.args.get('to', time.time(), type=float)
+    start = request.args.get('from', end - 3600, type=float)
+    sensor_id = request.args.get('sensor', type=int)
+    limit = min(request.args.get('limit', HISTORY_LIMIT, type=int), HISTORY_LIMIT)
+    if limit <= 0:
+        return jsonify({'error': "limit must be positive"}), 400
+    points = request.args.get('points', type=int)
+    
+    resolution = None
+    if points:
+        max_buckets = limit if sensor_id is not None else limit // len(s.pins)
+        resolution = s.rollup.pick_resolution(start, end, points, max_buckets)
+    
+    data = {'from': start, 'to': end, 'sensor': sensor_id, 'resolution': resolution}
+    if resolution is None:
+        readings = s.history.query(start, end, sensor_id, limit)
+        data['readings'] = [
+            {'timestamp': t, 'sensor': s, 'humidity': round(h, 1), 'temperature': round(c, 1)}
+            for t, s, h, c, _ in readings
+        ]
+    else:
+        readings = s.rollup.query(resolution, start, end, sensor_id, limit)
+        data['buckets'] = [
+            {'start': t, 'sensor': s, 'count': n,
+             'humidity': {'min': round(h_min, 1), 'max': round(h_max, 1), 'mean': round(h_mean, 2)},
+             'temperature': {'min': round(t_min, 1), 'max': round(t_max, 1), 'mean': round(t_mean, 2)}}
+            for t, s, n, h_min, h_max, h_mean, t_min, t_max, t_mean in readings
+        ]
+    data['truncated'] = len(readings) >= limit
+    return jsonify(data)
+
+@bp.route('/sensor/export')
+def sensor_export():
+    """Stream stored readings as ?format=ndjson (default), csv or binary
+
+    Selects the records with sequence numbers from ?since= (default: the
+    oldest stored), or those from ?from= to ?to= (unix seconds),
+    optionally for one ?sensor=, at most ?limit= sequence numbers. The
+    X-First-Sequence header gives the first sequence number exported
+    (later than since if records were overwritten meanwhile), and
+    X-Next-Since the since of the next incremental export.
+    """
+    history = current_station().history
+    encoder = FORMATS.get(request.args.get('format', 'ndjson'))
+    if encoder is None:
+        return jsonify({'error': f"Unknown format; use one of {', '.join(FORMATS)}"}), 400
+    encode, content_type = encoder
+    first, end = history.bounds()
+    start = request.args.get('since', first, type=int)
+    since_time = request.args.get('from', type=float)
+    if since_time is not None:
+        start = max(start, history.sequence_at(since_time))
+    until = request.args.get('to', type=float)
+    if until is not None:
+        end = min(end, history.sequence_at(math.nextafter(until, math.inf)))
+    limit = request.args.get('limit', type=int)
+    start = max(start, first)
+    end = max(start, end if limit is None else min(end, start + limit))
+    
+    chunks = history.scan(start, end)
+    response = Response(encode(chunks, request.args.get('sensor', type=int)), content_type=content_type)
+    response.headers['X-First-Sequence'] = str(start)
+    response.headers['X-Next-Since'] = str(end)
+    return response
+
+@bp.route('/sensor/<int:pin>/monitor', methods=['POST'])
+def monitor_sensor(pin):
+    """Watch the idle data line of one sensor for ?duration= seconds
+
+    An on-demand diagnostic for a sensor that stopped answering; it runs
+    between two reads on the sensor thread, so only in thread mode.
+    """
+    acquisition = current_station().acquisition
+    if not hasattr(acquisition, 'monitor'):
+        return jsonify({'error': "Only available with DHT_ACQUISITION=thread"}), 501
+    duration = min(request.args.get('duration', 2.0, type=float), MONITOR_MAX)
+    try:
+        return jsonify(acquisition.monitor(pin, duration))
+    except KeyError:
+        return jsonify({'error': f"No sensor up on GPIO{pin}"}), 404
+    except concurrent.futures.TimeoutError:
+        # The sensor thread did not get to it; the request is dropped
+        return jsonify({'error': f"GPIO{pin} sensor thread busy, try again later"}), 504
+
+@bp.route('/alerts')
+def alert_state():
+    """Pending and firing alerts with the rules they come from
+
+    Kept up to date by the alert engine as readings come in; seq
+    increases with every change.
+    """
+    return jsonify(current_station().alerts())
+
+@bp.route('/alerts/stream')
+def alert_stream():
+    """Server-Sent Events stream of /alerts, one event per change"""
+    s = current_station()
+    s.publish_alerts()
+    return sse_response(s.alert_broadcaster, request.headers.get('Last-Event-ID'))
+
+@bp.route('/ready')
+def ready():
+    """Readiness of the acquisition: 200 once there is a reading, 503 before"""
+    status = current_station().acquisition.status()
+    return jsonify(status), 200 if status['state'] == READY else 503
+
+@bp.route('/metrics')
+def metrics():
+    """Prometheus text exposition of the acquisition metrics"""
+    return Response(current_station().acquisition.metrics(), content_type=CONTENT_TYPE)
+
+def create_app(pins=None, gpio=None, history_path=HISTORY_PATH, start=True, mode=ACQUISITION):
+    """Build the web app; returns without touching the GPIO
+
+    Sensors on pins (default SENSOR_PINS) are brought up in the
+    background, retrying until they answer, while the app already serves
+    requests. gpio is a GPIO backend, by default load_backend()'s; mode
+    is where they are read (see ACQUISITION). With start=False call
+    app.extensions['dht'].start() later.
+    """
+    app = Flask(__name__)
+    s = Station(pins or SENSOR_PINS, gpio, history_path, mode)
+    s.dumps = app.json.dumps
+    # The dashboard template is compiled once; rendered pages are cached
+    s.template = app.jinja_env.from_string(HTML_TEMPLATE)
+    # Subscribers and long-polls start from the current (empty) state
+    s.publish()
+    app.extensions['dht'] = s
+    app.register_blueprint(bp)
+    if start:
+        s.start()
+    return app
 
-# Add cleanup to signal handler
 def signal_handler(signum, frame):
-    print("\nSignal received, cleaning up...")
-    cleanup_gpio()
+    """Leave the server loop; cleanup runs in the finally block below"""
+    log.info("Signal received, cleaning up...")
     exit(0)
 
 if __name__ == '__main__':
+    # Log through a background thread, rate-limited; DHT_LOG_LEVEL=DEBUG shows every step
+    log_listener = setup_logging(os.environ.get('DHT_LOG_LEVEL', 'INFO').upper())
+    app = create_app(start=False)
+    station = app.extensions['dht']
+    
     try:
         # Register signal handler
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
         
-        # Start the sensor reading in a separate thread
-        sensor_thread = Thread(target=read_sensor, daemon=True)
-        sensor_thread.start()
-        
-        # Run the Flask app
-        app.run(host='0.0.0.0', port=5000)
+        # Bind the socket first, then bring the sensors up behind it
+        server = make_server('0.0.0.0', 5000, app, threaded=True)
+        station.start()
+        log.info("Serving on port 5000; sensors on GPIO%s coming up",
+                 ', GPIO'.join(map(str, station.pins)))
+        server.serve_forever()
     except Exception as e:
-        print(f"Application error: {e}")
+        log.error("Application error: %s", e)
     finally:
-        print("Cleaning up...")
-        try:
-            lgpio.gpiochip_close(dht11.h)
-        except:
-            pass 
\ No newline at end of file
+        log.info("Cleaning up...")
+        # Releases only the chip handle and lines this process claimed
+        station.close()
+        log_listener.stop()
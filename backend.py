@@ -0,0 +1,88 @@
+"""Pluggable GPIO backends
+
+The sensor code only talks to an object with the lgpio call interface
+described by GpioBackend. The real lgpio module provides it on a Pi;
+fake_lgpio.FakeLgpio and simulator.SimulatedGpio provide it anywhere.
+
+load_backend() picks one by name, or from DHT_GPIO_BACKEND:
+    lgpio       the lgpio module (default)
+    simulator   SimulatedGpio, a DHT11/DHT22 answering on every pin
+    module:attr any other object or factory, e.g. mybackend:Backend
+"""
+import importlib
+import os
+from abc import ABC, abstractmethod
+
+DEFAULT_BACKEND = 'lgpio'
+
+
+class GpioBackend(ABC):
+    """The subset of the lgpio API used by this project
+
+    Handles are gpiochip handles, ticks in alert callbacks are
+    nanoseconds since the epoch, and failures raise self.error.
+    Backends written for this project subclass it; the lgpio module
+    itself provides the same calls without doing so.
+    """
+
+    SET_PULL_UP = 32
+    RISING_EDGE = 1
+    FALLING_EDGE = 2
+    BOTH_EDGES = 3
+    error = RuntimeError
+
+    @abstractmethod
+    def gpiochip_open(self, gpiochip):
+        ...
+
+    @abstractmethod
+    def gpiochip_close(self, handle):
+        ...
+
+    @abstractmethod
+    def gpio_free(self, handle, gpio):
+        ...
+
+    @abstractmethod
+    def gpio_claim_input(self, handle, gpio, lFlags=0):
+        ...
+
+    @abstractmethod
+    def gpio_claim_output(self, handle, gpio, level=0, lFlags=0):
+        ...
+
+    @abstractmethod
+    def gpio_claim_alert(self, handle, gpio, eFlags, lFlags=0, notify_handle=None):
+        ...
+
+    @abstractmethod
+    def gpio_write(self, handle, gpio, level):
+        ...
+
+    @abstractmethod
+    def gpio_read(self, handle, gpio):
+        ...
+
+    @abstractmethod
+    def callback(self, handle, gpio, edge=RISING_EDGE, func=None):
+        """Call func(chip, gpio, level, tick) on edges; returns an object with cancel()"""
+
+
+def load_backend(name=None):
+    """Return the GPIO backend called name (default: $DHT_GPIO_BACKEND or lgpio)
+
+    Backends are imported only here, so modules using them can be
+    imported on machines without lgpio.
+    """
+    name = name or os.environ.get('DHT_GPIO_BACKEND', DEFAULT_BACKEND)
+    if name == 'lgpio':
+        import lgpio
+        return lgpio
+    if name == 'simulator':
+        from simulator import SimulatedGpio
+        return SimulatedGpio.from_env()
+    if ':' in name:
+        module, attr = name.split(':', 1)
+        backend = getattr(importlib.import_module(module), attr)
+        return backend() if isinstance(backend, type) else backend
+    raise ValueError(f"Unknown GPIO backend: {name}")
@@ -0,0 +1,583 @@
+"""Micro-benchmarks for the DHT11 acquisition code
+
+Runs without hardware. Usage:
+    python benchmark.py            # run all benchmarks
+    python benchmark.py decode     # run one benchmark by name
+"""
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+from alerts import AlertEngine, Rule, summary
+from collector import StandInCollector
+from decoder import decode_frame
+from fake_lgpio import FakeLgpio, frame_edges
+from filters import Kalman, Pipeline, Reject, default_stages
+from history import History
+from metrics import PUBLISHED, READ_FAILURES
+from publisher import HttpTransport, Publisher, Spool
+from retry import RetryPolicy
+from scheduler import Scheduler
+from sensor import DHT11
+from simulator import SimulatedGpio
+
+
+def synthetic_widths(data, jitter=4.0, rng=random):
+    """HIGH pulse widths (µs) for 5 data bytes with random jitter"""
+    widths = array('d')
+    for byte in data:
+        for i in range(7, -1, -1):
+            base = 70.0 if (byte >> i) & 1 else 27.0
+            widths.append(base + rng.uniform(-jitter, jitter))
+    return widths
+
+
+def bench_decode(frames=1_000_000):
+    """Decode cost per reading"""
+    rng = random.Random(1)
+    pool = []
+    for _ in range(256):
+        h, t, d = rng.randrange(20, 95), rng.randrange(0, 50), rng.randrange(10)
+        data = [h, 0, t, d, (h + t + d) & 0xFF]
+        pool.append(synthetic_widths(data, rng=rng))
+
+    ok = 0
+    start = time.perf_counter()
+    for i in range(frames):
+        if decode_frame(pool[i & 255]).checksum_ok:
+            ok += 1
+    elapsed = time.perf_counter() - start
+
+    print(f"decode: {frames} frames in {elapsed:.2f}s, "
+          f"{elapsed / frames * 1e6:.2f}µs/frame, {ok} checksums OK")
+
+
+def bench_scheduler(count=12, duration=5.0):
+    """Aggregate throughput of many sensors on one simulated gpiochip"""
+    gpio = FakeLgpio()
+    chip = gpio.gpiochip_open(0)
+    pins = list(range(2, 2 + count))
+    for pin in pins:
+        gpio.load_trace(pin, frame_edges([40 + pin, 0, 20, pin, (60 + 2 * pin) & 0xFF]), repeat=True)
+
+    results = []
+    sensors = [DHT11(pin=pin, gpio=gpio, h=chip) for pin in pins]
+    scheduler = Scheduler(sensors, lambda sensor, h, t: results.append(h is not None))
+    runner = threading.Thread(target=scheduler.run)
+    runner.start()
+    time.sleep(duration)
+    scheduler.stop()
+    runner.join()
+
+    print(f"scheduler: {count} sensors, {sum(results)}/{len(results)} reads OK in {duration:.0f}s, "
+          f"{scheduler.throughput():.2f} reads/s (ideal {count / DHT11.min_interval:.0f}), "
+          f"{sum(s.has_reading for s in scheduler.store.snapshots().values())} sensors with a reading")
+
+
+def noisy_stream(samples, spike_rate=0.01, seed=2):
+    """1 Hz readings with noise and bit-slip spikes; yields (t, h, t, is_spike)"""
+    import math
+    rng = random.Random(seed)
+    for i in range(samples):
+        humidity = 50 + 10 * math.sin(i / 3600) + rng.gauss(0, 0.5)
+        temperature = 22 + 3 * math.sin(i / 7200) + rng.gauss(0, 0.2)
+        spike = rng.random() < spike_rate
+        if spike:
+            # A flipped high bit in the integral byte
+            if rng.random() < 0.5:
+                humidity += rng.choice((16, 32, 64, -16, -32))
+            else:
+                temperature += rng.choice((8, 16, 32, -8, -16))
+        yield float(i), round(humidity), round(temperature, 1), spike
+
+
+def bench_filters(samples=200_000):
+    """Per-sample filter cost and spike rejection on a synthetic stream"""
+    stream = list(noisy_stream(samples))
+    spikes = sum(s[3] for s in stream)
+    for name, stages in (('default', default_stages()),
+                         ('default + Kalman', default_stages() + [Kalman()])):
+        pipeline = Pipeline(stages)
+        caught = 0
+        start = time.perf_counter()
+        for t, h, c, spike in stream:
+            try:
+                pipeline.process(t, h, c)
+            except Reject:
+                caught += spike
+        elapsed = time.perf_counter() - start
+        rejected = sum(pipeline.rejected.values())
+        print(f"filters ({name}): {elapsed / samples * 1e6:.2f}µs/sample, "
+              f"{caught}/{spikes} spikes rejected, {rejected - caught} good samples rejected, "
+              f"{pipeline.rejected}")
+
+
+def spin(stop):
+    """Burn CPU until stop is set"""
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def bench_timing(reads=100, contention=(0, 1, 4)):
+    """Decode success, read latency and CPU per reading under CPU load
+
+    Reads a simulated DHT11 with pulse jitter, dropped edges and corrupt
+    bits while n threads (competing for the GIL) and n processes
+    (competing for cores) spin. Edges arrive from the simulator's
+    delivery thread, as from lgpio's, so a starved capture path shows up
+    as timeouts and longer reads.
+    """
+    print(f"timing: {reads} reads per level, 3µs jitter, 0.1% dropped edges, 1% corrupt frames")
+    for n in contention:
+        gpio = SimulatedGpio(seed=n, jitter_us=3.0, drop_rate=0.001, corrupt_rate=0.01)
+        pin = 100 + n   # One metrics label per level
+        sensor = DHT11(pin=pin, gpio=gpio, h=gpio.gpiochip_open(0))
+
+        thread_stop = threading.Event()
+        process_stop = multiprocessing.Event()
+        load = [threading.Thread(target=spin, args=(thread_stop,)) for _ in range(n)]
+        load += [multiprocessing.Process(target=spin, args=(process_stop,)) for _ in range(n)]
+        for worker in load:
+            worker.start()
+
+        latencies, cpu, ok = [], [], 0
+        try:
+            for _ in range(reads):
+                sensor.next_start = 0   # The simulator does not enforce min_interval
+                start, start_cpu = time.perf_counter(), time.thread_time()
+                humidity, temperature = sensor.read()
+                cpu.append(time.thread_time() - start_cpu)
+                latencies.append(time.perf_counter() - start)
+                ok += humidity is not None
+        finally:
+            thread_stop.set()
+            process_stop.set()
+            for worker in load:
+                worker.join()
+            sensor.close()
+
+        failures = {phase: count for (label, phase), count in READ_FAILURES.values.items()
+                    if label == str(pin)}
+        print(f"  {n} busy threads + {n} busy processes: {ok / reads:.1%} decoded, "
+              f"read p50 {percentile(latencies, 0.5) * 1e3:.1f}ms "
+              f"p99 {percentile(latencies, 0.99) * 1e3:.1f}ms, "
+              f"{sum(cpu) / reads * 1e6:.0f}µs CPU/read (reader thread), failures {failures}")
+
+
+def load_app(history_path=None):
+    """Build the web app on the simulated backend; returns (module, app, station)"""
+    os.environ.setdefault('DHT_GPIO_BACKEND', 'simulator')
+    import app as module
+    history_path = history_path or os.path.join(tempfile.mkdtemp(), 'history.bin')
+    app = module.create_app(history_path=history_path, start=False)
+    return module, app, app.extensions['dht']
+
+
+def bench_stream(clients=200, duration=60, refresh=5):
+    """Requests and bytes: page refresh vs SSE vs ETag long-poll"""
+    _, app, station = load_app()
+    client = app.test_client()
+    pin = station.pins[0]
+
+    def new_reading(i):
+        station.store.publish(pin, 50.0 + i % 10, 20.0 + i % 5)
+        station.broadcaster.publish(station.version(), station.dumps(station.sensor_payload()))
+
+    # Baseline: every client reloads the full page every refresh seconds
+    new_reading(0)
+    poll_requests = clients * (duration // refresh)
+    page = len(client.get('/').data)
+    poll_bytes = poll_requests * page
+
+    # SSE: one request per client, one event per new reading (1 Hz)
+    streams = [iter(client.get('/sensor/stream', buffered=False).response) for _ in range(clients)]
+    sse_bytes = sum(len(next(s)) for s in streams)      # retry: line
+    sse_bytes += sum(len(next(s)) for s in streams)     # current reading
+    for i in range(1, duration):
+        new_reading(i)
+        sse_bytes += sum(len(next(s)) for s in streams)
+    for s in streams:
+        s.close()
+
+    # Long-poll: each client asks again with its ETag after every reading;
+    # asking again before a new reading arrives costs a bodyless 304
+    etag = client.get('/sensor').headers['ETag']
+    lp_requests = lp_bytes = not_modified = 0
+    for i in range(duration):
+        new_reading(i)
+        for _ in range(clients):
+            response = client.get('/sensor', headers={'If-None-Match': etag})
+            lp_requests += 1
+            lp_bytes += len(response.data)
+        etag = response.headers['ETag']
+        response = client.get('/sensor', headers={'If-None-Match': etag})
+        not_modified += response.status_code == 304 and not response.data
+
+    updates = clients * duration
+    print(f"stream: {clients} clients for {duration}s, 1 reading/s")
+    print(f"  page refresh every {refresh}s: {poll_requests} requests, {poll_bytes} bytes, "
+          f"{poll_bytes / poll_requests:.0f} bytes/update, misses {refresh - 1} of {refresh} readings")
+    print(f"  SSE /sensor/stream: {clients} requests ({poll_requests / clients:.0f}x fewer), "
+          f"{sse_bytes} bytes, {sse_bytes / updates:.0f} bytes/update, every reading delivered")
+    print(f"  long-poll /sensor: {lp_requests} requests, {lp_bytes} bytes, "
+          f"{lp_bytes / lp_requests:.0f} bytes/update; {not_modified}/{duration} repeat asks got an empty 304")
+
+
+def bench_dashboard(requests=2000):
+    """Dashboard requests/sec: render per hit vs cached page"""
+    from flask import render_template_string
+    module, app, station = load_app()
+    client = app.test_client()
+    station.store.publish(station.pins[0], 55.0, 21.3)
+
+    def uncached():
+        # What index() did before: compile and render the template per hit
+        snapshot = station.primary_snapshot()
+        alerts = summary(station.alerts(), snapshot.sensor_id)
+        return render_template_string(
+            module.HTML_TEMPLATE,
+            temperature=snapshot.temperature,
+            humidity=snapshot.humidity,
+            temperature_status=module.alert_status(snapshot.temperature, alerts.get('temperature')),
+            humidity_status=module.alert_status(snapshot.humidity, alerts.get('humidity')),
+            last_reading=None,
+            stale=False,
+            error=None)
+    app.add_url_rule('/bench/uncached', 'bench_uncached', uncached)
+
+    def rate(path, headers=None):
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = client.get(path, headers=headers)
+        return requests / (time.perf_counter() - start), response
+
+    before, _ = rate('/bench/uncached')
+    cached, full = rate('/')
+    gzipped, gz = rate('/', {'Accept-Encoding': 'gzip'})
+    revalidated, not_modified = rate('/', {'If-None-Match': full.headers['ETag']})
+
+    print(f"dashboard: {requests} requests each")
+    print(f"  render_template_string per hit: {before:.0f} req/s")
+    print(f"  cached page:                    {cached:.0f} req/s ({cached / before:.1f}x), {len(full.data)} bytes")
+    print(f"  cached gzip page:               {gzipped:.0f} req/s, {len(gz.data)} bytes")
+    print(f"  If-None-Match revalidation:     {revalidated:.0f} req/s, {not_modified.status_code} with {len(not_modified.data)} bytes")
+
+
+def bench_startup():
+    """Time from create_app() to the first /sensor answer and to the first reading"""
+    os.environ.setdefault('DHT_GPIO_BACKEND', 'simulator')
+    start = time.perf_counter()
+    import app as module
+    imported = time.perf_counter() - start
+    start = time.perf_counter()
+    app = module.create_app(history_path=os.path.join(tempfile.mkdtemp(), 'history.bin'))
+    station = app.extensions['dht']
+    client = app.test_client()
+    status = client.get('/sensor').json['status']
+    answered = time.perf_counter() - start
+    while client.get('/ready').status_code != 200:
+        time.sleep(0.001)
+    ready = time.perf_counter() - start
+    station.close()
+    print(f"startup: import {imported * 1e3:.0f}ms; after create_app() /sensor answered "
+          f"'{status}' in {answered * 1e3:.1f}ms, first reading after {ready * 1e3:.0f}ms")
+
+
+def metric_total(text, name):
+    """Sum of all series of one counter in a metrics exposition"""
+    return sum(float(line.rsplit(' ', 1)[1]) for line in text.splitlines()
+               if line.startswith(name + '{'))
+
+
+def bench_isolation(sensors=10, clients=4, duration=15.0):
+    """Decode success under web load: acquisition thread vs separate process"""
+    os.environ.setdefault('DHT_GPIO_BACKEND', 'simulator')
+    os.environ.setdefault('DHT_SIM_JITTER_US', '3')
+    import app as module
+    print(f"isolation: {sensors} simulated sensors at 1 Hz, {clients} clients hammering the web app")
+    for mode in ('process', 'thread'):
+        app = module.create_app(pins=list(range(2, 2 + sensors)), mode=mode, start=False,
+                                history_path=os.path.join(tempfile.mkdtemp(), 'history.bin'))
+        station = app.extensions['dht']
+        station.start()
+        while station.acquisition.state != 'ready':
+            time.sleep(0.05)
+        before = station.acquisition.metrics()
+
+        stop = threading.Event()
+        served = []
+
+        def client():
+            c = app.test_client()
+            n = 0
+            while not stop.is_set():
+                c.get('/sensor')
+                c.get('/sensor/history?limit=500')
+                n += 2
+            served.append(n)
+
+        load = [threading.Thread(target=client) for _ in range(clients)]
+        for t in load:
+            t.start()
+        time.sleep(duration)
+        stop.set()
+        for t in load:
+            t.join()
+        time.sleep(1.5)     # Let the process mode record catch up
+        after = station.acquisition.metrics()
+        station.close()
+
+        attempts = metric_total(after, 'dht_read_attempts_total') - metric_total(before, 'dht_read_attempts_total')
+        ok = metric_total(after, 'dht_read_successes_total') - metric_total(before, 'dht_read_successes_total')
+        print(f"  {mode:7s}: {ok:.0f}/{attempts:.0f} reads decoded ({ok / max(attempts, 1):.1%}), "
+              f"{sum(served) / duration:.0f} web requests/s served")
+
+
+def bench_retry(hours=1.0, corrupt_rate=0.05, no_response_rate=0.01, outage=(1200.0, 1800.0)):
+    """Readings and start pulses of retry strategies on a simulated clock
+
+    A DHT11 sends corrupt frames at corrupt_rate, misses responses at
+    no_response_rate and is unplugged during outage (seconds). Compares
+    the original loop (2 s sleep, plus a 2 s monitor_pin after every
+    failure), a plain loop at the minimum interval and RetryPolicy.
+    """
+    duration = hours * 3600
+
+    def fixed(interval, penalty):
+        return lambda phase, now: interval + (penalty if phase else 0.0)
+
+    def policy():
+        return RetryPolicy(DHT11.min_interval, seed=1).record
+
+    print(f"retry: {hours:g}h simulated, {corrupt_rate:.0%} corrupt frames, "
+          f"{no_response_rate:.0%} missed responses, unplugged {outage[0]:.0f}-{outage[1]:.0f}s")
+    for name, strategy in (('2 s loop + monitor_pin', fixed(2.0, 2.0)),
+                           ('min interval, no policy', fixed(DHT11.min_interval, 0.0)),
+                           ('RetryPolicy', policy())):
+        rng = random.Random(7)
+        now, good, pulses, outage_pulses, recovered = 0.0, 0, 0, 0, None
+        while now < duration:
+            pulses += 1
+            if outage[0] <= now < outage[1]:
+                phase = 'no_response_low'
+                outage_pulses += 1
+            elif rng.random() < no_response_rate:
+                phase = 'no_response_low'
+            elif rng.random() < corrupt_rate:
+                phase = 'checksum'
+            else:
+                phase = None
+                good += 1
+                if recovered is None and now >= outage[1]:
+                    recovered = now - outage[1]
+            now += strategy(phase, now) + 0.02     # Start pulse and capture
+        print(f"  {name:24s}: {good / duration:.2f} readings/s (target {1 / DHT11.min_interval:.2f}), "
+              f"{pulses} start pulses, {outage_pulses} while unplugged, "
+              f"first reading {recovered:.1f}s after replugging")
+
+
+def export_worker(history_path, url, results):
+    """Child process of bench_export: stream url, report (bytes, seconds, peak RSS, its growth)"""
+    import resource
+    _, app, station = load_app(history_path)
+    client = app.test_client()
+    client.get('/sensor/export?limit=1').close()     # Import and warm everything up first
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if url is None:
+        # Baseline: the whole range as one jsonify()ed list, as /sensor/history builds it
+        readings = station.history.query(0, float('inf'))
+        with app.app_context():
+            body = app.json.response([
+                {'timestamp': t, 'sensor': s, 'humidity': round(h, 1), 'temperature': round(c, 1)}
+                for t, s, h, c, _ in readings]).get_data()
+        size = len(body)
+    else:
+        response = client.get(url, buffered=False)
+        size = sum(len(chunk) for chunk in response.response)
+        response.close()
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    station.close()
+    results.put((size, elapsed, peak, peak - rss))
+
+
+def bench_export(rows=1_000_000):
+    """Records/s and peak RSS growth of streamed exports vs one jsonify()ed list
+
+    Each export runs in a fresh process so its peak RSS is its own. The
+    growth includes the history pages mapped while reading (20 bytes a
+    record), which the page cache shares with the writer.
+    """
+    path = os.path.join(tempfile.mkdtemp(), 'history.bin')
+    # Small batches: spawned children start out with this process's peak RSS
+    history = History(path, capacity=rows, batch_size=1 << 16)
+    for i in range(rows):
+        history.append(1.7e9 + i, 23 + i % 4, 40 + i % 20, 20 + (i % 50) / 10)
+    history.close()
+
+    context = multiprocessing.get_context('spawn')
+    print(f"export: {rows} records, {os.path.getsize(path) / 1e6:.0f} MB history file")
+    for name, url in (('ndjson', '/sensor/export'), ('csv', '/sensor/export?format=csv'),
+                      ('binary', '/sensor/export?format=binary'),
+                      ('ndjson, one sensor', '/sensor/export?sensor=23'),
+                      ('jsonify() list', None)):
+        results = context.Queue()
+        worker = context.Process(target=export_worker, args=(path, url, results))
+        worker.start()
+        size, elapsed, peak, grown = results.get()
+        worker.join()
+        print(f"  {name:18s}: {rows / elapsed:10,.0f} records/s, {size / elapsed / 1e6:6.1f} MB/s, "
+              f"{size / 1e6:5.0f} MB, peak RSS {peak / 1024:.0f} MB (+{grown / 1024:.0f} MB)")
+
+
+def wait_for(condition, timeout):
+    """Seconds until condition() held, polled every 10ms; None on timeout"""
+    start = time.perf_counter()
+    while not condition():
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.01)
+    return time.perf_counter() - start
+
+
+def bench_publish(readings=200_000, rate=500, outage=10.0):
+    """Sustained readings/s to a local collector, and backlog recovery after an outage
+
+    The sustained run submits readings as fast as possible; submit() is
+    what the sensor thread pays. The recovery run submits rate readings/s
+    while the collector is down for outage seconds, then measures how
+    long the spooled backlog takes to reach it once it is back.
+    """
+    collector = StandInCollector(keep=False)
+    publisher = Publisher(HttpTransport(collector.url), Spool(tempfile.mkdtemp()),
+                          flush_interval=0.5, buffer_size=readings)
+    publisher.start()
+    sent = PUBLISHED.values.get((), 0)
+    start = time.perf_counter()
+    for i in range(readings):
+        publisher.submit(1.7e9 + i, 23, 45.0, 21.5)
+    submitted = time.perf_counter() - start
+    elapsed = wait_for(lambda: collector.readings >= readings, 120) or float('nan')
+    elapsed += submitted
+    publisher.close()
+    print(f"publish: {readings} readings in batches of {publisher.batch_size}, "
+          f"{submitted / readings * 1e6:.2f}µs per submit()")
+    print(f"  sustained: {collector.readings / elapsed:,.0f} readings/s delivered, "
+          f"{collector.requests / elapsed:.0f} requests/s over {collector.connections} connection(s), "
+          f"{PUBLISHED.values.get((), 0) - sent} acknowledged")
+
+    collector = StandInCollector(keep=False)
+    publisher = Publisher(HttpTransport(collector.url), Spool(tempfile.mkdtemp()), flush_interval=0.5)
+    publisher.start()
+    collector.down()
+    total = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < outage:
+        for _ in range(rate // 10):
+            publisher.submit(time.time(), 23, 45.0, 21.5)
+        total += rate // 10
+        time.sleep(0.1)
+    spooled = len(publisher.spool)
+    collector.up()
+    first = wait_for(lambda: collector.readings > 0, 120)
+    drained = wait_for(lambda: collector.readings >= total, 120)
+    publisher.close()
+    print(f"  recovery: {total} readings ({spooled} batches) spooled during a {outage:.0f}s outage; "
+          f"first batch {first:.1f}s after the collector returned (retry backoff), "
+          f"backlog drained {first + drained:.1f}s after, at {publisher.drain_rate:.0f} batches/s")
+
+
+def naive_alerts(rules):
+    """Per-reading evaluation without compiling: every rule, fields and operators by name"""
+    state = {}
+
+    def evaluate(sensor_id, timestamp, humidity, temperature):
+        values = {'humidity': humidity, 'temperature': temperature}
+        for rule in rules:
+            if rule.sensors is not None and sensor_id not in rule.sensors:
+                continue
+            value = values[rule.field]
+            above = value > rule.threshold if rule.op == '>' else value < rule.threshold
+            state[rule.name, sensor_id] = above
+    return evaluate
+
+
+def bench_alerts(readings=200_000):
+    """Alert evaluation cost per reading as sensors and rules grow, and flapping
+
+    Every sensor has 4 rules of its own (per-sensor thresholds, one on
+    the rate of change) plus 2 rules for all sensors.
+    """
+    logging.getLogger('alerts').setLevel(logging.ERROR)
+    print(f"alerts: {readings} readings per setup, 4 rules per sensor + 2 global")
+    for sensors in (1, 10, 100, 1000):
+        rules = [Rule('temperature_high', 'temperature', '>', 40, hysteresis=0.5),
+                 Rule('humidity_high', 'humidity', '>', 89, hysteresis=1.0)]
+        for pin in range(sensors):
+            rules += [Rule(f'hot_{pin}', 'temperature', '>', 30 + pin % 5, 0.5, duration=60, sensors=[pin]),
+                      Rule(f'cold_{pin}', 'temperature', '<', 5, 0.5, sensors=[pin]),
+                      Rule(f'dry_{pin}', 'humidity', '<', 20, 1.0, duration=300, sensors=[pin]),
+                      Rule(f'jump_{pin}', 'temperature', '>', 2.0, 0.5, rate=True, window=60, sensors=[pin])]
+        rng = random.Random(3)
+        stream, temperature = [], [20.0] * sensors
+        for i in range(readings):
+            pin = i % sensors
+            temperature[pin] += rng.gauss(0, 0.05)
+            stream.append((pin, float(i // sensors), 50 + rng.gauss(0, 2), temperature[pin]))
+        timings = []
+        for evaluate in (AlertEngine(rules).evaluate, naive_alerts(rules)):
+            start = time.perf_counter()
+            for pin, t, h, c in stream:
+                evaluate(pin, t, h, c)
+            timings.append((time.perf_counter() - start) / readings * 1e6)
+        print(f"  {sensors:4d} sensors, {len(rules):4d} rules: compiled {timings[0]:.2f}µs/reading, "
+              f"checking every rule {timings[1]:.2f}µs/reading")
+
+    # Temperature hovering around a 30°C limit with 0.3°C of noise
+    rng = random.Random(4)
+    stream = [30 + rng.gauss(0, 0.3) for _ in range(3600)]
+    for name, rule in (('no hysteresis', Rule('hot', 'temperature', '>', 30)),
+                       ('0.5°C hysteresis', Rule('hot', 'temperature', '>', 30, hysteresis=0.5)),
+                       ('hysteresis + 60s', Rule('hot', 'temperature', '>', 30, hysteresis=0.5, duration=60))):
+        engine = AlertEngine([rule])
+        fired = sum(any(c['state'] == 'firing' for c in engine.evaluate(23, float(t), 50.0, value))
+                    for t, value in enumerate(stream))
+        print(f"  1 h at 30±0.3°C against a 30°C limit, {name}: fired {fired} times")
+
+
+BENCHMARKS = {
+    'decode': bench_decode,
+    'scheduler': bench_scheduler,
+    'stream': bench_stream,
+    'dashboard': bench_dashboard,
+    'filters': bench_filters,
+    'timing': bench_timing,
+    'startup': bench_startup,
+    'isolation': bench_isolation,
+    'retry': bench_retry,
+    'export': bench_export,
+    'publish': bench_publish,
+    'alerts': bench_alerts,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
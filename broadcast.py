@@ -0,0 +1,54 @@
+"""Single broadcaster fanning out new readings to waiting clients
+
+The sensor side publishes one pre-serialized payload per new reading.
+Subscribers (SSE streams, long-poll requests) block on one shared
+condition and are all woken together; nothing polls per client.
+
+Versions are opaque: any change counts as new, so a writer that
+restarts its sequence numbers (with a new epoch in the version) is
+still picked up.
+"""
+import threading
+
+
+class Broadcaster:
+    """Latest (version, payload) with wake-up on change"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = None
+        self.payload = None
+
+    def publish(self, version, payload):
+        """Store a new payload and wake every subscriber"""
+        with self._cond:
+            self.version = version
+            self.payload = payload
+            self._cond.notify_all()
+
+    def wait(self, version, timeout):
+        """Wait until a version other than the given one is published
+
+        Returns the current (version, payload), changed or not.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version, self.payload
+
+    def subscribe(self, version=None, keepalive=15.0):
+        """Yield (version, payload) for every new version
+
+        Starts with the current payload unless version is already the
+        current one. Yields (version, None) when nothing changed within
+        keepalive seconds, so the caller can keep the connection alive.
+        """
+        current, payload = self.version, self.payload
+        if current != version and payload is not None:
+            yield current, payload
+        while True:
+            new, payload = self.wait(current, keepalive)
+            if new == current:
+                yield current, None
+            else:
+                current = new
+                yield current, payload
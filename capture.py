@@ -0,0 +1,121 @@
+"""Edge-timestamp capture for the DHT11 single-wire protocol
+
+Instead of polling the data line from Python, the line is claimed for
+alerts and lgpio records a kernel timestamp for every level change. The
+whole response is collected into a buffer and decoded afterwards from
+the pulse widths, so CPU load during the frame no longer corrupts bits.
+"""
+import threading
+import time
+from array import array
+
+from decoder import FRAME_BITS
+
+# A complete frame has 42 falling edges: the response LOW, the end of the
+# response HIGH and the end of each of the 40 data bits
+FRAME_FALLING_EDGES = 42
+
+# How long to wait for a frame after releasing the line. A frame lasts
+# about 5ms, but its edges carry kernel timestamps, so they decode fine
+# however late a loaded system delivers them; only a missing sensor
+# should run into this.
+CAPTURE_TIMEOUT = 0.1
+
+
+class CaptureError(RuntimeError):
+    """Frame could not be captured or decoded
+
+    ``phase`` names the step that failed: 'start', 'no_response_low',
+    'no_response_high', 'bit', 'checksum' or 'empty' (an all-zero frame).
+    """
+
+    def __init__(self, phase, message, bit=None):
+        super().__init__(message)
+        self.phase = phase
+        self.bit = bit      # First missing bit for phase 'bit'
+
+
+class EdgeCapture:
+    """Record the sensor response on one pin as (level, tick) edges"""
+
+    def __init__(self, line):
+        self.line = line
+        self.edges = []
+        self.released = 0   # time.time_ns() when the line was released
+        self._falling = 0
+        self._done = threading.Event()
+        self._armed = False
+        gpio = line.gpio
+        self._cb = gpio.callback(line.h, line.pin, gpio.BOTH_EDGES, self._on_edge)
+
+    def _on_edge(self, chip, gpio, level, tick):
+        """Alert callback, runs in lgpio's notification thread"""
+        if not self._armed or level > 1:  # level 2 is a watchdog timeout
+            return
+        self.edges.append((level, tick))
+        if level == 0:
+            self._falling += 1
+            if self._falling >= FRAME_FALLING_EDGES:
+                self._done.set()
+
+    def arm(self):
+        """Clear the buffer and start accepting edges"""
+        self.edges = []
+        self._falling = 0
+        self._done.clear()
+        self._armed = True
+        # lgpio edge ticks are nanoseconds since the epoch
+        self.released = time.time_ns()
+
+    def read(self, timeout=CAPTURE_TIMEOUT):
+        """Send the start pulse and return the captured edge buffer
+
+        Returns as soon as the whole frame is in, else after timeout
+        seconds. The line is left claimed for alerts, idling HIGH through
+        the pull-up until the next start pulse.
+        """
+        try:
+            # Pull down for at least 18ms
+            self.line.output(0)
+            time.sleep(0.018)
+            # Release the line; the pull-up raises it and the sensor answers
+            self.arm()
+            self.line.alert()
+        except Exception as e:
+            self._armed = False
+            self.line.reset()
+            raise CaptureError('start', f"Error sending start signal: {e}")
+
+        self._done.wait(timeout)
+        self._armed = False
+        return list(self.edges)
+
+    def cancel(self):
+        """Unregister the alert callback"""
+        self._cb.cancel()
+
+
+def pulse_widths(edges):
+    """Return the widths in µs of the 40 data HIGH pulses of a frame"""
+    falling = sum(1 for level, _ in edges if level == 0)
+    if falling == 0:
+        raise CaptureError('no_response_low', "Timeout waiting for sensor response (still HIGH)")
+    if falling == 1:
+        raise CaptureError('no_response_high', "Timeout waiting for sensor response (still LOW)")
+
+    widths = array('d')
+    rise = None
+    for level, tick in edges:
+        if level == 1:
+            rise = tick
+        elif rise is not None:
+            widths.append((tick - rise) / 1000.0)
+            rise = None
+
+    # The first complete HIGH is the 80µs response; a leading host-release
+    # HIGH may precede it. The data bits are always the last 40.
+    if len(widths) < FRAME_BITS + 1:
+        bit = max(len(widths) - 1, 0)
+        raise CaptureError('bit', f"Timeout waiting for bit {bit}", bit)
+    return widths[-FRAME_BITS:]
+
@@ -1,9 +1,11 @@
-import lgpio
 import time
 
+from backend import load_backend
+
 def cleanup():
     print("Cleaning up GPIO...")
     try:
+        lgpio = load_backend()
         for i in range(4):
             try:
                 h = lgpio.gpiochip_open(i)
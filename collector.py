@@ -0,0 +1,80 @@
+"""Stand-in HTTP collector for the publisher and webhook, without a network
+
+Accepts POSTs on 127.0.0.1 over keep-alive connections and keeps what
+it got, so benchmark.py and the tests can check delivery, order and
+outages. It answers with `status`, which can be changed at any time to
+have batches refused, and can be taken down and brought back up on
+the same port.
+"""
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInCollector:
+    """Local HTTP collector recording the bodies POSTed to it; can be taken down
+
+    Bodies are kept gunzipped if sent with Content-Encoding: gzip.
+    readings counts their lines (one per NDJSON reading). Only accepted
+    bodies are kept and counted.
+    """
+
+    def __init__(self, port=0, status=204, keep=True):
+        collector = self
+        self.status = status
+        self.keep = keep            # Whether to keep the bodies, or only count them
+        self.bodies = []
+        self.readings = 0
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'   # Keep-alive
+
+            def setup(self):
+                super().setup()
+                with collector._lock:
+                    collector.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                if self.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                status = collector.status
+                with collector._lock:
+                    collector.requests += 1
+                    if status < 300:
+                        collector.readings += body.count(b'\n')
+                        if collector.keep:
+                            collector.bodies.append(body)
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.handler = Handler
+        self.server = None
+        self.port = port
+        self.up()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}/readings'
+
+    def up(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', self.port), self.handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def down(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def lines(self):
+        """Every line of the accepted bodies, in the order they arrived"""
+        with self._lock:
+            return [line for body in self.bodies for line in body.splitlines()]
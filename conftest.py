@@ -0,0 +1,35 @@
+"""pytest configuration: the modules live at the top of the repository
+
+Having this file here puts the repository root on sys.path, so the
+tests in tests/ import the modules as the app does. Helpers shared by
+the test files are fixtures here.
+"""
+import time
+
+import pytest
+
+from collector import StandInCollector
+
+
+def poll(condition, timeout=10.0):
+    """True once condition() holds, polled every 10ms; False on timeout"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def wait_for():
+    """poll(condition, timeout=10.0), for tests of background threads"""
+    return poll
+
+
+@pytest.fixture
+def collector():
+    """A StandInCollector on a free local port, taken down afterwards"""
+    collector = StandInCollector()
+    yield collector
+    collector.down()
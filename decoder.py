@@ -0,0 +1,90 @@
+"""DHT frame decoder
+
+Turns the 40 HIGH pulse widths of a frame into a checked reading. The
+0/1 cutoff is learned from the frame itself instead of being fixed, so
+slow or fast sensors and timestamp skew do not shift bits.
+"""
+
+FRAME_BITS = 40
+
+# Fallback cutoff when all bits in a frame have the same value and there
+# are no two clusters to split: 26-28µs is a 0 bit, 70µs is a 1 bit
+DEFAULT_THRESHOLD_US = 50.0
+
+# Below this spread (in µs) the widths form a single cluster
+MIN_SPREAD_US = 20.0
+
+
+class Frame:
+    """Decoded frame: values, raw bytes and checksum status"""
+
+    __slots__ = ('humidity', 'temperature', 'data', 'checksum_ok', 'threshold')
+
+    def __init__(self, humidity, temperature, data, checksum_ok, threshold):
+        self.humidity = humidity
+        self.temperature = temperature
+        self.data = data
+        self.checksum_ok = checksum_ok
+        self.threshold = threshold
+
+    def __repr__(self):
+        return (f"Frame(humidity={self.humidity}, temperature={self.temperature}, "
+                f"data={list(self.data)}, checksum_ok={self.checksum_ok}, "
+                f"threshold={self.threshold:.1f})")
+
+
+def bit_threshold(widths):
+    """Return the midpoint between the short and long pulse clusters
+
+    Starts from the midpoint of the range and refines it once with the
+    mean of each side (one step of 2-means).
+    """
+    lo = min(widths)
+    hi = max(widths)
+    if hi - lo < MIN_SPREAD_US:
+        return DEFAULT_THRESHOLD_US
+    mid = (lo + hi) * 0.5
+    short_sum = long_sum = 0.0
+    short_n = 0
+    for w in widths:
+        if w > mid:
+            long_sum += w
+        else:
+            short_sum += w
+            short_n += 1
+    return (short_sum / short_n + long_sum / (len(widths) - short_n)) * 0.5
+
+
+def decode_frame(widths, model='dht11'):
+    """Decode 40 HIGH pulse widths (µs) into a Frame
+
+    widths can be any sequence of numbers: a list, an array.array or a
+    NumPy array. All 40 bits are packed into one integer in a single pass.
+    """
+    if len(widths) != FRAME_BITS:
+        raise ValueError(f"Expected {FRAME_BITS} pulse widths, got {len(widths)}")
+
+    threshold = bit_threshold(widths)
+    value = 0
+    for w in widths:
+        value <<= 1
+        if w > threshold:
+            value |= 1
+
+    data = value.to_bytes(5, 'big')
+    b0, b1, b2, b3, b4 = data
+    checksum_ok = ((b0 + b1 + b2 + b3) & 0xFF) == b4
+
+    if model == 'dht22':
+        humidity = ((b0 << 8) | b1) / 10.0
+        temperature = (((b2 & 0x7F) << 8) | b3) / 10.0
+        if b2 & 0x80:
+            temperature = -temperature
+    else:
+        # DHT11: integral byte followed by a decimal byte, sign in bit 7
+        humidity = b0 + b1 / 10.0
+        temperature = b2 + (b3 & 0x7F) / 10.0
+        if b3 & 0x80:
+            temperature = -temperature
+
+    return Frame(humidity, temperature, data, checksum_ok, threshold)
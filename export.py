@@ -0,0 +1,61 @@
+"""Streamed bulk export of the reading history
+
+A range of History sequence numbers is read in chunks (RingFile.scan)
+and every chunk is encoded into one block of NDJSON, CSV or packed
+binary, so memory stays constant however many records are exported,
+and no per-record JSON encoder or response object is involved. The
+sequence numbers are the export cursor: a collector asks for
+?since=<the X-Next-Since of its last export> and gets only new records.
+"""
+import struct
+
+# Binary format: sequence number followed by the history record:
+# sequence, timestamp, sensor id, flags, humidity, temperature
+EXPORT_RECORD = struct.Struct('<QdHHff')
+
+CSV_HEADER = 'seq,timestamp,sensor,humidity,temperature\n'
+
+
+def _rows(chunks, sensor_id):
+    """(sequence, record) per chunk, optionally only for one sensor"""
+    for first, records in chunks:
+        rows = enumerate(records, first)
+        if sensor_id is not None:
+            rows = [(seq, r) for seq, r in rows if r[1] == sensor_id]
+        yield rows
+
+
+def ndjson(chunks, sensor_id=None):
+    """One JSON object per line, as /sensor/history readings plus seq"""
+    for rows in _rows(chunks, sensor_id):
+        block = ''.join([
+            f'{{"seq":{seq},"timestamp":{t!r},"sensor":{s},"humidity":{h:.1f},"temperature":{c:.1f}}}\n'
+            for seq, (t, s, f, h, c) in rows])
+        if block:
+            yield block.encode()
+
+
+def csv(chunks, sensor_id=None):
+    """CSV with a header row"""
+    yield CSV_HEADER.encode()
+    for rows in _rows(chunks, sensor_id):
+        block = ''.join([f'{seq},{t!r},{s},{h:.1f},{c:.1f}\n' for seq, (t, s, f, h, c) in rows])
+        if block:
+            yield block.encode()
+
+
+def binary(chunks, sensor_id=None):
+    """Back-to-back little-endian EXPORT_RECORD structs, no header"""
+    pack = EXPORT_RECORD.pack
+    for rows in _rows(chunks, sensor_id):
+        block = b''.join([pack(seq, *record) for seq, record in rows])
+        if block:
+            yield block
+
+
+# format -> (encoder, content type)
+FORMATS = {
+    'ndjson': (ndjson, 'application/x-ndjson'),
+    'csv': (csv, 'text/csv; charset=utf-8'),
+    'binary': (binary, 'application/octet-stream'),
+}
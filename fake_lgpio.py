@@ -0,0 +1,190 @@
+"""Replayable stand-in for the lgpio module
+
+Exposes the subset of the lgpio API used by the DHT11 code. No hardware
+is touched: whenever the host releases the data line after a start
+pulse, a recorded (or synthesized) edge trace is replayed through the
+registered alert callbacks, the same way lgpio delivers them from its
+notification thread.
+"""
+import time
+
+from backend import GpioBackend
+
+# Values match the real lgpio module
+SET_PULL_UP = 32
+RISING_EDGE = 1
+FALLING_EDGE = 2
+BOTH_EDGES = 3
+
+
+class error(Exception):
+    """Raised like lgpio.error when a call is not allowed"""
+
+
+def frame_edges(data, t0=0, jitter=None):
+    """Build the DHT edge trace for 5 data bytes
+
+    Returns a list of (level, tick) tuples with ticks in nanoseconds,
+    matching what lgpio passes to alert callbacks. jitter, if given, is
+    called for every pulse and returns nanoseconds to add to its width.
+    """
+    if jitter is None:
+        jitter = lambda: 0
+    edges = []
+    t = t0 + 30000 + jitter()   # Sensor answers 20-40µs after release
+    edges.append((0, t))
+    t += 80000 + jitter()       # 80µs response LOW
+    edges.append((1, t))
+    t += 80000 + jitter()       # 80µs response HIGH
+    edges.append((0, t))
+    for byte in data:
+        for i in range(7, -1, -1):
+            t += 50000 + jitter()   # 50µs bit start LOW
+            edges.append((1, t))
+            t += (70000 if (byte >> i) & 1 else 27000) + jitter()
+            edges.append((0, t))
+    t += 50000                  # Sensor releases the line
+    edges.append((1, t))
+    return edges
+
+
+class _Callback:
+    def __init__(self, fake, key, edge, func):
+        self._fake = fake
+        self._key = key
+        self.edge = edge
+        self.func = func
+
+    def cancel(self):
+        callbacks = self._fake._callbacks.get(self._key, [])
+        if self in callbacks:
+            callbacks.remove(self)
+
+
+class FakeLgpio(GpioBackend):
+    """lgpio-compatible object that replays edge traces per pin"""
+
+    SET_PULL_UP = SET_PULL_UP
+    RISING_EDGE = RISING_EDGE
+    FALLING_EDGE = FALLING_EDGE
+    BOTH_EDGES = BOTH_EDGES
+    error = error
+
+    def __init__(self):
+        self._next_handle = 0
+        self._open = set()
+        self._modes = {}        # (handle, pin) -> 'input' | 'output' | 'alert'
+        self._levels = {}       # (handle, pin) -> current level
+        self._traces = {}       # pin -> list of traces still to replay
+        self._callbacks = {}    # (handle, pin) -> [_Callback]
+        self.calls = []         # Log of every call, for inspection
+
+    def load_trace(self, pin, edges, repeat=False, released=0):
+        """Queue an edge trace to be replayed on the next start pulse
+
+        Ticks are taken relative to released, the tick at which the host
+        let go of the line (0 for frame_edges traces, capture.released
+        for a trace recorded on the Pi).
+        """
+        edges = [(level, tick - released) for level, tick in edges]
+        self._traces.setdefault(pin, []).append((edges, repeat))
+
+    # --- chip handling ---
+
+    def gpiochip_open(self, gpiochip):
+        self.calls.append(('gpiochip_open', gpiochip))
+        handle = self._next_handle
+        self._next_handle += 1
+        self._open.add(handle)
+        return handle
+
+    def gpiochip_close(self, handle):
+        self.calls.append(('gpiochip_close', handle))
+        self._check(handle)
+        self._open.discard(handle)
+        for key in [k for k in self._modes if k[0] == handle]:
+            del self._modes[key]
+
+    # --- line handling ---
+
+    def gpio_free(self, handle, gpio):
+        self.calls.append(('gpio_free', handle, gpio))
+        self._check(handle)
+        if self._modes.pop((handle, gpio), None) is None:
+            raise error("GPIO not claimed")
+
+    def gpio_claim_input(self, handle, gpio, lFlags=0):
+        self.calls.append(('gpio_claim_input', handle, gpio, lFlags))
+        self._claim(handle, gpio, 'input')
+        self._release(handle, gpio)
+
+    def gpio_claim_output(self, handle, gpio, level=0, lFlags=0):
+        self.calls.append(('gpio_claim_output', handle, gpio, level, lFlags))
+        self._claim(handle, gpio, 'output')
+        self._levels[(handle, gpio)] = level
+
+    def gpio_claim_alert(self, handle, gpio, eFlags, lFlags=0, notify_handle=None):
+        self.calls.append(('gpio_claim_alert', handle, gpio, eFlags, lFlags))
+        self._claim(handle, gpio, 'alert')
+        self._release(handle, gpio)
+
+    def gpio_write(self, handle, gpio, level):
+        self.calls.append(('gpio_write', handle, gpio, level))
+        self._check(handle)
+        if self._modes.get((handle, gpio)) != 'output':
+            raise error("GPIO not set as an output")
+        self._levels[(handle, gpio)] = level
+
+    def gpio_read(self, handle, gpio):
+        self._check(handle)
+        if (handle, gpio) not in self._modes:
+            raise error("GPIO not claimed")
+        return self._levels.get((handle, gpio), 1)
+
+    def callback(self, handle, gpio, edge=RISING_EDGE, func=None):
+        cb = _Callback(self, (handle, gpio), edge, func)
+        self._callbacks.setdefault((handle, gpio), []).append(cb)
+        return cb
+
+    # --- internals ---
+
+    def _check(self, handle):
+        if handle not in self._open:
+            raise error("bad handle")
+
+    def _claim(self, handle, gpio, mode):
+        self._check(handle)
+        current = self._modes.get((handle, gpio))
+        if current is not None and current != mode:
+            raise error("GPIO busy")
+        self._modes[(handle, gpio)] = mode
+
+    def _release(self, handle, gpio):
+        """Line switched to input: answer a pending start pulse"""
+        was_low = self._levels.get((handle, gpio)) == 0
+        self._levels[(handle, gpio)] = 1
+        if not was_low:
+            return
+        edges = self._response(gpio)
+        if edges:
+            self._replay(handle, gpio, edges, time.time_ns())
+
+    def _response(self, gpio):
+        """Edge trace answering a start pulse on gpio, or None"""
+        if not self._traces.get(gpio):
+            return None
+        edges, repeat = self._traces[gpio][0]
+        if not repeat:
+            self._traces[gpio].pop(0)
+        return edges
+
+    def _replay(self, handle, gpio, edges, base):
+        """Deliver edges to the alert callbacks, ticks offset by base"""
+        key = (handle, gpio)
+        for level, tick in edges:
+            if self._modes.get(key) != 'output':
+                self._levels[key] = level
+            for cb in list(self._callbacks.get(key, [])):
+                wanted = RISING_EDGE if level else FALLING_EDGE
+                if cb.func is not None and cb.edge & wanted:
+                    cb.func(handle, gpio, level, base + tick)
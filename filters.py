@@ -0,0 +1,191 @@
+"""Streaming signal-quality filters between the sensor and the store
+
+A frame can pass the checksum and still be garbage (bit slips). Each
+sensor gets a Pipeline of stages; a stage returns the (possibly
+smoothed) sample or raises Reject with a reason. Every stage keeps a
+fixed-size state, so the cost per sample is constant.
+"""
+from collections import deque
+
+
+class Reject(Exception):
+    """Sample dropped by a filter stage; str(e) is the reason"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class RangeCheck:
+    """Drop values outside what the sensor can physically report"""
+
+    def __init__(self, humidity=(0.0, 100.0), temperature=(-40.0, 80.0)):
+        self.humidity = humidity
+        self.temperature = temperature
+
+    def process(self, timestamp, humidity, temperature):
+        if not self.humidity[0] <= humidity <= self.humidity[1]:
+            raise Reject('humidity_range')
+        if not self.temperature[0] <= temperature <= self.temperature[1]:
+            raise Reject('temperature_range')
+        return humidity, temperature
+
+
+def median(values):
+    """Median; the mean of the two middle values for an even count"""
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) * 0.5
+
+
+class MedianFilter:
+    """Median of the last window samples
+
+    With max_deviation (humidity, temperature) set, samples further than
+    that from the window median are rejected instead of being replaced.
+    Rejected samples still enter the window, so a real step change is
+    accepted once it fills half of it.
+    """
+
+    def __init__(self, window=5, max_deviation=None):
+        self.window = window
+        self.max_deviation = max_deviation
+        self.humidity = deque(maxlen=window)
+        self.temperature = deque(maxlen=window)
+
+    def process(self, timestamp, humidity, temperature):
+        self.humidity.append(humidity)
+        self.temperature.append(temperature)
+        h_median = median(self.humidity)
+        t_median = median(self.temperature)
+        if self.max_deviation is None:
+            return h_median, t_median
+        if len(self.humidity) < self.window:
+            return humidity, temperature
+        if abs(humidity - h_median) > self.max_deviation[0]:
+            raise Reject('humidity_outlier')
+        if abs(temperature - t_median) > self.max_deviation[1]:
+            raise Reject('temperature_outlier')
+        return humidity, temperature
+
+
+class RateLimit:
+    """Reject changes faster than max_rate (humidity %/s, temperature °C/s)
+
+    Compared with the last accepted sample. After max_rejects rejections
+    in a row the new level is accepted, so a real jump cannot lock the
+    sensor out.
+    """
+
+    def __init__(self, max_rate=(5.0, 2.0), max_rejects=3):
+        self.max_rate = max_rate
+        self.max_rejects = max_rejects
+        self.last = None
+        self.rejects = 0
+
+    def process(self, timestamp, humidity, temperature):
+        last = self.last
+        if last is not None and self.rejects < self.max_rejects:
+            dt = max(timestamp - last[0], 1.0)
+            if abs(humidity - last[1]) > self.max_rate[0] * dt:
+                self.rejects += 1
+                raise Reject('humidity_rate')
+            if abs(temperature - last[2]) > self.max_rate[1] * dt:
+                self.rejects += 1
+                raise Reject('temperature_rate')
+        self.last = (timestamp, humidity, temperature)
+        self.rejects = 0
+        return humidity, temperature
+
+
+class Ewma:
+    """Exponentially weighted moving average smoother"""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.value = None
+
+    def process(self, timestamp, humidity, temperature):
+        if self.value is None:
+            self.value = (humidity, temperature)
+        else:
+            a = self.alpha
+            h, t = self.value
+            self.value = (h + a * (humidity - h), t + a * (temperature - t))
+        return self.value
+
+
+class Kalman:
+    """Scalar Kalman smoother per channel (random-walk model)
+
+    process_var is how much the true value may drift per sample,
+    measurement_var the sensor noise, both as (humidity, temperature).
+    """
+
+    def __init__(self, process_var=(0.05, 0.01), measurement_var=(1.0, 0.25)):
+        self.q = process_var
+        self.r = measurement_var
+        self.x = None
+        self.p = [1.0, 1.0]
+
+    def process(self, timestamp, humidity, temperature):
+        if self.x is None:
+            self.x = [humidity, temperature]
+            return humidity, temperature
+        for i, z in enumerate((humidity, temperature)):
+            p = self.p[i] + self.q[i]
+            k = p / (p + self.r[i])
+            self.x[i] += k * (z - self.x[i])
+            self.p[i] = (1 - k) * p
+        return self.x[0], self.x[1]
+
+
+class Pipeline:
+    """Run a sample through the stages in order, counting rejections"""
+
+    def __init__(self, stages, keep_rejects=32):
+        self.stages = list(stages)
+        self.accepted = 0
+        self.rejected = {}      # reason -> count
+        # Most recent rejected samples as (timestamp, humidity, temperature, reason)
+        self.rejects = deque(maxlen=keep_rejects)
+
+    def process(self, timestamp, humidity, temperature):
+        """Filtered (humidity, temperature); raises Reject"""
+        h, t = humidity, temperature
+        try:
+            for stage in self.stages:
+                h, t = stage.process(timestamp, h, t)
+        except Reject as e:
+            self.rejected[e.reason] = self.rejected.get(e.reason, 0) + 1
+            self.rejects.append((timestamp, humidity, temperature, e.reason))
+            raise
+        self.accepted += 1
+        return h, t
+
+    def stats(self):
+        return {'accepted': self.accepted, 'rejected': dict(self.rejected)}
+
+
+def default_stages():
+    """Range check, outlier rejection and rate limit; no smoothing"""
+    return [RangeCheck(), MedianFilter(5, max_deviation=(10.0, 4.0)), RateLimit()]
+
+
+class FilterBank:
+    """One Pipeline per sensor, built on first use by a factory"""
+
+    def __init__(self, factory=default_stages):
+        self.factory = factory
+        self.pipelines = {}
+
+    def process(self, sensor_id, timestamp, humidity, temperature):
+        pipeline = self.pipelines.get(sensor_id)
+        if pipeline is None:
+            pipeline = self.pipelines[sensor_id] = Pipeline(self.factory())
+        return pipeline.process(timestamp, humidity, temperature)
+
+    def stats(self):
+        return {sensor_id: p.stats() for sensor_id, p in list(self.pipelines.items())}
@@ -1,9 +1,13 @@
-import lgpio
 import time
 
+from backend import load_backend
+
 def main():
     print("Starting GPIO test...")
     try:
+        # lgpio, or DHT_GPIO_BACKEND=simulator without a Pi
+        lgpio = load_backend()
+        
         # Open the GPIO chip
         h = lgpio.gpiochip_open(0)
         
@@ -0,0 +1,307 @@
+"""Persistent reading history in a memory-mapped ring file
+
+RingFile holds a fixed-size header followed by a ring of fixed-width
+binary records; History stores readings in it as (timestamp, sensor id,
+flags, humidity, temperature). When the ring is full the oldest records
+are overwritten, so the file never grows past its initial size. Records
+are kept in timestamp order, which lets range queries binary-search the
+mapping directly instead of loading the file.
+
+Appends are buffered in memory and written out in batches; the mapping
+is only synced to disk once per batch to spare the SD card. Other
+processes can open the file read-only and see each batch once written;
+a generation counter in the header, odd while a batch is being written,
+tells them to retry a read that overlapped one (as the seqlock in
+shared.py).
+Every record has a sequence number, its position in the stream of all
+records ever written, which bulk exports use as a cursor.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+MAGIC = b'DHTH'
+VERSION = 1
+
+# magic, version, record size, capacity, head, count, total written
+HEADER = struct.Struct('<4sIIQQQQ')
+HEADER_SIZE = 64
+
+# Generation, after the header: odd while a batch is being written
+GENERATION = struct.Struct('<Q')
+GENERATION_OFFSET = 48
+
+# Read-only reads overlapping a batch are retried this often
+READ_RETRIES = 100
+
+# timestamp, sensor id, flags, humidity, temperature
+RECORD = struct.Struct('<dHHff')
+
+# Default ring size: about three months of one sensor at 1 Hz (~170 MB)
+DEFAULT_CAPACITY = 1 << 23
+
+
+class RingFile:
+    """Fixed-width records in a bounded memory-mapped ring file
+
+    The first field of every record is a timestamp; records must be
+    appended in timestamp order so ranges can be found by binary search.
+    With readonly=True the file is only queried, as written by another
+    process; it may not exist yet.
+    """
+
+    def __init__(self, path, record, capacity, batch_size=64, flush_interval=5.0, readonly=False):
+        self.path = path
+        self.record = record
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._last_timestamp = float('-inf')
+        if readonly:
+            self.capacity = capacity
+            self.head = self.count = self.total = 0
+            self._map = None
+            self._attach()
+            return
+
+        exists = os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            data = self._file.read(HEADER_SIZE)
+            header = HEADER.unpack_from(data)
+            magic, version, record_size, stored_capacity, head, count, total = header
+            if magic != MAGIC or version != VERSION or record_size != record.size:
+                self._file.close()
+                raise ValueError(f"{path} is not a version {VERSION} ring file of {record.size} byte records")
+            if stored_capacity != capacity:
+                # Resizing would reorder the ring; only a new file gets the new size
+                log.warning("%s holds %d records, not %d; keeping its size (remove it to resize)",
+                            path, stored_capacity, capacity)
+            capacity = stored_capacity
+            generation = GENERATION.unpack_from(data, GENERATION_OFFSET)[0]
+        else:
+            head = count = total = generation = 0
+        self.capacity = capacity
+        self.head = head        # Ring index of the oldest record
+        self.count = count      # Records currently in the ring
+        self.total = total      # Records ever written; the next sequence number
+        # Even again if the last writer died in the middle of a batch
+        self._generation = generation + (generation & 1)
+
+        size = HEADER_SIZE + capacity * record.size
+        if os.path.getsize(path) < size:
+            self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        if not exists or generation & 1:
+            self._write_header()
+        if count:
+            self._last_timestamp = self._record(count - 1)[0]
+
+    def _attach(self):
+        """Read-only: map the file once written"""
+        if self._map is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    header = HEADER.unpack(f.read(HEADER.size))
+                    if header[0] != MAGIC or header[2] != self.record.size:
+                        return False
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, struct.error, ValueError):
+                return False
+        return True
+
+    def _read(self, read, *args):
+        """read(*args), for read-only rings on a header and records of one generation
+
+        Called with the lock held. The writer may overwrite the oldest
+        records of the ring at any time, so a read is retried if a batch
+        was being written while it ran. Writers just call read.
+        """
+        if not self.readonly:
+            return read(*args)
+        for _ in range(READ_RETRIES):
+            generation = GENERATION.unpack_from(self._map, GENERATION_OFFSET)[0]
+            if not generation & 1:
+                self._load_header()
+                result = read(*args)
+                if GENERATION.unpack_from(self._map, GENERATION_OFFSET)[0] == generation:
+                    return result
+            time.sleep(0.0001)
+        # A writer that died in the middle of a batch; its successor repairs it
+        self._load_header()
+        return read(*args)
+
+    def _load_header(self):
+        _, _, _, self.capacity, self.head, self.count, self.total = HEADER.unpack_from(self._map, 0)
+
+    def _write_header(self):
+        HEADER.pack_into(self._map, 0, MAGIC, VERSION, self.record.size,
+                         self.capacity, self.head, self.count, self.total)
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, self._generation)
+
+    def _record(self, i):
+        """Record at logical index i (0 is the oldest)"""
+        offset = HEADER_SIZE + ((self.head + i) % self.capacity) * self.record.size
+        return self.record.unpack_from(self._map, offset)
+
+    def append_record(self, record):
+        """Queue a record tuple; written out with the next batch"""
+        with self._lock:
+            # Keep the ring sorted even if the wall clock steps back
+            if record[0] < self._last_timestamp:
+                record = (self._last_timestamp,) + tuple(record[1:])
+            self._last_timestamp = record[0]
+            self._pending.append(record)
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush()
+
+    def flush(self):
+        """Write queued records to the file and sync it"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        size = self.record.size
+        self._generation += 1
+        GENERATION.pack_into(self._map, GENERATION_OFFSET, self._generation)
+        for record in self._pending:
+            index = (self.head + self.count) % self.capacity
+            self.record.pack_into(self._map, HEADER_SIZE + index * size, *record)
+            if self.count < self.capacity:
+                self.count += 1
+            else:
+                self.head = (self.head + 1) % self.capacity
+            self.total += 1
+        self._pending = []
+        self._generation += 1
+        self._write_header()
+        self._map.flush()
+
+    def _lower_bound(self, timestamp):
+        """Logical index of the first record at or after timestamp"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._record(mid)[0] < timestamp:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bounds(self):
+        """(first, end) sequence numbers of the oldest stored record and the next
+
+        Record n is the n-th ever written. Queued records are numbered
+        once flushed, so a sequence number never changes meaning.
+        """
+        with self._lock:
+            if self.readonly and not self._attach():
+                return 0, 0
+            return self._read(lambda: (self.total - self.count, self.total))
+
+    def sequence_at(self, timestamp):
+        """Sequence number of the first stored record at or after timestamp"""
+        with self._lock:
+            if self.readonly and not self._attach():
+                return 0
+            return self._read(lambda: self.total - self.count + self._lower_bound(timestamp))
+
+    def scan(self, start, end, chunk=4096):
+        """Stored records with start <= sequence number < end, in chunks
+
+        Yields (sequence number of the first, list of record tuples). The
+        lock is only held while a chunk is copied out, so a long scan
+        never holds up appends; records overwritten meanwhile are skipped.
+        """
+        while start < end:
+            with self._lock:
+                if self.readonly and not self._attach():
+                    return
+                start, records = self._read(self._chunk, start, end, chunk)
+            if not records:
+                return
+            yield start, records
+            start += len(records)
+
+    def _chunk(self, start, end, chunk):
+        """(sequence number, records) of the next chunk of a scan"""
+        first = self.total - self.count
+        start = max(start, first)
+        n = min(end, self.total) - start
+        if n <= 0:
+            return start, []
+        i = (self.head + start - first) % self.capacity
+        # A chunk stops at the end of the ring
+        n = min(n, chunk, self.capacity - i)
+        offset = HEADER_SIZE + i * self.record.size
+        return start, list(self.record.iter_unpack(self._map[offset:offset + n * self.record.size]))
+
+    def records(self, start, end, match=None, limit=None):
+        """Record tuples with start <= timestamp <= end, oldest first
+
+        match is an optional predicate on the record tuple.
+        """
+        with self._lock:
+            if self.readonly and not self._attach():
+                return []
+            return self._read(self._select, start, end, match, limit)
+
+    def _select(self, start, end, match, limit):
+        results = []
+        i = self._lower_bound(start)
+        stored = (self._record(j) for j in range(i, self.count))
+        pending = (r for r in self._pending if r[0] >= start)
+        for source in (stored, pending):
+            for record in source:
+                if record[0] > end:
+                    break
+                if match is not None and not match(record):
+                    continue
+                if limit is not None and len(results) >= limit:
+                    return results
+                results.append(record)
+        return results
+
+    def close(self):
+        """Flush pending records and release the file"""
+        with self._lock:
+            if self.readonly:
+                if self._map is not None:
+                    self._map.close()
+                return
+            if self._map.closed:
+                return
+            self._flush()
+            self._map.close()
+            self._file.close()
+
+
+class History(RingFile):
+    """Append-only ring of readings with time range queries"""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, batch_size=64, flush_interval=5.0, readonly=False):
+        super().__init__(path, RECORD, capacity, batch_size, flush_interval, readonly)
+
+    def append(self, timestamp, sensor_id, humidity, temperature, flags=0):
+        """Queue a reading; written out with the next batch"""
+        self.append_record((timestamp, sensor_id, flags, float(humidity), float(temperature)))
+
+    def query(self, start, end, sensor_id=None, limit=None):
+        """Readings with start <= timestamp <= end, oldest first
+
+        Returns (timestamp, sensor id, humidity, temperature, flags) tuples.
+        """
+        match = None if sensor_id is None else (lambda r: r[1] == sensor_id)
+        return [(t, s, h, c, f) for t, s, f, h, c in self.records(start, end, match, limit)]
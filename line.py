@@ -0,0 +1,80 @@
+"""Persistent GPIO line state
+
+The data line stays claimed for the lifetime of the sensor. Direction
+changes go through Line, which remembers the current mode and only
+issues the kernel calls needed to get to the requested one.
+"""
+
+OUTPUT = 'output'
+INPUT = 'input'
+ALERT = 'alert'
+
+
+class Line:
+    """One claimed GPIO line on an open gpiochip handle"""
+
+    def __init__(self, gpio, h, pin):
+        self.gpio = gpio
+        self.h = h
+        self.pin = pin
+        self.mode = None
+        self.flags = 0
+        self.kernel_calls = 0
+
+    def _free(self):
+        if self.mode is not None:
+            self.mode = None
+            self.kernel_calls += 1
+            self.gpio.gpio_free(self.h, self.pin)
+
+    def output(self, level):
+        """Drive the line to level"""
+        if self.mode == OUTPUT:
+            self.kernel_calls += 1
+            self.gpio.gpio_write(self.h, self.pin, level)
+            return
+        self._free()
+        self.kernel_calls += 1
+        self.gpio.gpio_claim_output(self.h, self.pin, level)
+        self.mode = OUTPUT
+
+    def input(self, pull_up=True):
+        """Release the line as a plain input"""
+        flags = self.gpio.SET_PULL_UP if pull_up else 0
+        if self.mode == INPUT and self.flags == flags:
+            return
+        self._free()
+        self.kernel_calls += 1
+        self.gpio.gpio_claim_input(self.h, self.pin, flags)
+        self.mode = INPUT
+        self.flags = flags
+
+    def alert(self):
+        """Release the line as a pulled-up input reporting edges"""
+        flags = self.gpio.SET_PULL_UP
+        if self.mode == ALERT:
+            return
+        self._free()
+        self.kernel_calls += 1
+        self.gpio.gpio_claim_alert(self.h, self.pin, self.gpio.BOTH_EDGES, flags)
+        self.mode = ALERT
+        self.flags = flags
+
+    def read(self):
+        """Current line level"""
+        return self.gpio.gpio_read(self.h, self.pin)
+
+    def free(self):
+        """Give the line back to the kernel"""
+        try:
+            self._free()
+        except Exception:
+            pass
+
+    def reset(self):
+        """Forget the cached mode after an error left it unknown"""
+        self.free()
+        try:
+            self.gpio.gpio_free(self.h, self.pin)
+        except Exception:
+            pass
@@ -0,0 +1,67 @@
+"""Logging setup: leveled, rate-limited and formatted off the sensor thread
+
+Loggers only put records on a queue; a listener thread formats and
+writes them, so a slow terminal or SD card never stalls a read.
+"""
+import logging
+import logging.handlers
+import queue
+import time
+
+
+class RateLimitFilter(logging.Filter):
+    """Pass at most burst records per message per interval seconds
+
+    Records are grouped by their unformatted message, so a failure
+    repeating every second is logged a few times a minute, followed by
+    a count of what was suppressed.
+    """
+
+    def __init__(self, interval=60.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.windows = {}   # (logger, msg) -> [window start, passed, suppressed]
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self.windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Leave formatting to the listener thread; records stay in-process
+        return record
+
+
+def setup_logging(level=logging.INFO, interval=60.0, burst=5):
+    """Route all logging through a queue to a rate-limited stderr handler
+
+    Returns the QueueListener; stop() it to flush on shutdown.
+    """
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    handler.addFilter(RateLimitFilter(interval, burst))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers[:] = [_QueueHandler(records)]
+
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    return listener
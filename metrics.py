@@ -0,0 +1,133 @@
+"""Minimal Prometheus/OpenMetrics instrumentation
+
+Counters and histograms are plain dicts and lists, cheap enough to
+stay on in the capture path. Each metric has a single writer thread:
+the sensor thread, or the publisher's sender thread for the publishing
+metrics. /metrics only reads them. Gauges are computed when scraped.
+"""
+from bisect import bisect_left
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{v}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}    # label values tuple -> count
+
+    def inc(self, *labels, amount=1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in list(self.values.items()):
+            yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labels = tuple(labels)
+        self.series = {}    # label values tuple -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.labels + ('le',)
+        for labels, series in list(self.series.items()):
+            series = list(series)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                yield f'{self.name}_bucket{_labels(names, labels + (bound,))} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {cumulative}'
+
+
+class Gauge:
+    """Value computed at scrape time by a function returning {labels: value}"""
+
+    def __init__(self, name, help, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def render(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        if self.collect is None:
+            return
+        for labels, value in self.collect().items():
+            if value is not None:
+                yield f'{self.name}{_labels(self.labels, labels)} {value}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Add metric, replacing one registered under the same name"""
+        self.metrics = [m for m in self.metrics if m.name != metric.name]
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Text exposition of all metrics"""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        lines.append('')
+        return '\n'.join(lines)
+
+
+REGISTRY = Registry()
+
+# Acquisition metrics, labelled by sensor pin
+READ_ATTEMPTS = REGISTRY.register(Counter(
+    'dht_read_attempts_total', 'Start pulses sent', ('sensor',)))
+READ_SUCCESSES = REGISTRY.register(Counter(
+    'dht_read_successes_total', 'Frames decoded with a valid checksum', ('sensor',)))
+READ_FAILURES = REGISTRY.register(Counter(
+    'dht_read_failures_total', 'Failed reads by phase', ('sensor', 'phase')))
+BIT_TIMEOUTS = REGISTRY.register(Counter(
+    'dht_bit_timeouts_total', 'Frames cut short, by the first missing bit', ('sensor', 'bit')))
+BREAKER_TRIPS = REGISTRY.register(Counter(
+    'dht_breaker_trips_total', 'Times a sensor was taken as disconnected', ('sensor',)))
+PUBLISHED = REGISTRY.register(Counter(
+    'dht_published_readings_total', 'Readings accepted by the collector'))
+PUBLISH_FAILURES = REGISTRY.register(Counter(
+    'dht_publish_failures_total', 'Batches the collector did not accept'))
+PUBLISH_DROPPED = REGISTRY.register(Counter(
+    'dht_publish_dropped_total', 'Readings given up on before reaching the collector', ('reason',)))
+RESPONSE_LATENCY = REGISTRY.register(Histogram(
+    'dht_response_latency_seconds', 'Line release to sensor pulling LOW',
+    (10e-6, 20e-6, 30e-6, 40e-6, 60e-6, 100e-6, 200e-6, 500e-6, 1e-3), ('sensor',)))
+PULSE_WIDTH = REGISTRY.register(Histogram(
+    'dht_bit_pulse_width_seconds', 'Width of data bit HIGH pulses',
+    (15e-6, 20e-6, 25e-6, 30e-6, 35e-6, 40e-6, 50e-6, 60e-6, 65e-6, 70e-6, 75e-6, 80e-6, 100e-6),
+    ('sensor',)))
+READ_DURATION = REGISTRY.register(Histogram(
+    'dht_read_duration_seconds', 'Start pulse, capture and decode of one read',
+    (0.019, 0.020, 0.022, 0.025, 0.03, 0.05, 0.1, 0.5), ('sensor',)))
@@ -0,0 +1,321 @@
+"""Outbound publishing of readings to a central collector
+
+submit() only appends to an in-memory buffer, so the sensor thread
+never waits on the network. A sender thread collects the buffer into
+batches of gzipped NDJSON and POSTs them over one persistent HTTP
+keep-alive connection. While the collector is unreachable, batches go
+to a bounded on-disk Spool, oldest dropped first when it is full; once
+a send succeeds again the backlog is drained oldest first at drain_rate
+batches per second, ahead of new readings, so the collector sees them
+in order.
+
+Enable it with DHT_COLLECTOR_URL=http://collector:8080/readings.
+"""
+import gzip
+import http.client
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import urllib.parse
+from collections import deque
+
+from metrics import PUBLISH_DROPPED, PUBLISH_FAILURES, PUBLISHED, REGISTRY, Gauge
+
+log = logging.getLogger(__name__)
+
+
+class PublishError(RuntimeError):
+    """A batch was not accepted; ``retry`` is False if resending is pointless"""
+
+    def __init__(self, message, retry=True):
+        super().__init__(message)
+        self.retry = retry
+
+
+def encode(readings):
+    """Gzipped NDJSON body for (timestamp, sensor id, humidity, temperature) tuples"""
+    lines = ''.join([
+        f'{{"timestamp":{t!r},"sensor":{s},"humidity":{h!r},"temperature":{c!r}}}\n'
+        for t, s, h, c in readings])
+    return gzip.compress(lines.encode(), compresslevel=6)
+
+
+class HttpTransport:
+    """POSTs batches over one reused HTTP/1.1 connection
+
+    headers replace the default gzipped NDJSON ones.
+    """
+
+    def __init__(self, url, timeout=5.0, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"Unsupported collector URL: {url}")
+        self.connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                 else http.client.HTTPConnection)
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        self.timeout = timeout
+        self.headers = headers or {
+            'Content-Type': 'application/x-ndjson',
+            'Content-Encoding': 'gzip',
+            'X-DHT-Station': socket.gethostname(),
+        }
+        self._connection = None
+
+    def send(self, body):
+        """Deliver one batch; raises PublishError"""
+        if self._connection is None:
+            self._connection = self.connection_class(self.host, self.port, timeout=self.timeout)
+        try:
+            self._connection.request('POST', self.path, body, self.headers)
+            response = self._connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException) as e:
+            self.close()
+            raise PublishError(f"Collector unreachable: {e}")
+        if response.will_close:
+            self.close()
+        if response.status >= 300:
+            # Client errors other than timeouts and throttling will not go away
+            retry = response.status >= 500 or response.status in (408, 429)
+            raise PublishError(f"Collector answered {response.status} {response.reason}", retry)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class Spool:
+    """Bounded FIFO of encoded batches, one file each, in a directory
+
+    Used only from the sender thread. Survives restarts: batches left
+    from a previous run are sent first.
+    """
+
+    def __init__(self, directory, max_bytes=50 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        # (file name, size, readings) oldest first
+        self.batches = deque()
+        self.bytes = 0
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.gz'):
+                try:
+                    self._track(name, os.path.getsize(os.path.join(directory, name)))
+                except ValueError:
+                    log.warning("Ignoring %s in the spool: not a spooled batch", name)
+            elif name.endswith('.tmp'):
+                os.remove(os.path.join(directory, name))
+        self._next = int(self.batches[-1][0].split('-')[0]) + 1 if self.batches else 0
+
+    def _track(self, name, size):
+        """Add a batch file named <number>-<readings>.gz; ValueError if misnamed"""
+        number, readings = name[:-len('.gz')].split('-')
+        int(number)
+        self.batches.append((name, size, int(readings)))
+        self.bytes += size
+
+    def __len__(self):
+        return len(self.batches)
+
+    def put(self, body, readings):
+        """Append a batch, dropping the oldest ones past max_bytes"""
+        name = f'{self._next:016d}-{readings}.gz'
+        self._next += 1
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(body)
+        os.replace(path + '.tmp', path)
+        self._track(name, len(body))
+        while self.bytes > self.max_bytes and len(self.batches) > 1:
+            _, _, dropped = self.batches[0]
+            self.pop()
+            PUBLISH_DROPPED.inc('spool_full', amount=dropped)
+
+    def peek(self):
+        """(body, readings) of the oldest batch"""
+        name, _, readings = self.batches[0]
+        with open(os.path.join(self.directory, name), 'rb') as f:
+            return f.read(), readings
+
+    def pop(self):
+        """Remove the oldest batch"""
+        name, size, _ = self.batches.popleft()
+        self.bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+
+class Publisher:
+    """Batches readings and sends them to a collector from a thread of its own
+
+    transport has send(body) raising PublishError, and close(). Batches
+    are sent when batch_size readings are buffered or flush_interval
+    seconds after the first. Failed sends are retried after retry_delay
+    seconds, doubling with jitter up to max_retry_delay. drain_rate must
+    stay above the rate new batches come in, or the backlog never drains.
+    """
+
+    def __init__(self, transport, spool, batch_size=100, flush_interval=5.0, drain_rate=10.0,
+                 buffer_size=10000, retry_delay=1.0, max_retry_delay=60.0):
+        self.transport = transport
+        self.spool = spool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drain_rate = drain_rate
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.buffer_size = buffer_size
+        self._buffer = deque()
+        # Readings submit() dropped on a full buffer, and how many of them the
+        # sender thread has added to PUBLISH_DROPPED; it is the only writer
+        self.buffer_dropped = 0
+        self._dropped_counted = 0
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._delay = retry_delay
+        self._retry_at = 0.0        # No send attempts before this (monotonic)
+        self._drain_at = 0.0        # Next spooled batch not before this
+        self.connected = None       # Outcome of the last send, None before the first
+
+        REGISTRY.register(Gauge(
+            'dht_spool_batches', 'Batches waiting in the on-disk spool', (),
+            lambda: {(): len(self.spool)}))
+        REGISTRY.register(Gauge(
+            'dht_spool_bytes', 'Size of the on-disk spool', (),
+            lambda: {(): self.spool.bytes}))
+        REGISTRY.register(Gauge(
+            'dht_collector_connected', 'Whether the last send to the collector succeeded', (),
+            lambda: {(): None if self.connected is None else int(self.connected)}))
+
+    @classmethod
+    def from_env(cls, directory):
+        """Publisher configured by DHT_COLLECTOR_URL and friends, None if unset
+
+        The spool defaults to a 'spool' directory in directory.
+        """
+        env = os.environ.get
+        url = env('DHT_COLLECTOR_URL')
+        if not url:
+            return None
+        spool = Spool(env('DHT_SPOOL_DIR', os.path.join(directory, 'spool')),
+                      int(float(env('DHT_SPOOL_MAX_MB', 50)) * (1 << 20)))
+        return cls(HttpTransport(url), spool,
+                   batch_size=int(env('DHT_PUBLISH_BATCH', 100)),
+                   flush_interval=float(env('DHT_PUBLISH_INTERVAL', 5.0)),
+                   drain_rate=float(env('DHT_DRAIN_RATE', 10.0)))
+
+    def submit(self, timestamp, sensor_id, humidity, temperature):
+        """Queue a reading; never blocks"""
+        buffer = self._buffer
+        if len(buffer) >= self.buffer_size:
+            self.buffer_dropped += 1
+            return
+        buffer.append((timestamp, sensor_id, humidity, temperature))
+        # Wake the sender to start the flush timer, or to send a full batch
+        if len(buffer) in (1, self.batch_size):
+            self._wake.set()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='publisher', daemon=True)
+        self._thread.start()
+
+    def _take(self):
+        buffer = self._buffer
+        return [buffer.popleft() for _ in range(min(len(buffer), self.batch_size))]
+
+    def _send(self, body, readings):
+        """True if the batch is done with: delivered or rejected for good"""
+        try:
+            self.transport.send(body)
+        except PublishError as e:
+            PUBLISH_FAILURES.inc()
+            if not e.retry:
+                log.error("Collector rejected %d readings: %s", readings, e)
+                PUBLISH_DROPPED.inc('rejected', amount=readings)
+                return True
+            if self.connected is not False:
+                log.warning("%s; spooling readings", e)
+            self.connected = False
+            self._retry_at = time.monotonic() + self._delay * random.uniform(0.5, 1.0)
+            self._delay = min(self._delay * 2, self.max_retry_delay)
+            return False
+        if self.connected is False:
+            log.info("Collector reachable again; draining %d spooled batches", len(self.spool))
+        self.connected = True
+        self._delay = self.retry_delay
+        PUBLISHED.inc(amount=readings)
+        return True
+
+    def _flush(self, batch):
+        """Send a batch of new readings, or spool it behind the backlog"""
+        body = encode(batch)
+        if self.spool or time.monotonic() < self._retry_at or not self._send(body, len(batch)):
+            try:
+                self.spool.put(body, len(batch))
+            except OSError as e:
+                # Full or read-only card: the batch is lost, not the sender
+                log.error("Cannot spool %d readings, dropped: %s", len(batch), e)
+                PUBLISH_DROPPED.inc('spool_error', amount=len(batch))
+
+    def _drain(self):
+        """Send the oldest spooled batch if the rate and the link allow it"""
+        now = time.monotonic()
+        if not self.spool or now < self._retry_at or now < self._drain_at:
+            return
+        self._drain_at = now + 1.0 / self.drain_rate
+        body, readings = self.spool.peek()
+        if self._send(body, readings):
+            self.spool.pop()
+
+    def _run(self):
+        due = None      # When the buffered readings must be sent
+        while True:
+            stop = self._stop
+            dropped = self.buffer_dropped
+            if dropped != self._dropped_counted:
+                PUBLISH_DROPPED.inc('buffer_full', amount=dropped - self._dropped_counted)
+                self._dropped_counted = dropped
+            try:
+                if self._buffer and due is None:
+                    due = time.monotonic() + self.flush_interval
+                while self._buffer and (stop or len(self._buffer) >= self.batch_size
+                                        or time.monotonic() >= due):
+                    self._flush(self._take())
+                    due = time.monotonic() + self.flush_interval if self._buffer else None
+                if stop:
+                    return
+                self._drain()
+            except Exception:
+                # Keep the sender alive: a dead one would leave submit()
+                # filling the buffer with nobody counting the drops
+                log.exception("Publisher error; retrying in %.0fs", self.retry_delay)
+                if stop:
+                    return
+                self._wake.wait(self.retry_delay)
+                self._wake.clear()
+                continue
+
+            now = time.monotonic()
+            timeouts = [] if due is None else [due - now]
+            if self.spool:
+                timeouts.append(max(self._retry_at, self._drain_at) - now)
+            self._wake.wait(max(min(timeouts), 0) if timeouts else None)
+            self._wake.clear()
+
+    def close(self):
+        """Send or spool what is buffered and stop"""
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 10.0)
+        self.transport.close()
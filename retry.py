@@ -0,0 +1,141 @@
+"""When to send the next start pulse after a read
+
+A RetryPolicy tracks one sensor's recent results and returns the delay
+from one start pulse to the next. A good read keeps the sensor at its
+minimum interval. A transient failure (checksum, cut-short frame) is
+retried at once, that is at the minimum interval, up to `retries` times
+in a row; further failures back off exponentially with jitter. A
+sensor that does not answer at all `trip_after` times in a row is taken
+as disconnected: the breaker opens and only one probe is sent every
+`open_for` seconds until one succeeds.
+"""
+import logging
+import random
+import time
+from collections import deque
+
+from metrics import BREAKER_TRIPS
+
+log = logging.getLogger(__name__)
+
+# Breaker states
+CLOSED = 'closed'           # Reading normally or backing off
+HALF_OPEN = 'half_open'     # Open, the next start pulse is a probe
+OPEN = 'open'               # Disconnected, waiting to probe
+
+# Failures worth retrying at once: the sensor answered, the frame was bad
+TRANSIENT = frozenset(('checksum', 'bit', 'empty'))
+
+# Failures where the sensor did not answer at all
+NO_RESPONSE = frozenset(('no_response_low', 'no_response_high'))
+
+
+class RetryPolicy:
+    """Retry, backoff and circuit breaker for one sensor
+
+    record() is called from the scheduler thread after every read; the
+    other methods only read its state.
+    """
+
+    def __init__(self, min_interval, label='', retries=2, backoff=1.0, max_backoff=60.0, jitter=0.25,
+                 trip_after=5, open_for=10.0, window=30, seed=None):
+        self.min_interval = min_interval
+        self.label = label      # Sensor label for logs and metrics
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.trip_after = trip_after
+        self.open_for = open_for
+        self.failures = 0       # Consecutive failed reads
+        self.silent = 0         # Consecutive reads without any response
+        self.trips = 0
+        self._open = False
+        self._probe_at = 0.0
+        self._rng = random.Random(seed)
+        # (monotonic time, succeeded) of the last reads
+        self.results = deque(maxlen=window)
+
+    def _jittered(self, delay):
+        return delay * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def record(self, phase, now=None):
+        """Record a read that failed in phase (None: success); returns the next delay"""
+        now = time.monotonic() if now is None else now
+        self.results.append((now, phase is None))
+        if phase is None:
+            if self._open:
+                log.info("GPIO%s answered again, breaker closed", self.label)
+            self.failures = self.silent = 0
+            self._open = False
+            return self.min_interval
+
+        self.failures += 1
+        self.silent = self.silent + 1 if phase in NO_RESPONSE else 0
+        if self._open or self.silent >= self.trip_after:
+            if not self._open:
+                self.trips += 1
+                BREAKER_TRIPS.inc(self.label)
+                log.warning("GPIO%s: no response %d times in a row, breaker open; probing every %.0fs",
+                            self.label, self.silent, self.open_for)
+            self._open = True
+            delay = max(self._jittered(self.open_for), self.min_interval)
+            self._probe_at = now + delay
+            return delay
+
+        excess = self.failures - (self.retries if phase in TRANSIENT else 0)
+        if excess <= 0:
+            return self.min_interval
+        backoff = min(self.backoff * 2 ** (excess - 1), self.max_backoff)
+        return self.min_interval + self._jittered(backoff)
+
+    @property
+    def state(self):
+        if not self._open:
+            return CLOSED
+        return HALF_OPEN if time.monotonic() >= self._probe_at else OPEN
+
+    @property
+    def target_rate(self):
+        """Reads per second at the minimum interval"""
+        return 1.0 / self.min_interval
+
+    def effective_rate(self, now=None):
+        """Good readings per second over the recent reads"""
+        if not self.results:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        # Each read stands for at least one minimum interval
+        span = max(now - self.results[0][0], 0.0) + self.min_interval
+        return min(sum(ok for _, ok in list(self.results)) / span, self.target_rate)
+
+    def status(self):
+        """JSON-ready breaker state and availability"""
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'trips': self.trips,
+            'effective_rate': self.effective_rate(),
+            'target_rate': self.target_rate,
+        }
+
+
+class RetryBank:
+    """One RetryPolicy per sensor, built on first use by a factory"""
+
+    def __init__(self, factory=RetryPolicy):
+        self.factory = factory
+        # sensor id -> policy; replaced on change, read without locks
+        self.policies = {}
+
+    def record(self, sensor, phase, now=None):
+        policy = self.policies.get(sensor.pin)
+        if policy is None:
+            policy = self.factory(sensor.min_interval, sensor.label)
+            policies = dict(self.policies)
+            policies[sensor.pin] = policy
+            self.policies = policies
+        return policy.record(phase, now)
+
+    def stats(self):
+        return {sensor_id: p.status() for sensor_id, p in self.policies.items()}
@@ -0,0 +1,157 @@
+"""Streaming multi-resolution rollups of the reading history
+
+Every reading updates one open bucket per resolution (1 minute, 1 hour,
+1 day) and sensor, holding only count, min, max and sum. When time moves
+past a bucket it is closed and appended to a ring file for its
+resolution, so a chart over a long range reads a few hundred buckets
+instead of millions of raw samples.
+"""
+import os
+import struct
+
+from history import RingFile
+
+# Bucket widths in seconds, finest first
+RESOLUTIONS = (60, 3600, 86400)
+
+# Ring size per resolution: about two years of one sensor, or more
+CAPACITIES = {60: 1 << 20, 3600: 1 << 15, 86400: 1 << 11}
+
+# start, sensor id, count, humidity min/max/mean, temperature min/max/mean
+BUCKET = struct.Struct('<dHIffffff')
+
+
+class Bucket:
+    """Running aggregate of one sensor over one time bucket"""
+
+    __slots__ = ('start', 'count', 'h_min', 'h_max', 'h_sum', 't_min', 't_max', 't_sum')
+
+    def __init__(self, start, humidity, temperature):
+        self.start = start
+        self.count = 1
+        self.h_min = self.h_max = self.h_sum = humidity
+        self.t_min = self.t_max = self.t_sum = temperature
+
+    def add(self, humidity, temperature):
+        self.h_sum += humidity
+        self.t_sum += temperature
+        self.count += 1
+        if humidity < self.h_min:
+            self.h_min = humidity
+        elif humidity > self.h_max:
+            self.h_max = humidity
+        if temperature < self.t_min:
+            self.t_min = temperature
+        elif temperature > self.t_max:
+            self.t_max = temperature
+
+    def record(self, sensor_id):
+        """Tuple in BUCKET layout"""
+        n = self.count
+        return (self.start, sensor_id, n,
+                self.h_min, self.h_max, self.h_sum / n,
+                self.t_min, self.t_max, self.t_sum / n)
+
+
+class Rollup:
+    """Incremental min/max/mean/count rollups per sensor and resolution"""
+
+    def __init__(self, directory, resolutions=RESOLUTIONS, capacities=CAPACITIES, readonly=False):
+        self.resolutions = tuple(sorted(resolutions))
+        # Read-only: closed buckets only, as written by another process
+        self.readonly = readonly
+        self.files = {
+            res: RingFile(os.path.join(directory, f'rollup-{res}.bin'), BUCKET,
+                          capacities.get(res, 1 << 16), batch_size=16, flush_interval=60.0,
+                          readonly=readonly)
+            for res in self.resolutions
+        }
+        self.open = {res: {} for res in self.resolutions}     # res -> sensor -> Bucket
+        self.current = {res: None for res in self.resolutions}  # res -> open bucket start
+
+    def add(self, timestamp, sensor_id, humidity, temperature):
+        """Fold one reading into the open buckets, closing finished ones"""
+        for res in self.resolutions:
+            start = timestamp - timestamp % res
+            current = self.current[res]
+            if current is None or start > current:
+                # Time moved past the open buckets of every sensor: close
+                # them together so closed buckets stay in start order
+                self._close(res)
+                self.current[res] = current = start
+            buckets = self.open[res]
+            bucket = buckets.get(sensor_id)
+            if bucket is None:
+                # A late reading for an already closed bucket counts in the current one
+                buckets[sensor_id] = Bucket(current, humidity, temperature)
+            else:
+                bucket.add(humidity, temperature)
+
+    def _close(self, res):
+        buckets = self.open[res]
+        ring = self.files[res]
+        for sensor_id in sorted(buckets):
+            ring.append_record(buckets[sensor_id].record(sensor_id))
+        self.open[res] = {}
+
+    def pick_resolution(self, start, end, points, max_buckets=None):
+        """Coarsest resolution giving at least points buckets over the range
+
+        Returns None when even the finest rollup is too coarse and raw
+        readings should be used instead. A resolution giving more than
+        max_buckets buckets is never picked: the finest one within it is,
+        even if that gives fewer than points, so the whole range fits.
+        """
+        span = end - start
+        fits = None
+        for res in reversed(self.resolutions):
+            if max_buckets is not None and span / res > max_buckets:
+                return fits if fits is not None else res
+            if span / res >= points:
+                return res
+            fits = res
+        return None
+
+    def query(self, res, start, end, sensor_id=None, limit=None):
+        """Buckets of one resolution starting within [start, end], oldest first
+
+        Includes the still open buckets. Returns at most limit BUCKET
+        layout tuples; only that many are read from the file.
+        """
+        match = None if sensor_id is None else (lambda r: r[1] == sensor_id)
+        records = self.files[res].records(start - res + 1, end, match, limit)
+        current = self.current[res]
+        if current is not None and start - res < current <= end:
+            # Copy first: the sensor thread may add a bucket meanwhile
+            for sid, bucket in sorted(dict(self.open[res]).items()):
+                if sensor_id is None or sid == sensor_id:
+                    records.append(bucket.record(sid))
+
+        # A restart inside a bucket leaves two parts of it; merge them
+        merged = {}
+        for record in records:
+            key = (record[0], record[1])
+            if key in merged:
+                record = merge(merged[key], record)
+            merged[key] = record
+        results = list(merged.values())
+        return results[:limit] if limit is not None else results
+
+    def close(self):
+        """Persist all buckets, including the partial open ones"""
+        if not self.readonly:
+            for res in self.resolutions:
+                self._close(res)
+                self.current[res] = None
+        for ring in self.files.values():
+            ring.close()
+
+
+def merge(a, b):
+    """Combine two BUCKET tuples of the same sensor and start"""
+    start, sensor_id, n_a = a[:3]
+    n_b = b[2]
+    n = n_a + n_b
+    return (start, sensor_id, n,
+            min(a[3], b[3]), max(a[4], b[4]), (a[5] * n_a + b[5] * n_b) / n,
+            min(a[6], b[6]), max(a[7], b[7]), (a[8] * n_a + b[8] * n_b) / n)
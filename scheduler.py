@@ -0,0 +1,144 @@
+"""Acquisition scheduler for several DHT sensors
+
+All sensors share one gpiochip handle and are read from a single thread.
+Start pulses are staggered across the sensors' minimum interval, also
+for sensors added while running, so capture windows never overlap and
+each sensor is read as often as it allows without one busy thread per
+pin. After a failed read the sensor's
+retry.RetryPolicy decides when it is tried again.
+"""
+import heapq
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from filters import Reject
+from metrics import READ_FAILURES
+from retry import RetryBank
+from store import LatestStore
+
+log = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Read a set of DHT11/DHT22 sensors in turn, earliest due first"""
+
+    def __init__(self, sensors, on_result=None, store=None, filters=None, retry=None, alerts=None):
+        self.sensors = list(sensors)
+        self.on_result = on_result
+        # Optional filters.FilterBank applied before readings are published
+        self.filters = filters
+        # Optional alerts.AlertEngine run on every published reading
+        self.alerts = alerts
+        # Latest snapshot per sensor, keyed by pin
+        self.store = store if store is not None else LatestStore()
+        # Retry, backoff and breaker state per sensor
+        self.retry = retry if retry is not None else RetryBank()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._added = queue.SimpleQueue()   # Sensors brought up while running
+        self._diagnostics = queue.SimpleQueue()
+        self._queue = []
+
+        # Spread the first start pulses evenly over the longest interval
+        now = time.monotonic()
+        interval = max((s.min_interval for s in self.sensors), default=0)
+        step = interval / len(self.sensors) if self.sensors else 0
+        for i, sensor in enumerate(self.sensors):
+            sensor.next_start = max(sensor.next_start, now + i * step)
+            heapq.heappush(self._queue, (sensor.next_start, i))
+
+    def add(self, sensor):
+        """Start reading another sensor; safe to call from any thread"""
+        self._added.put(sensor)
+        self._wake.set()
+
+    def diagnose(self, sensor, duration):
+        """Run sensor.monitor_pin(duration) between two reads
+
+        Returns a Future with its result; safe to call from any thread.
+        """
+        future = Future()
+        self._diagnostics.put((sensor, duration, future))
+        self._wake.set()
+        return future
+
+    def _run_diagnostics(self):
+        while not self._diagnostics.empty():
+            sensor, duration, future = self._diagnostics.get()
+            if future.set_running_or_notify_cancel():
+                future.set_result(sensor.monitor_pin(duration))
+
+    def _take_added(self):
+        while not self._added.empty():
+            sensor = self._added.get()
+            self.sensors.append(sensor)
+            # One step, at the new spacing, after the latest start pulse due within an interval
+            now = time.monotonic()
+            interval = max(s.min_interval for s in self.sensors)
+            step = interval / len(self.sensors)
+            due = [t for t, _ in self._queue if t < now + interval]
+            if due:
+                sensor.next_start = max(sensor.next_start, max(max(due), now) + step)
+            heapq.heappush(self._queue, (sensor.next_start, len(self.sensors) - 1))
+
+    def run_once(self):
+        """Read the sensor that is due next; returns it with its result"""
+        _, i = heapq.heappop(self._queue)
+        sensor = self.sensors[i]
+        try:
+            humidity, temperature = sensor.read()
+        finally:
+            # A failed frame is retried at once, repeated failures back off
+            if sensor.starts:
+                sensor.next_start = sensor.starts[-1] + self.retry.record(sensor, sensor.last_phase)
+            heapq.heappush(self._queue, (sensor.next_start, i))
+
+        error = sensor.last_error or "No reading"
+        if humidity is not None and temperature is not None and self.filters is not None:
+            try:
+                humidity, temperature = self.filters.process(
+                    sensor.pin, sensor.last_reading, humidity, temperature)
+            except Reject as e:
+                READ_FAILURES.inc(sensor.label, 'filter')
+                humidity = temperature = None
+                error = f"Rejected by filter: {e.reason}"
+
+        if humidity is not None and temperature is not None:
+            # Before publishing, so the new reading comes with its alert state
+            if self.alerts is not None:
+                self.alerts.evaluate(sensor.pin, sensor.last_reading, humidity, temperature)
+            self.store.publish(sensor.pin, humidity, temperature, sensor.last_reading)
+        else:
+            self.store.publish(sensor.pin, error=error)
+        if self.on_result is not None:
+            self.on_result(sensor, humidity, temperature)
+        return sensor, humidity, temperature
+
+    def run(self):
+        """Read sensors until stop() is called"""
+        while not self._stop.is_set():
+            self._take_added()
+            self._run_diagnostics()
+            delay = self._queue[0][0] - time.monotonic() if self._queue else None
+            if delay is None or delay > 0:
+                # Sleep until the next start pulse, an added sensor or stop()
+                self._wake.wait(delay)
+                self._wake.clear()
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                log.warning("Unexpected error: %s", e)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        while not self._diagnostics.empty():
+            self._diagnostics.get()[2].cancel()
+
+    def throughput(self):
+        """Readings per second reached across all sensors"""
+        return sum(s.sample_rate for s in self.sensors)
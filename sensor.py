@@ -0,0 +1,249 @@
+"""DHT11/DHT22 sensor driver on top of a GPIO backend (lgpio on a Pi)"""
+import logging
+import time
+from collections import deque
+
+from backend import load_backend
+from capture import CAPTURE_TIMEOUT, CaptureError, EdgeCapture, pulse_widths
+from decoder import decode_frame
+from line import Line
+from metrics import (BIT_TIMEOUTS, PULSE_WIDTH, READ_ATTEMPTS, READ_DURATION,
+                     READ_FAILURES, READ_SUCCESSES, RESPONSE_LATENCY)
+
+log = logging.getLogger(__name__)
+
+
+class DHT11:
+    # Shortest time between two start pulses the sensor tolerates
+    min_interval = 1.0
+    model = 'dht11'
+    # Longest wait for the edges of a frame after the start pulse
+    capture_timeout = CAPTURE_TIMEOUT
+
+    def __init__(self, pin=17, gpio=None, h=None):
+        """Initialize DHT11 sensor with specified GPIO pin
+
+        gpio is a GPIO backend (see backend.py), by default the one
+        load_backend() selects: lgpio, or the simulator without hardware.
+        Pass an open gpiochip handle as h to share it between sensors; it
+        is then left open when the sensor is closed.
+        """
+        if gpio is None:
+            gpio = load_backend()
+        self.pin = pin
+        self.label = str(pin)   # Metrics label
+        self.gpio = gpio
+        self.owns_handle = h is None
+        
+        if self.owns_handle:
+            try:
+                h = self.gpio.gpiochip_open(0)
+            except Exception as e:
+                raise RuntimeError(f"Failed to open GPIO chip: {e}")
+        self.h = h
+            
+        self.temperature = None
+        self.humidity = None
+        self.last_reading = 0
+        self.last_error = None
+        self.last_phase = None  # CaptureError phase of the last failed read
+        
+        # The pin stays claimed; Line only switches its direction
+        self.line = Line(gpio, self.h, pin)
+        
+        # Start pulse scheduling and per-phase timing of the last read
+        self.next_start = 0
+        self.starts = deque(maxlen=10)
+        self.timing = {}
+        
+        # Verify connection on initialization
+        if not self.verify_connection():
+            if self.owns_handle:
+                self.gpio.gpiochip_close(self.h)
+            raise RuntimeError("Failed to verify sensor connection")
+        
+        # Record sensor responses through lgpio edge alerts
+        self.capture = EdgeCapture(self.line)
+
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """Release the pin, and the gpiochip handle if this sensor opened it"""
+        try:
+            self.capture.cancel()
+            self.line.free()
+            if self.owns_handle:
+                self.gpio.gpiochip_close(self.h)
+        except:
+            pass
+
+    @property
+    def sample_rate(self):
+        """Start pulses per second over the recent reads"""
+        if len(self.starts) < 2:
+            return 0.0
+        return (len(self.starts) - 1) / (self.starts[-1] - self.starts[0])
+
+    def wait_until_due(self):
+        """Sleep until the next start pulse is allowed"""
+        delay = self.next_start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def read(self):
+        """Read temperature and humidity from DHT11 sensor
+
+        Blocks until min_interval has passed since the previous start
+        pulse, so calling it in a loop reads at the sensor's maximum rate.
+        """
+        label = self.label
+        try:
+            t_call = time.monotonic()
+            self.wait_until_due()
+            
+            t_start = time.monotonic()
+            self.next_start = t_start + self.min_interval
+            self.starts.append(t_start)
+            calls = self.line.kernel_calls
+            READ_ATTEMPTS.inc(label)
+            log.debug("Attempting to read sensor on GPIO%d", self.pin)
+            
+            # Send the start signal and record the response as edge timestamps
+            edges = self.capture.read(self.capture_timeout)
+            t_captured = time.monotonic()
+            log.debug("Captured %d edges", len(edges))
+            
+            # Decode the bits offline from the HIGH pulse widths
+            widths = pulse_widths(edges)
+            frame = decode_frame(widths, self.model)
+            t_decoded = time.monotonic()
+            log.debug("Converted to bytes: %s", frame.data)
+            
+            self.timing = {
+                'wait': t_start - t_call,
+                'capture': t_captured - t_start,
+                'decode': t_decoded - t_captured,
+                'kernel_calls': self.line.kernel_calls - calls,
+                'sample_rate': self.sample_rate,
+            }
+            READ_DURATION.observe(t_decoded - t_start, label)
+            for width in widths:
+                PULSE_WIDTH.observe(width * 1e-6, label)
+            
+            if not frame.checksum_ok:
+                expected = sum(frame.data[:4]) & 0xFF
+                raise CaptureError('checksum', f"Checksum failed: got {frame.data[4]}, expected {expected}")
+            # Only short pulses decode to all zeros with a valid checksum; no
+            # DHT reports 0%RH, so this is a line fault rather than a reading
+            if not any(frame.data):
+                raise CaptureError('empty', "Empty frame: every bit was a short pulse")
+            
+            self.humidity = frame.humidity
+            self.temperature = frame.temperature
+            self.last_reading = time.time()
+            self.last_error = None
+            self.last_phase = None
+            READ_SUCCESSES.inc(label)
+            log.debug("Checksum OK: %d", frame.data[4])
+            return self.humidity, self.temperature
+            
+        except CaptureError as e:
+            READ_FAILURES.inc(label, e.phase)
+            if e.bit is not None:
+                BIT_TIMEOUTS.inc(label, str(e.bit))
+            log.warning("GPIO%d: %s", self.pin, e)
+            self.last_error = str(e)
+            self.last_phase = e.phase
+            return None, None
+        except Exception as e:
+            READ_FAILURES.inc(label, 'error')
+            log.warning("GPIO%d: Error reading sensor: %s", self.pin, e)
+            self.last_error = f"Error reading sensor: {e}"
+            self.last_phase = 'error'
+            self.line.reset()
+            return None, None
+        finally:
+            # Response latency: line release to the sensor's first LOW
+            for level, tick in self.capture.edges:
+                if level == 0:
+                    RESPONSE_LATENCY.observe((tick - self.capture.released) * 1e-9, label)
+                    break
+
+    def verify_connection(self):
+        """Verify the sensor connection by testing GPIO control"""
+        try:
+            log.info("Verifying sensor connection on GPIO%d", self.pin)
+            
+            # Test output mode with writing HIGH
+            self.line.output(1)
+            log.debug("Successfully set pin to output mode")
+            time.sleep(0.1)
+            log.debug("Set pin HIGH")
+            
+            # Test writing LOW
+            self.line.output(0)
+            time.sleep(0.1)
+            log.debug("Set pin LOW")
+            
+            # Test input mode
+            self.line.input(pull_up=False)
+            value = self.line.read()
+            log.debug("Pin value in input mode: %d", value)
+            
+            # Leave the line idling HIGH through the pull-up
+            self.line.alert()
+            
+            return True
+        except Exception as e:
+            log.error("Connection verification failed on GPIO%d: %s", self.pin, e)
+            self.line.reset()
+            return False
+
+    def monitor_pin(self, duration=2.0):
+        """Watch the idle line for duration seconds and report what it did
+
+        A diagnostic for a sensor that stopped answering: a healthy idle
+        line stays HIGH through the pull-up. Blocks the calling thread,
+        so the scheduler runs it between reads (Scheduler.diagnose).
+        Returns {'duration', 'level', 'transitions', 'error'}.
+        """
+        log.info("Monitoring pin %d for %s seconds", self.pin, duration)
+        result = {'duration': duration, 'level': None, 'transitions': 0, 'error': None}
+        
+        try:
+            # Configure as input with pull-up
+            self.line.input(pull_up=True)
+            
+            start_time = time.time()
+            last_state = self.line.read()
+            transitions = 0
+            
+            while (time.time() - start_time) < duration:
+                current_state = self.line.read()
+                if current_state != last_state:
+                    transitions += 1
+                    log.debug("Pin changed to %d at %.1fms", current_state, (time.time() - start_time) * 1000)
+                    last_state = current_state
+                time.sleep(0.0001)  # 100µs sampling
+                
+            log.info("Monitoring complete. Observed %d transitions.", transitions)
+            result.update(level=last_state, transitions=transitions)
+            
+            # Back to idle for the next start pulse
+            self.line.alert()
+            
+        except Exception as e:
+            log.warning("Error monitoring pin: %s", e)
+            result['error'] = str(e)
+            self.line.reset()
+        return result
+
+
+class DHT22(DHT11):
+    """DHT22/AM2302: same protocol, 0.1 resolution, 2 s minimum interval"""
+    min_interval = 2.0
+    model = 'dht22'
@@ -0,0 +1,291 @@
+"""Latest readings in shared memory, written by one process, read by many
+
+The acquisition process publishes the latest snapshot of every sensor
+into a multiprocessing.shared_memory block guarded by a seqlock: the
+writer makes the sequence odd, copies the payload in and makes it even
+again; readers copy the payload and retry if the sequence moved. A
+CRC32 of the payload catches torn reads on CPUs that reorder memory
+accesses. Readers never block the writer, and nothing is pickled or
+sent through pipes.
+
+Layout: LOCK, then a payload of HEADER, one SLOT per sensor and a JSON
+blob with the diagnostic details (bring-up status, timing, filter
+counts, metrics text) that are only decoded when asked for.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from multiprocessing import shared_memory
+
+from acquisition import READY, STARTING, STOPPED, WARMING_UP
+from store import Snapshot
+
+DEFAULT_NAME = 'dht-readings'
+DEFAULT_SIZE = 1 << 18
+
+# sequence (odd while a write is in progress), payload length, payload crc32
+LOCK = struct.Struct('<QII')
+
+# store epoch, store sequence, acquisition state, sensor count, time written
+HEADER = struct.Struct('<QQBHd')
+
+# sensor id, humidity, temperature, timestamp (NaN for None), snapshot sequence, error
+SLOT = struct.Struct('<HdddQ96s')
+
+STATES = (STARTING, WARMING_UP, READY, STOPPED)
+
+# A record not rewritten for this long has lost its writer
+HEARTBEAT_TIMEOUT = 5.0
+
+NAN = float('nan')
+
+
+def _float(value):
+    return NAN if value is None else value
+
+
+def _optional(value):
+    return None if math.isnan(value) else value
+
+
+class SharedRecord:
+    """A seqlock-protected byte payload in a named shared memory block
+
+    The writer creates the block with multiprocessing.shared_memory, so
+    it is removed even if the writer dies. Readers map it read-only by
+    name instead: attaching through SharedMemory would register it with
+    the resource tracker, which unlinks it when a reader exits (before
+    Python 3.13).
+    """
+
+    def __init__(self, name=DEFAULT_NAME, create=False, size=DEFAULT_SIZE):
+        self.name = name
+        self.owner = create
+        if create:
+            try:
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # Left behind by a writer that crashed
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            self.buf = self.shm.buf
+        else:
+            self.shm = None
+            fd = os.open(os.path.join('/dev/shm', name), os.O_RDONLY)
+            try:
+                self._map = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+            self.buf = memoryview(self._map)
+        self._sequence = LOCK.unpack_from(self.buf, 0)[0]
+
+    def write(self, payload):
+        """Replace the payload; one writer only"""
+        size = len(payload)
+        if LOCK.size + size > len(self.buf):
+            raise ValueError(f"Payload of {size} bytes does not fit in {self.name}")
+        sequence = self._sequence + 1
+        LOCK.pack_into(self.buf, 0, sequence, 0, 0)
+        self.buf[LOCK.size:LOCK.size + size] = payload
+        LOCK.pack_into(self.buf, 0, sequence + 1, size, zlib.crc32(payload))
+        self._sequence = sequence + 1
+
+    def sequence(self):
+        """Current write sequence; changes with every write"""
+        return LOCK.unpack_from(self.buf, 0)[0]
+
+    def read(self, retries=100):
+        """(sequence, payload) of a consistent copy, or None if none was made"""
+        buf = self.buf
+        for _ in range(retries):
+            sequence, size, crc = LOCK.unpack_from(buf, 0)
+            if not sequence:
+                return None     # Nothing written yet
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            payload = bytes(buf[LOCK.size:LOCK.size + size])
+            if LOCK.unpack_from(buf, 0)[0] == sequence and zlib.crc32(payload) == crc:
+                return sequence, payload
+        return None
+
+    def close(self):
+        """Detach; the writer also removes the block"""
+        buf, self.buf = self.buf, None
+        if self.owner:
+            self.shm.close()
+            self.shm.unlink()
+        else:
+            try:
+                buf.release()
+                self._map.close()
+            except BufferError:
+                pass    # A concurrent read still holds a view; freed with it
+
+
+def encode(epoch, store_seq, state, snapshots, details):
+    """Payload for the given store state"""
+    parts = [HEADER.pack(epoch, store_seq, STATES.index(state), len(snapshots), time.time())]
+    for pin, s in sorted(snapshots.items()):
+        parts.append(SLOT.pack(pin, _float(s.humidity), _float(s.temperature), _float(s.timestamp),
+                               s.seq, (s.error or '').encode()))
+    parts.append(json.dumps(details, separators=(',', ':')).encode())
+    return b''.join(parts)
+
+
+def decode(payload):
+    """(store epoch, store sequence, state, written at, {pin: Snapshot}, raw details)"""
+    epoch, store_seq, state, count, written = HEADER.unpack_from(payload, 0)
+    snapshots = {}
+    offset = HEADER.size
+    for _ in range(count):
+        pin, humidity, temperature, timestamp, seq, error = SLOT.unpack_from(payload, offset)
+        error = error.rstrip(b'\0').decode(errors='replace') or None
+        snapshots[pin] = Snapshot(_optional(humidity), _optional(temperature),
+                                  _optional(timestamp), seq, pin, error)
+        offset += SLOT.size
+    return epoch, store_seq, STATES[state], written, snapshots, payload[offset:]
+
+
+class SharedWriter:
+    """Publishes an Acquisition's latest readings to a SharedRecord"""
+
+    def __init__(self, acquisition, name=DEFAULT_NAME, size=DEFAULT_SIZE):
+        self.acquisition = acquisition
+        self.record = SharedRecord(name, create=True, size=size)
+        self._lock = threading.Lock()
+
+    def publish(self):
+        """Write the current state; called after every reading and periodically"""
+        acquisition = self.acquisition
+        store = acquisition.store
+        details = acquisition.details()
+        details['metrics'] = acquisition.metrics()
+        with self._lock:
+            self.record.write(encode(store.epoch, store.seq, acquisition.state, store.snapshots(),
+                                     details))
+
+    def close(self):
+        with self._lock:
+            self.record.close()
+
+
+class SharedAcquisition:
+    """Read-only view of an acquisition running in another process
+
+    Offers what the web app uses of Acquisition: store (epoch, seq, get,
+    snapshots), state, status(), details() and metrics(). A watcher
+    thread attaches to the record, reattaching if its writer restarts,
+    and calls on_update() whenever the store epoch or sequence changes.
+    """
+
+    def __init__(self, name=DEFAULT_NAME, on_update=None, poll_interval=0.02):
+        self.name = name
+        self.on_update = on_update
+        self.poll_interval = poll_interval
+        self.store = self
+        self.record = None
+        # (write sequence, store epoch, store sequence, state, written at, snapshots,
+        #  raw details)
+        self._view = (None, 0, 0, STARTING, 0.0, {}, b'{}')
+        self._details = (None, {})
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, name='shared-watcher', daemon=True)
+        self._thread.start()
+
+    def _attach(self):
+        try:
+            self.record = SharedRecord(self.name)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _watch(self):
+        last = None
+        while not self._stop.wait(self.poll_interval):
+            if self.record is None and not self._attach():
+                continue
+            view = self._load()
+            if time.time() - view[4] > HEARTBEAT_TIMEOUT and view[0] is not None:
+                # The writer is gone; pick up the block of its successor
+                record, self.record = self.record, None
+                self._view = (None, view[1], view[2], STOPPED) + view[4:]
+                record.close()
+                continue
+            if view[1:3] != last:
+                last = view[1:3]
+                if self.on_update is not None:
+                    self.on_update()
+
+    def _load(self):
+        """Decoded payload, refreshed only when the record was rewritten"""
+        view = self._view
+        record = self.record
+        try:
+            if record is None or record.sequence() == view[0]:
+                return view
+            copy = record.read()
+        except (TypeError, ValueError):
+            return view     # Detached by the watcher meanwhile
+        if copy is not None:
+            view = self._view = (copy[0],) + decode(copy[1])
+        return view
+
+    # --- LatestStore interface ---
+
+    @property
+    def epoch(self):
+        return self._load()[1]
+
+    @property
+    def seq(self):
+        return self._load()[2]
+
+    def get(self, sensor_id):
+        return self._load()[5].get(sensor_id)
+
+    def snapshots(self):
+        return self._load()[5]
+
+    # --- Acquisition interface ---
+
+    @property
+    def state(self):
+        view = self._load()
+        if view[0] is not None and time.time() - view[4] > HEARTBEAT_TIMEOUT:
+            return STOPPED
+        return view[3]
+
+    def details(self):
+        view = self._load()
+        sequence, details = self._details
+        if sequence != view[0]:
+            details = json.loads(view[6])
+            self._details = (view[0], details)
+        return details
+
+    def status(self):
+        status = dict(self.details().get('status', {'error': None, 'sensors': {}}))
+        status['state'] = self.state
+        return status
+
+    def metrics(self):
+        return self.details().get('metrics', '')
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.record is not None:
+            self.record.close()
+            self.record = None
@@ -0,0 +1,140 @@
+"""Simulated DHT11/DHT22 sensors behind the lgpio interface
+
+SimulatedGpio answers every start pulse with a protocol waveform from
+the SimulatedSensor on that pin, with configurable pulse jitter,
+dropped edges, corrupt bits and missing responses. Like lgpio, edges
+are delivered from a separate thread once the frame would have ended,
+so the capture path sees the same threading and deadlines as on a Pi.
+"""
+import os
+import random
+import threading
+import time
+
+from fake_lgpio import FakeLgpio, frame_edges
+
+
+def encode(model, humidity, temperature):
+    """The 5 frame bytes a sensor sends for the given values"""
+    h = round(humidity * 10)
+    t = round(abs(temperature) * 10)
+    sign = 0x80 if temperature < 0 else 0
+    if model == 'dht22':
+        data = [h >> 8, h & 0xFF, (t >> 8) | sign, t & 0xFF]
+    else:
+        data = [h // 10, h % 10, t // 10, (t % 10) | sign]
+    data.append(sum(data) & 0xFF)
+    return data
+
+
+class SimulatedSensor:
+    """One DHT sensor: current values and how badly its frames arrive
+
+    jitter_us is the standard deviation added to every pulse width,
+    drop_rate the chance that an edge is missed, corrupt_rate the chance
+    that a frame has one flipped bit and no_response_rate the chance that
+    the sensor ignores a start pulse. Start pulses closer together than
+    min_interval seconds are ignored too.
+    """
+
+    def __init__(self, model='dht11', humidity=50.0, temperature=22.0, jitter_us=0.0,
+                 drop_rate=0.0, corrupt_rate=0.0, no_response_rate=0.0, min_interval=0.0,
+                 seed=None):
+        self.model = model
+        self.humidity = humidity
+        self.temperature = temperature
+        self.jitter_us = jitter_us
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.no_response_rate = no_response_rate
+        self.min_interval = min_interval
+        self.connected = True
+        self.rng = random.Random(seed)
+        self.last_start = None
+        self.frames = 0
+
+    def frame(self):
+        """Edge trace answering a start pulse now, or None for no answer"""
+        rng = self.rng
+        now = time.monotonic()
+        last, self.last_start = self.last_start, now
+        if not self.connected or rng.random() < self.no_response_rate:
+            return None
+        if last is not None and now - last < self.min_interval:
+            return None
+        self.frames += 1
+
+        data = encode(self.model, self.humidity, self.temperature)
+        if rng.random() < self.corrupt_rate:
+            bit = rng.randrange(40)
+            data[bit // 8] ^= 0x80 >> (bit % 8)
+
+        jitter = None
+        if self.jitter_us:
+            sigma = self.jitter_us * 1000
+            jitter = lambda: int(rng.gauss(0, sigma))
+        edges = frame_edges(data, jitter=jitter)
+        if self.drop_rate:
+            edges = [edge for edge in edges if rng.random() >= self.drop_rate]
+        return edges
+
+
+class SimulatedGpio(FakeLgpio):
+    """FakeLgpio with a simulated sensor on every pin
+
+    Pins get a SimulatedSensor built from sensor_defaults on their first
+    start pulse unless one was attached; traces queued with load_trace
+    still take precedence. With threaded=False edges are delivered
+    synchronously, inside the call that released the line.
+    """
+
+    def __init__(self, threaded=True, seed=None, **sensor_defaults):
+        super().__init__()
+        self.threaded = threaded
+        self.seed = seed
+        self.sensor_defaults = sensor_defaults
+        self.sensors = {}       # pin -> SimulatedSensor
+
+    @classmethod
+    def from_env(cls):
+        """Configure from DHT_SIM_* environment variables"""
+        env = os.environ.get
+        seed = env('DHT_SIM_SEED')
+        return cls(
+            seed=int(seed) if seed is not None else None,
+            model=env('DHT_SIM_MODEL', 'dht11'),
+            humidity=float(env('DHT_SIM_HUMIDITY', 50.0)),
+            temperature=float(env('DHT_SIM_TEMPERATURE', 22.0)),
+            jitter_us=float(env('DHT_SIM_JITTER_US', 2.0)),
+            drop_rate=float(env('DHT_SIM_DROP_RATE', 0.0)),
+            corrupt_rate=float(env('DHT_SIM_CORRUPT_RATE', 0.0)),
+            no_response_rate=float(env('DHT_SIM_NO_RESPONSE_RATE', 0.0)),
+            min_interval=float(env('DHT_SIM_MIN_INTERVAL', 0.0)))
+
+    def attach(self, pin, sensor=None, **options):
+        """Put a sensor on pin; built from the defaults and options if not given"""
+        if sensor is None:
+            settings = dict(self.sensor_defaults, **options)
+            if self.seed is not None:
+                settings.setdefault('seed', self.seed + pin)
+            sensor = SimulatedSensor(**settings)
+        self.sensors[pin] = sensor
+        return sensor
+
+    def _response(self, gpio):
+        edges = super()._response(gpio)
+        if edges is not None:
+            return edges
+        sensor = self.sensors.get(gpio)
+        if sensor is None:
+            sensor = self.attach(gpio)
+        return sensor.frame()
+
+    def _replay(self, handle, gpio, edges, base):
+        if not self.threaded:
+            return super()._replay(handle, gpio, edges, base)
+        # Deliver the whole frame once it would have ended on the wire
+        delay = max(edges[-1][1] / 1e9 - (time.time_ns() - base) / 1e9, 0)
+        timer = threading.Timer(delay, super()._replay, (handle, gpio, edges, base))
+        timer.daemon = True
+        timer.start()
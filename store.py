@@ -0,0 +1,93 @@
+"""Latest-reading store shared between the sensor thread and Flask
+
+Each reading is an immutable Snapshot. The store keeps a dict of the
+latest snapshot per sensor and replaces the whole dict on every publish,
+so readers get a consistent value/timestamp pair from a single attribute
+load without taking a lock.
+"""
+import threading
+import time
+
+
+class Snapshot:
+    """Immutable latest state of one sensor"""
+
+    __slots__ = ('humidity', 'temperature', 'timestamp', 'seq', 'sensor_id', 'error')
+
+    def __init__(self, humidity, temperature, timestamp, seq, sensor_id, error=None):
+        set_ = object.__setattr__
+        set_(self, 'humidity', humidity)
+        set_(self, 'temperature', temperature)
+        set_(self, 'timestamp', timestamp)
+        set_(self, 'seq', seq)
+        set_(self, 'sensor_id', sensor_id)
+        set_(self, 'error', error)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable")
+
+    def __repr__(self):
+        return (f"Snapshot(sensor_id={self.sensor_id}, seq={self.seq}, humidity={self.humidity}, "
+                f"temperature={self.temperature}, timestamp={self.timestamp}, error={self.error!r})")
+
+    @property
+    def has_reading(self):
+        return self.timestamp is not None
+
+    def age(self, now=None):
+        """Seconds since the values were captured, None without a reading"""
+        if self.timestamp is None:
+            return None
+        return (time.time() if now is None else now) - self.timestamp
+
+    def is_stale(self, max_age, now=None):
+        age = self.age(now)
+        return age is None or age > max_age
+
+    def to_dict(self, max_age, now=None):
+        """JSON-ready view including age and staleness"""
+        return {
+            'sensor': self.sensor_id,
+            'seq': self.seq,
+            'humidity': self.humidity,
+            'temperature': self.temperature,
+            'timestamp': self.timestamp,
+            'age': self.age(now),
+            'stale': self.is_stale(max_age, now),
+            'error': self.error,
+        }
+
+
+class LatestStore:
+    """Latest Snapshot per sensor, swapped atomically on publish"""
+
+    def __init__(self):
+        self.seq = 0                # Sequence number of the last publish
+        # Identifies this store instance; seq restarts at 0 with a new epoch
+        self.epoch = time.time_ns()
+        self._latest = {}
+        self._write_lock = threading.Lock()  # Only taken by writers
+
+    def publish(self, sensor_id, humidity=None, temperature=None, timestamp=None, error=None):
+        """Record a reading, or an error that keeps the previous values"""
+        with self._write_lock:
+            previous = self._latest.get(sensor_id)
+            if error is not None and previous is not None:
+                humidity, temperature = previous.humidity, previous.temperature
+                timestamp = previous.timestamp
+            elif error is None and timestamp is None:
+                timestamp = time.time()
+            self.seq += 1
+            snapshot = Snapshot(humidity, temperature, timestamp, self.seq, sensor_id, error)
+            latest = dict(self._latest)
+            latest[sensor_id] = snapshot
+            self._latest = latest
+        return snapshot
+
+    def get(self, sensor_id):
+        """Latest Snapshot of a sensor, or None if it never reported"""
+        return self._latest.get(sensor_id)
+
+    def snapshots(self):
+        """All latest snapshots, from one consistent version of the store"""
+        return self._latest
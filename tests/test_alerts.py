@@ -0,0 +1,112 @@
+import json
+
+import pytest
+
+from alerts import FIRING, OK, PENDING, AlertEngine, Rule, Webhook, summary
+
+
+def states(step, readings, field=1):
+    """State changes of a compiled rule over (timestamp, value) readings"""
+    changes = []
+    for timestamp, value in readings:
+        values = [50.0, 20.0]
+        values[field] = value
+        change = step(timestamp, tuple(values))
+        if change is not None:
+            changes.append((timestamp, change[0]))
+    return changes
+
+
+def test_threshold_fires_and_clears_with_hysteresis():
+    step = Rule('hot', 'temperature', '>', 40.0, hysteresis=1.0).compile()
+    readings = [(0, 39.0), (1, 40.5), (2, 39.5), (3, 40.5), (4, 38.9), (5, 39.5)]
+    assert states(step, readings) == [(1, FIRING), (4, OK)]
+
+
+def test_below_threshold_rule():
+    step = Rule('dry', 'humidity', '<', 30.0, hysteresis=2.0).compile()
+    readings = [(0, 35.0), (1, 29.0), (2, 31.0), (3, 32.5)]
+    assert states(step, readings, field=0) == [(1, FIRING), (3, OK)]
+
+
+def test_duration_goes_pending_first():
+    step = Rule('hot', 'temperature', '>', 40.0, duration=10.0).compile()
+    readings = [(0, 41.0), (5, 41.0), (8, 39.0), (20, 41.0), (30, 41.0)]
+    assert states(step, readings) == [(0, PENDING), (8, OK), (20, PENDING), (30, FIRING)]
+
+
+def test_rate_needs_half_a_window_of_readings():
+    step = Rule('jump', 'temperature', '>', 5.0, rate=True, window=60.0).compile()
+    # A 2 degree step one second in would read as 120 degrees/min
+    assert states(step, [(0, 29.0), (1, 31.0), (10, 31.0)]) == []
+    # 2 degrees over 30 s is 4/min; 4 degrees over 40 s is 6/min
+    assert states(step, [(30, 31.0), (40, 33.0)]) == [(40, FIRING)]
+
+
+def test_rate_forgets_readings_older_than_the_window():
+    step = Rule('jump', 'temperature', '>', 5.0, rate=True, window=60.0).compile()
+    readings = [(t, 20.0) for t in range(0, 100, 10)] + [(100, 23.0)]
+    # Over the last 60 s: 3 degrees, 3/min
+    assert states(step, readings) == []
+
+
+def test_unknown_field_or_operator():
+    with pytest.raises(ValueError):
+        Rule('bad', 'pressure')
+    with pytest.raises(ValueError):
+        Rule('bad', 'humidity', '>=')
+
+
+def test_engine_keeps_state_per_sensor():
+    engine = AlertEngine([Rule('hot', 'temperature', '>', 40.0, sensors=[23])])
+    received = []
+    engine.subscribe(received.append)
+    assert engine.evaluate(24, 0.0, 50.0, 45.0) == []
+    changes = engine.evaluate(23, 0.0, 50.0, 45.0)
+    assert [(c['rule'], c['sensor'], c['state']) for c in changes] == [('hot', 23, FIRING)]
+    assert received == [changes]
+    assert engine.state['seq'] == 1
+    assert summary(engine.state, 23) == {'temperature': FIRING}
+    assert summary(engine.state, 24) == {}
+
+    engine.evaluate(23, 1.0, 50.0, 45.0)
+    assert engine.state['seq'] == 1
+    engine.evaluate(23, 2.0, 50.0, 30.0)
+    assert engine.state['seq'] == 2
+    assert engine.state['alerts'] == []
+
+
+def test_webhook_posts_changes(collector, wait_for):
+    webhook = Webhook(collector.url, retry_delay=0.01)
+    engine = AlertEngine([Rule('hot', 'temperature', '>', 40.0)])
+    engine.subscribe(webhook)
+    webhook.start()
+    engine.evaluate(23, 0.0, 50.0, 45.0)
+    engine.evaluate(23, 1.0, 50.0, 30.0)
+    assert wait_for(lambda: collector.requests == 2)
+    webhook.close()
+    bodies = [json.loads(body) for body in collector.bodies]
+    assert [[c['state'] for c in body['changes']] for body in bodies] == [[FIRING], [OK]]
+    assert bodies[0]['changes'][0]['value'] == 45.0
+
+
+def test_webhook_retries_server_errors(collector, wait_for):
+    collector.status = 503
+    webhook = Webhook(collector.url, attempts=3, retry_delay=0.2)
+    webhook.start()
+    webhook([{'rule': 'hot', 'state': FIRING}])
+    assert wait_for(lambda: collector.requests == 1)
+    collector.status = 204
+    assert wait_for(lambda: len(collector.bodies) == 1)
+    webhook.close()
+    assert collector.requests == 2
+
+
+def test_webhook_gives_up_on_client_errors(collector):
+    collector.status = 400
+    webhook = Webhook(collector.url, attempts=3, retry_delay=0.01)
+    webhook.start()
+    webhook([{'rule': 'hot', 'state': FIRING}])
+    webhook.close()
+    assert collector.requests == 1
+    assert collector.bodies == []
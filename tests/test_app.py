@@ -0,0 +1,227 @@
+import concurrent.futures
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+import app as module
+from simulator import SimulatedGpio
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app on a simulated GPIO, sensors not started"""
+    monkeypatch.setattr(module, 'HISTORY_CAPACITY', 1000)
+    app = module.create_app(gpio=SimulatedGpio(), history_path=str(tmp_path / 'history.bin'),
+                            start=False)
+    yield app
+    app.extensions['dht'].close()
+
+
+def test_history_rejects_a_limit_below_one(app):
+    client = app.test_client()
+    for limit in (0, -3):
+        response = client.get(f'/sensor/history?limit={limit}')
+        assert response.status_code == 400
+    assert client.get('/sensor/history?limit=1').status_code == 200
+
+
+def export(client, query=''):
+    response = client.get('/sensor/export' + query)
+    lines = [json.loads(line) for line in response.get_data().splitlines()]
+    return response, [line['seq'] for line in lines]
+
+
+def test_export_since_to_and_limit(app):
+    history = app.extensions['dht'].history
+    for t in range(10):
+        history.append(100.0 + t, 23, 50.0, 20.0)
+    history.flush()
+    client = app.test_client()
+
+    response, seqs = export(client)
+    assert seqs == list(range(10))
+    assert response.headers['X-First-Sequence'] == '0'
+    assert response.headers['X-Next-Since'] == '10'
+
+    response, seqs = export(client, '?since=4&limit=3')
+    assert seqs == [4, 5, 6]
+    assert response.headers['X-Next-Since'] == '7'
+    # to= is inclusive, from= picks the first at or after it
+    assert export(client, '?from=102.5&to=105')[1] == [3, 4, 5]
+    # Nothing new since the last export
+    response, seqs = export(client, '?since=10')
+    assert seqs == []
+    assert response.headers['X-Next-Since'] == '10'
+
+
+def test_export_since_overwritten_records_starts_at_the_oldest(app):
+    history = app.extensions['dht'].history
+    for t in range(history.capacity + 5):
+        history.append(float(t), 23, 50.0, 20.0)
+    history.flush()
+    response, seqs = export(app.test_client(), '?since=2&limit=3')
+    assert response.headers['X-First-Sequence'] == '5'
+    assert seqs == [5, 6, 7]
+    assert response.headers['X-Next-Since'] == '8'
+
+
+def test_export_leaves_out_unflushed_readings(app):
+    history = app.extensions['dht'].history
+    history.append(1.0, 23, 50.0, 20.0)
+    client = app.test_client()
+    response, seqs = export(client)
+    assert seqs == []
+    assert response.headers['X-Next-Since'] == '0'
+    history.flush()
+    assert export(client)[1] == [0]
+
+
+def test_export_unknown_format(app):
+    assert app.test_client().get('/sensor/export?format=xml').status_code == 400
+
+
+def test_monitor_timeout_is_a_gateway_timeout(app, monkeypatch):
+    client = app.test_client()
+    assert client.post('/sensor/4/monitor?duration=0.1').status_code == 404
+
+    def monitor(pin, duration):
+        raise concurrent.futures.TimeoutError()
+    monkeypatch.setattr(app.extensions['dht'].acquisition, 'monitor', monitor)
+    assert client.post('/sensor/4/monitor?duration=0.1').status_code == 504
+
+
+def publish(station, humidity=50.0, timestamp=None):
+    """A new reading of the dashboard sensor, pushed as the acquisition does"""
+    station.store.publish(station.pins[0], humidity, 20.0, timestamp)
+    station.publish()
+
+
+def publish_later(station, delay=0.1):
+    timer = threading.Timer(delay, publish, (station, 60.0))
+    timer.start()
+    return timer
+
+
+def test_sensor_etag_and_not_modified(app):
+    station = app.extensions['dht']
+    publish(station)
+    client = app.test_client()
+    response = client.get('/sensor')
+    assert response.get_json()['humidity'] == 50.0
+    etag = response.headers['ETag']
+    response = client.get('/sensor', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+
+    publish(station, 55.0)
+    response = client.get('/sensor', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_sensor_etag_changes_when_a_reading_turns_stale(app):
+    station = app.extensions['dht']
+    publish(station, timestamp=time.time() - module.STALE_AFTER + 0.2)
+    client = app.test_client()
+    etag = client.get('/sensor').headers['ETag']
+    # A long-poll returns when the reading turns stale, without a new reading
+    started = time.monotonic()
+    response = client.get('/sensor?wait=5', headers={'If-None-Match': etag})
+    assert time.monotonic() - started < 2.0
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['stale']
+
+
+def test_sensor_long_poll(app):
+    station = app.extensions['dht']
+    publish(station)
+    client = app.test_client()
+    etag = client.get('/sensor').headers['ETag']
+    # Nothing new: 304 once the wait is over
+    started = time.monotonic()
+    assert client.get('/sensor?wait=0.2', headers={'If-None-Match': etag}).status_code == 304
+    assert time.monotonic() - started >= 0.2
+
+    timer = publish_later(station)
+    started = time.monotonic()
+    response = client.get('/sensor?wait=5', headers={'If-None-Match': etag})
+    assert time.monotonic() - started < 2.0
+    assert response.get_json()['humidity'] == 60.0
+    timer.join()
+
+
+def test_sensor_stream_sends_the_current_payload_then_each_new_one(app):
+    station = app.extensions['dht']
+    publish(station)
+    response = app.test_client().get('/sensor/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    events = response.response
+    assert next(events) == b'retry: 3000\n\n'
+
+    def event():
+        version, data = next(events).decode().split('\n')[:2]
+        return version[len('id: '):], json.loads(data[len('data: '):])
+
+    version, payload = event()
+    assert version == station.version()
+    assert payload['humidity'] == 50.0
+    timer = publish_later(station)
+    version, payload = event()
+    assert version == station.version()
+    assert payload['humidity'] == 60.0
+    timer.join()
+    response.close()
+
+
+def test_dashboard_is_rendered_once_per_reading(app, monkeypatch):
+    station = app.extensions['dht']
+    render, rendered = station.render_dashboard, []
+
+    def counting(snapshot, stale):
+        rendered.append((snapshot.seq, stale))
+        return render(snapshot, stale)
+    monkeypatch.setattr(station, 'render_dashboard', counting)
+    client = app.test_client()
+    publish(station)
+    client.get('/')
+    client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert rendered == [(1, False)]
+    assert station.page_cache[0] == (station.store.epoch, 1, False)
+
+    publish(station, 55.0)
+    client.get('/')
+    # Turning stale is a new page too
+    monkeypatch.setattr(module, 'STALE_AFTER', -1.0)
+    client.get('/')
+    client.get('/')
+    assert rendered == [(1, False), (2, False), (2, True)]
+
+
+def test_dashboard_etags_and_headers(app):
+    publish(app.extensions['dht'])
+    client = app.test_client()
+    plain = client.get('/')
+    gzipped = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.get_data()) == plain.get_data()
+    assert gzipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+    for response in (plain, gzipped):
+        assert response.headers['Vary'] == 'Accept-Encoding'
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+    response = client.get('/', headers={'If-None-Match': plain.headers['ETag']})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    # The ETag of one encoding does not match the other
+    response = client.get('/', headers={'If-None-Match': plain.headers['ETag'],
+                                        'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    response = client.get('/', headers={'If-None-Match': gzipped.headers['ETag'],
+                                        'Accept-Encoding': 'gzip'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == gzipped.headers['ETag']
+    assert response.headers['Vary'] == 'Accept-Encoding'
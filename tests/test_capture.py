@@ -0,0 +1,46 @@
+import pytest
+
+from capture import CaptureError, pulse_widths
+from fake_lgpio import frame_edges
+
+DATA = bytes([55, 0, 24, 3, 82])
+
+
+def phase(edges):
+    with pytest.raises(CaptureError) as error:
+        pulse_widths(edges)
+    return error.value.phase, error.value.bit
+
+
+def test_widths_of_a_full_frame():
+    widths = pulse_widths(frame_edges(DATA))
+    assert len(widths) == 40
+    bits = ''.join('1' if w > 50 else '0' for w in widths)
+    assert bits == ''.join(f'{byte:08b}' for byte in DATA)
+    assert set(widths) == {27.0, 70.0}
+
+
+def test_leading_release_high_is_skipped():
+    edges = [(1, 0)] + frame_edges(DATA)
+    assert pulse_widths(edges) == pulse_widths(frame_edges(DATA))
+
+
+def test_no_falling_edge_is_no_response_low():
+    assert phase([]) == ('no_response_low', None)
+    assert phase([(1, 1000)]) == ('no_response_low', None)
+
+
+def test_one_falling_edge_is_no_response_high():
+    assert phase(frame_edges(DATA)[:1]) == ('no_response_high', None)
+    assert phase(frame_edges(DATA)[:2]) == ('no_response_high', None)
+
+
+@pytest.mark.parametrize('bits', [0, 1, 10, 39])
+def test_partial_frame_names_the_first_missing_bit(bits):
+    # Response LOW, response HIGH, then `bits` complete data bits
+    edges = frame_edges(DATA)[:3 + 2 * bits]
+    assert phase(edges) == ('bit', bits)
+
+
+def test_missing_response_high_end_is_bit_0():
+    assert phase([(0, 30000), (0, 110000)]) == ('bit', 0)
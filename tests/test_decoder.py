@@ -0,0 +1,62 @@
+import pytest
+
+from decoder import DEFAULT_THRESHOLD_US, decode_frame
+
+
+def widths(data, short=27.0, long=70.0):
+    return [long if (byte >> i) & 1 else short for byte in data for i in range(7, -1, -1)]
+
+
+def with_checksum(*data):
+    return bytes(data) + bytes([sum(data) & 0xFF])
+
+
+def test_dht11_reading():
+    frame = decode_frame(widths(with_checksum(55, 0, 24, 3)))
+    assert (frame.humidity, frame.temperature) == (55.0, 24.3)
+    assert frame.checksum_ok
+    assert frame.data == with_checksum(55, 0, 24, 3)
+
+
+def test_dht11_negative_temperature():
+    frame = decode_frame(widths(with_checksum(40, 0, 5, 0x80 | 3)))
+    assert frame.temperature == -5.3
+    assert frame.checksum_ok
+
+
+def test_dht22_reading():
+    frame = decode_frame(widths(with_checksum(0x02, 0x8C, 0x01, 0x5F)), 'dht22')
+    assert (frame.humidity, frame.temperature) == (65.2, 35.1)
+    assert frame.checksum_ok
+
+
+def test_dht22_negative_temperature():
+    frame = decode_frame(widths(with_checksum(0x02, 0x8C, 0x80, 0x65)), 'dht22')
+    assert frame.temperature == -10.1
+    assert frame.checksum_ok
+
+
+def test_bad_checksum():
+    data = bytearray(with_checksum(55, 0, 24, 3))
+    data[4] ^= 1
+    frame = decode_frame(widths(data))
+    assert not frame.checksum_ok
+    assert (frame.humidity, frame.temperature) == (55.0, 24.3)
+
+
+def test_threshold_follows_the_pulse_widths():
+    # A slow sensor: both clusters shifted up
+    frame = decode_frame(widths(with_checksum(55, 0, 24, 3), short=45.0, long=95.0))
+    assert 45.0 < frame.threshold < 95.0
+    assert (frame.humidity, frame.temperature) == (55.0, 24.3)
+
+
+def test_single_cluster_uses_default_threshold():
+    frame = decode_frame(widths(bytes(5)))
+    assert frame.threshold == DEFAULT_THRESHOLD_US
+    assert frame.data == bytes(5)
+
+
+def test_wrong_number_of_widths():
+    with pytest.raises(ValueError):
+        decode_frame([27.0] * 39)
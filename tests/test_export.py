@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from export import CSV_HEADER, EXPORT_RECORD, binary, csv, ndjson
+from history import History
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = History(str(tmp_path / 'history.bin'), capacity=8, batch_size=1)
+    yield history
+    history.close()
+
+
+def fill(history, timestamps, sensor_id=23):
+    for t in timestamps:
+        history.append(float(t), sensor_id if t % 2 else 24, 50.0, 20.0)
+
+
+def sequences(chunks):
+    return [seq for first, records in chunks for seq in range(first, first + len(records))]
+
+
+def test_bounds_and_sequence_at(history):
+    assert history.bounds() == (0, 0)
+    assert history.sequence_at(5.0) == 0
+    fill(history, range(5))
+    assert history.bounds() == (0, 5)
+    assert history.sequence_at(2.0) == 2
+    assert history.sequence_at(2.5) == 3
+    assert history.sequence_at(100.0) == 5
+
+
+def test_bounds_move_past_overwritten_records(history):
+    fill(history, range(20))
+    assert history.bounds() == (12, 20)
+    assert history.sequence_at(0.0) == 12
+    assert history.sequence_at(15.0) == 15
+
+
+def test_scan_clamps_to_the_stored_records(history):
+    fill(history, range(20))
+    assert sequences(history.scan(0, 100)) == list(range(12, 20))
+    assert sequences(history.scan(14, 17)) == [14, 15, 16]
+    assert list(history.scan(25, 30)) == []
+    assert list(history.scan(15, 15)) == []
+
+
+def test_scan_chunks_stop_at_the_end_of_the_ring(history):
+    fill(history, range(13))     # Oldest stored (5) in slot 5, newest in slot 4
+    chunks = list(history.scan(5, 13, chunk=2))
+    assert [(first, len(records)) for first, records in chunks] == [(5, 2), (7, 1), (8, 2), (10, 2), (12, 1)]
+    assert [r[0] for first, records in chunks for r in records] == [float(t) for t in range(5, 13)]
+
+
+def test_scan_leaves_out_pending_records(tmp_path):
+    history = History(str(tmp_path / 'history.bin'), capacity=8, batch_size=4, flush_interval=3600)
+    fill(history, range(3))
+    assert history.bounds() == (0, 0)
+    assert list(history.scan(0, 10)) == []
+    history.flush()
+    assert sequences(history.scan(0, 10)) == [0, 1, 2]
+    history.close()
+
+
+def test_encoders(history):
+    history.append(1.5, 23, 55.0, 21.25)
+    history.append(2.0, 24, 60.0, 19.0)
+    assert [json.loads(line) for line in b''.join(ndjson(history.scan(0, 2))).splitlines()] == [
+        {'seq': 0, 'timestamp': 1.5, 'sensor': 23, 'humidity': 55.0, 'temperature': 21.2},
+        {'seq': 1, 'timestamp': 2.0, 'sensor': 24, 'humidity': 60.0, 'temperature': 19.0},
+    ]
+    assert b''.join(csv(history.scan(0, 2), sensor_id=24)).decode() == CSV_HEADER + '1,2.0,24,60.0,19.0\n'
+    assert list(EXPORT_RECORD.iter_unpack(b''.join(binary(history.scan(0, 2))))) == [
+        (0, 1.5, 23, 0, 55.0, 21.25), (1, 2.0, 24, 0, 60.0, 19.0)]
+    # Chunks without a record of the sensor give no empty blocks
+    assert list(ndjson(history.scan(0, 2), sensor_id=25)) == []
+    assert list(csv(history.scan(0, 2), sensor_id=25)) == [CSV_HEADER.encode()]
@@ -0,0 +1,114 @@
+import pytest
+
+from filters import (Ewma, FilterBank, Kalman, MedianFilter, Pipeline, RangeCheck, RateLimit,
+                     Reject, default_stages, median)
+
+
+def run(stage, samples):
+    """Output of a stage per (timestamp, humidity, temperature), or the reject reason"""
+    results = []
+    for sample in samples:
+        try:
+            results.append(stage.process(*sample))
+        except Reject as e:
+            results.append(e.reason)
+    return results
+
+
+def test_range_check():
+    stage = RangeCheck()
+    assert run(stage, [(0, 50.0, 20.0), (1, 101.0, 20.0), (2, 50.0, -41.0)]) == [
+        (50.0, 20.0), 'humidity_range', 'temperature_range']
+
+
+def test_median():
+    assert median([3.0]) == 3.0
+    assert median([50.0, 90.0]) == 70.0
+    assert median([5.0, 1.0, 3.0]) == 3.0
+    assert median([4.0, 1.0, 3.0, 2.0]) == 2.5
+
+
+def test_median_filter_smooths_without_max_deviation():
+    stage = MedianFilter(3)
+    samples = [(0, 50.0, 20.0), (1, 90.0, 20.0), (2, 52.0, 21.0), (3, 54.0, 22.0)]
+    # A spike in a half-full window is averaged, not passed through
+    assert run(stage, samples) == [(50.0, 20.0), (70.0, 20.0), (52.0, 20.0), (54.0, 21.0)]
+
+
+def test_median_filter_passes_samples_until_the_window_is_full():
+    stage = MedianFilter(5, max_deviation=(10.0, 4.0))
+    # 80 is an outlier, but the window is not full yet
+    warm_up = [(0, 50.0, 20.0), (1, 80.0, 20.0), (2, 50.0, 20.0), (3, 50.0, 20.0)]
+    assert run(stage, warm_up) == [(h, c) for _, h, c in warm_up]
+    assert run(stage, [(4, 80.0, 20.0)]) == ['humidity_outlier']
+
+
+def test_median_filter_accepts_a_step_once_it_fills_half_the_window():
+    stage = MedianFilter(5, max_deviation=(10.0, 4.0))
+    run(stage, [(t, 50.0, 20.0) for t in range(5)])
+    assert run(stage, [(t, 50.0, 30.0) for t in range(5, 8)]) == [
+        'temperature_outlier', 'temperature_outlier', (50.0, 30.0)]
+
+
+def test_rate_limit_rejects_fast_changes():
+    stage = RateLimit(max_rate=(5.0, 2.0))
+    samples = [(0, 50.0, 20.0), (1, 60.0, 20.0), (2, 50.0, 25.0), (3, 52.0, 21.0)]
+    assert run(stage, samples) == [(50.0, 20.0), 'humidity_rate', 'temperature_rate', (52.0, 21.0)]
+    assert stage.rejects == 0
+
+
+def test_rate_limit_allows_more_change_over_longer_gaps():
+    stage = RateLimit(max_rate=(5.0, 2.0))
+    assert run(stage, [(0, 50.0, 20.0), (10, 90.0, 20.0)]) == [(50.0, 20.0), (90.0, 20.0)]
+
+
+def test_rate_limit_accepts_a_real_step_after_max_rejects():
+    stage = RateLimit(max_rate=(5.0, 2.0), max_rejects=3)
+    run(stage, [(0, 50.0, 20.0)])
+    step = [(t, 50.0, 30.0) for t in range(1, 6)]
+    assert run(stage, step) == ['temperature_rate'] * 3 + [(50.0, 30.0)] * 2
+    assert stage.last == (5, 50.0, 30.0)
+    assert stage.rejects == 0
+
+
+def test_ewma_and_kalman_start_at_the_first_sample():
+    for stage in (Ewma(), Kalman()):
+        assert stage.process(0, 50.0, 20.0) == (50.0, 20.0)
+        h, t = stage.process(1, 60.0, 30.0)
+        assert 50.0 < h < 60.0 and 20.0 < t < 30.0
+
+
+def test_pipeline_counts_rejections_by_reason():
+    pipeline = Pipeline([RangeCheck(), RateLimit(max_rate=(5.0, 2.0))], keep_rejects=2)
+    samples = [(0, 50.0, 20.0), (1, 120.0, 20.0), (2, 50.0, 30.0), (3, 51.0, 20.5), (4, 50.0, -50.0)]
+    assert run(pipeline, samples) == [
+        (50.0, 20.0), 'humidity_range', 'temperature_rate', (51.0, 20.5), 'temperature_range']
+    assert pipeline.stats() == {
+        'accepted': 2,
+        'rejected': {'humidity_range': 1, 'temperature_rate': 1, 'temperature_range': 1},
+    }
+    # Only the last keep_rejects, with the values that came in
+    assert list(pipeline.rejects) == [(2, 50.0, 30.0, 'temperature_rate'),
+                                      (4, 50.0, -50.0, 'temperature_range')]
+
+
+def test_pipeline_reports_the_input_not_the_smoothed_value():
+    pipeline = Pipeline([Ewma(0.5), RangeCheck(humidity=(0.0, 60.0))])
+    run(pipeline, [(0, 50.0, 20.0)])
+    with pytest.raises(Reject):
+        pipeline.process(1, 90.0, 20.0)     # Smoothed to 70
+    assert pipeline.rejects[-1] == (1, 90.0, 20.0, 'humidity_range')
+
+
+def test_filter_bank_keeps_one_pipeline_per_sensor():
+    bank = FilterBank()
+    bank.process(23, 0, 50.0, 20.0)
+    bank.process(24, 0, 80.0, 30.0)
+    # A fast change on 23 is judged against 23's own last sample
+    with pytest.raises(Reject):
+        bank.process(23, 1, 80.0, 30.0)
+    assert bank.stats() == {
+        23: {'accepted': 1, 'rejected': {'humidity_rate': 1}},
+        24: {'accepted': 1, 'rejected': {}},
+    }
+    assert len(bank.pipelines[23].stages) == len(default_stages())
@@ -0,0 +1,168 @@
+import logging
+
+import pytest
+
+from history import GENERATION, GENERATION_OFFSET, HEADER_SIZE, RECORD, History, RingFile
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'history.bin')
+
+
+def fill(history, timestamps, sensor_id=23):
+    for t in timestamps:
+        history.append(float(t), sensor_id, 50.0 + t % 10, 20.0)
+
+
+def times(readings):
+    return [r[0] for r in readings]
+
+
+def test_query_bounds_are_inclusive(path):
+    history = History(path, capacity=100, batch_size=1)
+    fill(history, range(10))
+    assert times(history.query(3, 6)) == [3.0, 4.0, 5.0, 6.0]
+    assert times(history.query(2.5, 3.5)) == [3.0]
+    assert history.query(10, 20) == []
+    assert times(history.query(-5, 0)) == [0.0]
+    history.close()
+
+
+def test_query_filters_by_sensor_and_limits(path):
+    history = History(path, capacity=100, batch_size=1)
+    for t in range(10):
+        history.append(float(t), 23 if t % 2 else 24, 50.0, 20.0)
+    assert times(history.query(0, 9, sensor_id=23)) == [1.0, 3.0, 5.0, 7.0, 9.0]
+    assert times(history.query(0, 9, sensor_id=24, limit=2)) == [0.0, 2.0]
+    assert history.query(0, 9, sensor_id=25) == []
+    assert history.query(0, 9, limit=0) == []
+    assert history.query(0, 9, limit=-1) == []
+    history.close()
+
+
+def test_query_returns_readings_with_flags(path):
+    history = History(path, capacity=10, batch_size=1)
+    history.append(1.0, 23, 55, 21.5, flags=2)
+    assert history.query(0, 2) == [(1.0, 23, 55.0, 21.5, 2)]
+    history.close()
+
+
+def test_query_spans_stored_and_pending_records(path):
+    history = History(path, capacity=100, batch_size=5, flush_interval=3600)
+    fill(history, range(8))     # 0-4 written, 5-7 pending
+    assert history.count == 5
+    assert times(history.query(3, 6)) == [3.0, 4.0, 5.0, 6.0]
+    assert times(history.query(6, 100)) == [6.0, 7.0]
+    assert times(history.query(0, 100, limit=6)) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    history.close()
+
+
+def test_ring_wraps_and_keeps_the_newest(path):
+    history = History(path, capacity=8, batch_size=3)
+    fill(history, range(20))
+    history.flush()
+    assert (history.count, history.total) == (8, 20)
+    assert times(history.query(0, 100)) == [float(t) for t in range(12, 20)]
+    # Binary search across the wrap point
+    assert times(history.query(14.5, 17)) == [15.0, 16.0, 17.0]
+    history.close()
+
+
+def test_reopen_continues_where_it_left(path):
+    history = History(path, capacity=8, batch_size=3)
+    fill(history, range(10))
+    history.close()     # Flushes the pending ones
+
+    history = History(path, capacity=8)
+    assert (history.head, history.count, history.total) == (2, 8, 10)
+    fill(history, range(10, 13))
+    history.flush()
+    assert times(history.query(0, 100)) == [float(t) for t in range(5, 13)]
+    history.close()
+
+
+def test_reopen_with_another_capacity_keeps_the_file_size(path, caplog):
+    History(path, capacity=8).close()
+    with caplog.at_level(logging.WARNING, logger='history'):
+        history = History(path, capacity=16)
+    assert history.capacity == 8
+    assert 'holds 8 records, not 16' in caplog.text
+    history.close()
+
+
+def test_wrong_record_size_is_refused(path):
+    History(path, capacity=8).close()
+    with pytest.raises(ValueError):
+        RingFile(path, RECORD.__class__('<dHHfff'), 8)
+
+
+def test_timestamps_stepping_back_are_clamped(path):
+    history = History(path, capacity=10, batch_size=1)
+    fill(history, [10, 11])
+    history.append(5.0, 23, 50.0, 20.0)     # Clock stepped back
+    assert times(history.query(0, 100)) == [10.0, 11.0, 11.0]
+    history.close()
+
+    # The clamp survives a restart
+    history = History(path, capacity=10, batch_size=1)
+    history.append(3.0, 23, 50.0, 20.0)
+    assert times(history.query(0, 100)) == [10.0, 11.0, 11.0, 11.0]
+    history.close()
+
+
+def test_readonly_reader_sees_flushed_batches(path):
+    reader = History(path, readonly=True)
+    assert reader.query(0, 100) == []     # No file yet
+
+    writer = History(path, capacity=8, batch_size=4, flush_interval=3600)
+    fill(writer, range(3))
+    assert reader.query(0, 100) == []     # Still pending in the writer
+    fill(writer, [3])
+    assert times(reader.query(0, 100)) == [0.0, 1.0, 2.0, 3.0]
+
+    fill(writer, range(4, 12))
+    assert times(reader.query(0, 100)) == [float(t) for t in range(4, 12)]
+    writer.close()
+    reader.close()
+
+
+class Racing:
+    """A record struct that lets a writer flush a batch in the middle of a read"""
+
+    def __init__(self, record, race):
+        self.record = record
+        self.size = record.size
+        self.race = race
+
+    def unpack_from(self, buffer, offset):
+        if self.race:
+            self.race.pop()()
+        return self.record.unpack_from(buffer, offset)
+
+
+def test_readonly_reader_retries_reads_overlapping_a_batch(path):
+    writer = History(path, capacity=4, batch_size=2)
+    fill(writer, range(4))
+    reader = History(path, readonly=True)
+    # The next batch overwrites the two oldest records while the reader searches
+    reader.record = Racing(reader.record, [lambda: fill(writer, [4, 5])])
+    assert times(reader.query(0, 100)) == [2.0, 3.0, 4.0, 5.0]
+    writer.close()
+    reader.close()
+
+
+def generation(path):
+    with open(path, 'rb') as f:
+        return GENERATION.unpack_from(f.read(HEADER_SIZE), GENERATION_OFFSET)[0]
+
+
+def test_writer_repairs_a_batch_left_half_written(path):
+    writer = History(path, capacity=4, batch_size=1)
+    fill(writer, range(2))
+    writer._generation += 1      # As if it died in the middle of a batch
+    writer._write_header()
+    writer.close()
+    assert generation(path) == 5
+    History(path, capacity=4).close()
+    assert generation(path) == 6
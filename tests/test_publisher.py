@@ -0,0 +1,216 @@
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+from metrics import PUBLISH_DROPPED
+from publisher import HttpTransport, PublishError, Publisher, Spool, encode
+
+
+def dropped(reason):
+    return PUBLISH_DROPPED.values.get((reason,), 0)
+
+
+def readings(first, count):
+    return [(float(t), 23, 50.0, 20.0) for t in range(first, first + count)]
+
+
+def timestamps(collector):
+    return [json.loads(line)['timestamp'] for line in collector.lines()]
+
+
+def make_publisher(collector, directory, **options):
+    settings = dict(batch_size=10, flush_interval=0.05, drain_rate=100.0, retry_delay=0.05,
+                    max_retry_delay=0.1)
+    settings.update(options)
+    return Publisher(HttpTransport(collector.url, timeout=2.0), Spool(str(directory)), **settings)
+
+
+def test_encode_is_gzipped_ndjson():
+    lines = gzip.decompress(encode(readings(0, 2))).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {'timestamp': 0.0, 'sensor': 23, 'humidity': 50.0, 'temperature': 20.0},
+        {'timestamp': 1.0, 'sensor': 23, 'humidity': 50.0, 'temperature': 20.0},
+    ]
+
+
+def test_spool_is_fifo_and_survives_reopening(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.put(b'first', 1)
+    spool.put(b'second', 2)
+    (tmp_path / '0000000000000002-3.gz.tmp').write_bytes(b'torn')
+
+    spool = Spool(str(tmp_path))
+    assert len(spool) == 2
+    assert spool.bytes == len(b'first') + len(b'second')
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
+    spool.put(b'third', 3)
+    batches = []
+    while spool:
+        batches.append(spool.peek())
+        spool.pop()
+    assert batches == [(b'first', 1), (b'second', 2), (b'third', 3)]
+    assert spool.bytes == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_spool_drops_oldest_past_max_bytes(tmp_path):
+    before = dropped('spool_full')
+    spool = Spool(str(tmp_path), max_bytes=10)
+    spool.put(b'aaaa', 4)
+    spool.put(b'bbbb', 5)
+    spool.put(b'cccc', 6)
+    assert len(spool) == 2
+    assert spool.peek() == (b'bbbb', 5)
+    assert dropped('spool_full') - before == 4
+
+
+def test_spool_keeps_one_batch_larger_than_max_bytes(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=2)
+    spool.put(b'large', 1)
+    assert spool.peek() == (b'large', 1)
+
+
+def test_transport_client_errors_are_not_retried(collector):
+    transport = HttpTransport(collector.url)
+    collector.status = 400
+    with pytest.raises(PublishError) as error:
+        transport.send(encode(readings(0, 1)))
+    assert not error.value.retry
+    for status in (429, 503):
+        collector.status = status
+        with pytest.raises(PublishError) as error:
+            transport.send(encode(readings(0, 1)))
+        assert error.value.retry
+    transport.close()
+
+
+def test_publisher_delivers_batches(collector, tmp_path, wait_for):
+    publisher = make_publisher(collector, tmp_path)
+    publisher.start()
+    for reading in readings(0, 25):
+        publisher.submit(*reading)
+    assert wait_for(lambda: collector.readings == 25)
+    publisher.close()
+    assert timestamps(collector) == [float(t) for t in range(25)]
+    assert publisher.connected
+    assert len(publisher.spool) == 0
+
+
+def test_publisher_drains_spool_in_order_before_new_readings(collector, tmp_path, wait_for):
+    collector.down()
+    publisher = make_publisher(collector, tmp_path)
+    publisher.start()
+    for reading in readings(0, 50):
+        publisher.submit(*reading)
+    assert wait_for(lambda: len(publisher.spool) == 5)
+    assert publisher.connected is False
+
+    collector.up()
+    for reading in readings(50, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: collector.readings == 60)
+    publisher.close()
+    assert timestamps(collector) == [float(t) for t in range(60)]
+    assert len(publisher.spool) == 0
+
+
+def test_publisher_drops_batches_the_collector_rejects(collector, tmp_path, wait_for):
+    before = dropped('rejected')
+    collector.status = 400
+    publisher = make_publisher(collector, tmp_path)
+    publisher.start()
+    for reading in readings(0, 20):
+        publisher.submit(*reading)
+    assert wait_for(lambda: dropped('rejected') - before == 20)
+    assert len(publisher.spool) == 0
+
+    collector.status = 204
+    for reading in readings(20, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: collector.readings == 10)
+    publisher.close()
+    assert timestamps(collector) == [float(t) for t in range(20, 30)]
+
+
+def test_publisher_spools_batches_on_server_errors(collector, tmp_path, wait_for):
+    collector.status = 503
+    publisher = make_publisher(collector, tmp_path)
+    publisher.start()
+    for reading in readings(0, 20):
+        publisher.submit(*reading)
+    assert wait_for(lambda: len(publisher.spool) >= 1)
+
+    collector.status = 204
+    assert wait_for(lambda: collector.readings == 20)
+    publisher.close()
+    assert timestamps(collector) == [float(t) for t in range(20)]
+
+
+def test_full_buffer_drops_are_counted_by_the_sender(collector, tmp_path, wait_for):
+    before = dropped('buffer_full')
+    publisher = make_publisher(collector, tmp_path, buffer_size=5)
+    for reading in readings(0, 8):
+        publisher.submit(*reading)
+    assert publisher.buffer_dropped == 3
+    assert dropped('buffer_full') == before
+
+    publisher.start()
+    assert wait_for(lambda: collector.readings == 5)
+    publisher.close()
+    assert dropped('buffer_full') - before == 3
+
+
+def test_spool_ignores_stray_files(tmp_path):
+    for name in ('notes.gz', 'batch-many.gz', '1-2-3.gz'):
+        (tmp_path / name).write_bytes(b'x')
+    spool = Spool(str(tmp_path))
+    assert len(spool) == 0
+    spool.put(b'first', 1)
+    assert Spool(str(tmp_path)).peek() == (b'first', 1)
+
+
+def test_unspoolable_batches_are_dropped_and_counted(collector, tmp_path, wait_for):
+    before = dropped('spool_error')
+    collector.down()
+    publisher = make_publisher(collector, tmp_path)
+
+    def put(body, readings):
+        raise OSError(28, 'No space left on device')
+    publisher.spool.put = put
+    publisher.start()
+    for reading in readings(0, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: dropped('spool_error') - before == 10)
+
+    collector.up()
+    # Past the retry backoff, the next batch goes straight out
+    time.sleep(0.2)
+    for reading in readings(10, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: collector.readings == 10)
+    publisher.close()
+    assert timestamps(collector) == [float(t) for t in range(10, 20)]
+
+
+def test_sender_survives_unexpected_errors(collector, tmp_path, wait_for):
+    publisher = make_publisher(collector, tmp_path)
+    send, failures = publisher.transport.send, []
+
+    def flaky(body):
+        if not failures:
+            failures.append(body)
+            raise RuntimeError('unexpected')
+        send(body)
+    publisher.transport.send = flaky
+    publisher.start()
+    for reading in readings(0, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: failures)
+    for reading in readings(10, 10):
+        publisher.submit(*reading)
+    assert wait_for(lambda: collector.readings == 10)
+    assert publisher._thread.is_alive()
+    publisher.close()
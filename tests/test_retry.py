@@ -0,0 +1,78 @@
+import pytest
+
+from retry import CLOSED, HALF_OPEN, OPEN, RetryPolicy
+
+
+def policy(**options):
+    settings = dict(retries=2, backoff=1.0, max_backoff=8.0, jitter=0.0, trip_after=3, open_for=10.0)
+    settings.update(options)
+    return RetryPolicy(2.0, label='4', **settings)
+
+
+def delays(policy, phases, now=0.0):
+    return [policy.record(phase, now) for phase in phases]
+
+
+def test_transient_failures_are_retried_at_once_then_back_off():
+    p = policy()
+    assert delays(p, ['checksum', 'bit']) == [2.0, 2.0]
+    assert delays(p, ['checksum'] * 6) == [3.0, 4.0, 6.0, 10.0, 10.0, 10.0]
+    assert p.failures == 8
+    assert p.state == CLOSED
+
+
+def test_other_failures_back_off_from_the_first():
+    p = policy()
+    assert delays(p, ['timeout', 'timeout']) == [3.0, 4.0]
+    # A transient failure is let off `retries` doublings of the streak
+    assert p.record('checksum', 0.0) == 3.0
+
+
+def test_success_resets_the_backoff():
+    p = policy()
+    delays(p, ['timeout'] * 3)
+    assert p.record(None, 0.0) == 2.0
+    assert p.failures == 0
+    assert p.record('checksum', 0.0) == 2.0
+
+
+def test_breaker_trips_after_silent_reads_and_probes(monkeypatch):
+    p = policy()
+    assert delays(p, ['no_response_low', 'no_response_high']) == [3.0, 4.0]
+    assert p.record('no_response_low', 100.0) == 10.0
+    assert p.trips == 1
+    # Probes every open_for, whatever the failure
+    assert delays(p, ['checksum', 'no_response_low'], now=110.0) == [10.0, 10.0]
+    assert p.trips == 1
+
+    monkeypatch.setattr('time.monotonic', lambda: 115.0)
+    assert p.state == OPEN
+    monkeypatch.setattr('time.monotonic', lambda: 120.0)
+    assert p.state == HALF_OPEN
+    assert p.record(None, 120.0) == 2.0
+    assert p.state == CLOSED
+    assert p.silent == 0
+
+
+def test_an_answer_resets_the_silent_count():
+    p = policy()
+    assert delays(p, ['no_response_low', 'no_response_low', 'checksum', 'no_response_low',
+                      'no_response_low']) == [3.0, 4.0, 3.0, 10.0, 10.0]
+    assert p.trips == 0
+
+
+def test_jitter_is_seeded_and_bounded():
+    first = delays(policy(jitter=0.25, seed=1), ['timeout'] * 4)
+    assert first == delays(policy(jitter=0.25, seed=1), ['timeout'] * 4)
+    for delay, backoff in zip(first, [1.0, 2.0, 4.0, 8.0]):
+        assert 2.0 + 0.75 * backoff <= delay <= 2.0 + 1.25 * backoff
+
+
+def test_effective_rate():
+    p = policy()
+    assert p.target_rate == 0.5
+    assert p.effective_rate(0.0) == 0.0
+    for t in range(0, 20, 2):
+        p.record(None if t % 4 else 'checksum', float(t))
+    # 5 of 10 reads good over 18 s plus one interval
+    assert p.effective_rate(18.0) == pytest.approx(5 / 20.0)
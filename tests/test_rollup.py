@@ -0,0 +1,80 @@
+import pytest
+
+from rollup import Rollup, merge
+
+DAY = 86400
+
+
+@pytest.fixture
+def rollup(tmp_path):
+    rollup = Rollup(str(tmp_path))
+    yield rollup
+    rollup.close()
+
+
+def test_pick_resolution_is_the_coarsest_with_enough_points(rollup):
+    assert rollup.pick_resolution(0, 30 * DAY, 20) == 86400
+    assert rollup.pick_resolution(0, 30 * DAY, 500) == 3600
+    assert rollup.pick_resolution(0, 30 * DAY, 2000) == 60
+    # Not even 1-minute buckets give 100 points over an hour
+    assert rollup.pick_resolution(0, 3600, 100) is None
+
+
+def test_pick_resolution_stays_within_max_buckets(rollup):
+    # 43200 1-minute buckets would not fit: the whole range in hours instead
+    assert rollup.pick_resolution(0, 30 * DAY, 2000, max_buckets=10000) == 3600
+    assert rollup.pick_resolution(0, 30 * DAY, 40000, max_buckets=10000) == 3600
+    assert rollup.pick_resolution(0, 5 * DAY, 2000, max_buckets=10000) == 60
+    # Even days are too many: the coarsest resolution
+    assert rollup.pick_resolution(0, 100 * DAY, 20, max_buckets=50) == 86400
+
+
+def test_buckets_aggregate_readings(rollup):
+    rollup.add(0.0, 23, 50.0, 20.0)
+    rollup.add(30.0, 23, 54.0, 22.0)
+    rollup.add(45.0, 24, 60.0, 25.0)
+    rollup.add(60.0, 23, 40.0, 21.0)
+    assert rollup.query(60, 0, 120) == [
+        (0.0, 23, 2, 50.0, 54.0, 52.0, 20.0, 22.0, 21.0),
+        (0.0, 24, 1, 60.0, 60.0, 60.0, 25.0, 25.0, 25.0),
+        (60.0, 23, 1, 40.0, 40.0, 40.0, 21.0, 21.0, 21.0),
+    ]
+    assert [r[:3] for r in rollup.query(3600, 0, 3600)] == [(0.0, 23, 3), (0.0, 24, 1)]
+    assert [r[:3] for r in rollup.query(60, 0, 120, sensor_id=24)] == [(0.0, 24, 1)]
+
+
+def test_query_includes_the_open_bucket_only_in_range(rollup):
+    rollup.add(0.0, 23, 50.0, 20.0)
+    rollup.add(125.0, 23, 50.0, 20.0)     # Closes 0, opens 120
+    assert [r[0] for r in rollup.query(60, 0, 200)] == [0.0, 120.0]
+    # A range ending before the open bucket starts leaves it out
+    assert [r[0] for r in rollup.query(60, 0, 100)] == [0.0]
+    # A range starting inside the open bucket includes it
+    assert [r[0] for r in rollup.query(60, 150, 200)] == [120.0]
+    assert rollup.query(60, 200, 300) == []
+
+
+def test_query_limit_reads_only_the_oldest_buckets(rollup):
+    for minute in range(10):
+        rollup.add(minute * 60.0, 23, 50.0, 20.0)
+    assert [r[0] for r in rollup.query(60, 0, 600, limit=3)] == [0.0, 60.0, 120.0]
+    assert len(rollup.query(60, 0, 600)) == 10
+
+
+def test_bucket_split_by_a_restart_is_merged(tmp_path):
+    rollup = Rollup(str(tmp_path))
+    rollup.add(0.0, 23, 50.0, 20.0)
+    rollup.close()      # Persists the partial bucket
+
+    rollup = Rollup(str(tmp_path))
+    rollup.add(30.0, 23, 60.0, 30.0)
+    rollup.add(40.0, 23, 70.0, 40.0)
+    assert rollup.query(60, 0, 60) == [(0.0, 23, 3, 50.0, 70.0, 60.0, 20.0, 40.0, 30.0)]
+    rollup.close()
+
+
+def test_merge_weights_means_by_count():
+    a = (0.0, 23, 1, 50.0, 50.0, 50.0, 20.0, 20.0, 20.0)
+    b = (0.0, 23, 3, 40.0, 80.0, 70.0, 10.0, 30.0, 24.0)
+    assert merge(a, b) == (0.0, 23, 4, 40.0, 80.0, 65.0, 10.0, 30.0, 23.0)
+    assert merge(b, a) == merge(a, b)
@@ -0,0 +1,67 @@
+import threading
+import time
+
+from fake_lgpio import FakeLgpio, frame_edges
+from scheduler import Scheduler
+from sensor import DHT11
+
+PINS = (4, 17, 27)
+INTERVAL = 0.2
+
+
+def make_sensors(gpio):
+    """Sensors on PINS sharing one chip handle, each answering every start pulse"""
+    handle = gpio.gpiochip_open(0)
+    sensors = []
+    for pin in PINS:
+        sensor = DHT11(pin, gpio=gpio, h=handle)
+        sensor.min_interval = INTERVAL
+        gpio.load_trace(pin, frame_edges(bytes([50, 0, pin, 0, 50 + pin])), repeat=True)
+        sensors.append(sensor)
+    return handle, sensors
+
+
+def run(scheduler, duration):
+    windows = []
+    scheduler.on_result = lambda sensor, h, t: windows.append(
+        (sensor.pin, sensor.starts[-1], time.monotonic()))
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    threading.Event().wait(duration)
+    scheduler.stop()
+    thread.join()
+    return windows
+
+
+def check(windows):
+    # Every sensor read, none more often than its minimum interval
+    for pin in PINS:
+        starts = [start for p, start, _ in windows if p == pin]
+        assert len(starts) >= 3
+        assert all(b - a >= INTERVAL for a, b in zip(starts, starts[1:]))
+    # One capture at a time, on the shared handle
+    windows.sort(key=lambda w: w[1])
+    assert all(a[2] <= b[1] for a, b in zip(windows, windows[1:]))
+
+
+def test_sensors_on_one_handle_are_read_in_turn():
+    gpio = FakeLgpio()
+    handle, sensors = make_sensors(gpio)
+    scheduler = Scheduler(sensors)
+    windows = run(scheduler, 1.0)
+    check(windows)
+    assert {snapshot.temperature for snapshot in scheduler.store.snapshots().values()} == set(PINS)
+    assert {call[1] for call in gpio.calls if call[0] == 'gpio_write'} == {handle}
+
+
+def test_added_sensors_are_staggered():
+    gpio = FakeLgpio()
+    _, sensors = make_sensors(gpio)
+    scheduler = Scheduler([])
+    for sensor in sensors:
+        scheduler.add(sensor)
+    windows = run(scheduler, 1.0)
+    check(windows)
+    # The first start pulses are spread out, not back to back
+    first = sorted(min(start for p, start, _ in windows if p == pin) for pin in PINS)
+    assert all(b - a >= INTERVAL / len(PINS) * 0.9 for a, b in zip(first, first[1:]))
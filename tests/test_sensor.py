@@ -0,0 +1,113 @@
+import threading
+import time
+
+import pytest
+
+from fake_lgpio import FakeLgpio, frame_edges
+from sensor import DHT11, DHT22
+
+PIN = 4
+
+
+def with_checksum(*data):
+    return bytes(data) + bytes([sum(data) & 0xFF])
+
+
+class LateLgpio(FakeLgpio):
+    """Delivers each frame delay seconds late, as a loaded system does"""
+
+    delay = 0.03
+
+    def _replay(self, handle, gpio, edges, base):
+        threading.Timer(self.delay, super()._replay, (handle, gpio, edges, base)).start()
+
+
+@pytest.fixture
+def gpio():
+    return FakeLgpio()
+
+
+def make_sensor(gpio, model=DHT11):
+    """A sensor on PIN; load traces after this, as bring-up answers a start pulse"""
+    sensor = model(PIN, gpio=gpio)
+    # No waiting between reads of a replayed trace
+    sensor.min_interval = 0.0
+    return sensor
+
+
+def test_read_round_trip(gpio):
+    with make_sensor(gpio) as sensor:
+        gpio.load_trace(PIN, frame_edges(with_checksum(55, 0, 24, 3)))
+        gpio.load_trace(PIN, frame_edges(with_checksum(56, 0, 0, 0x80 | 2)))
+        assert sensor.read() == (55.0, 24.3)
+        assert sensor.last_phase is None
+        assert sensor.last_error is None
+        assert sensor.read() == (56.0, -0.2)
+        assert (sensor.humidity, sensor.temperature) == (56.0, -0.2)
+        assert sensor.timing['kernel_calls'] >= 0
+
+
+def test_dht22_round_trip(gpio):
+    with make_sensor(gpio, DHT22) as sensor:
+        gpio.load_trace(PIN, frame_edges(with_checksum(0x02, 0x8C, 0x80, 0x65)))
+        assert sensor.read() == (65.2, -10.1)
+
+
+def test_bad_checksum_is_a_failed_read(gpio):
+    data = bytearray(with_checksum(55, 0, 24, 3))
+    data[4] ^= 1
+    with make_sensor(gpio) as sensor:
+        gpio.load_trace(PIN, frame_edges(data))
+        assert sensor.read() == (None, None)
+        assert sensor.last_phase == 'checksum'
+        assert sensor.humidity is None
+
+
+def test_no_response(gpio):
+    with make_sensor(gpio) as sensor:
+        assert sensor.read() == (None, None)
+        assert sensor.last_phase == 'no_response_low'
+
+
+def test_truncated_frame(gpio):
+    with make_sensor(gpio) as sensor:
+        gpio.load_trace(PIN, frame_edges(with_checksum(55, 0, 24, 3))[:3 + 2 * 12])
+        assert sensor.read() == (None, None)
+        assert sensor.last_phase == 'bit'
+
+
+def test_close_releases_pin_and_handle(gpio):
+    sensor = make_sensor(gpio)
+    sensor.close()
+    assert ('gpio_free', sensor.h, PIN) in gpio.calls
+    assert ('gpiochip_close', sensor.h) in gpio.calls
+
+
+def test_all_zero_frame_is_rejected(gpio):
+    # Only short pulses: zeros with a checksum that matches
+    with make_sensor(gpio) as sensor:
+        gpio.load_trace(PIN, frame_edges(bytes(5)))
+        assert sensor.read() == (None, None)
+        assert sensor.last_phase == 'empty'
+        assert sensor.humidity is None
+
+
+def test_late_edges_still_decode():
+    gpio = LateLgpio()
+    with make_sensor(gpio) as sensor:
+        gpio.load_trace(PIN, frame_edges(with_checksum(55, 0, 24, 3)))
+        assert sensor.read() == (55.0, 24.3)
+        # Edges arriving after the deadline are lost
+        sensor.capture_timeout = 0.01
+        gpio.load_trace(PIN, frame_edges(with_checksum(55, 0, 24, 3)))
+        assert sensor.read() == (None, None)
+        assert sensor.last_phase == 'no_response_low'
+
+
+def test_capture_returns_once_the_frame_is_complete(gpio):
+    with make_sensor(gpio) as sensor:
+        sensor.capture_timeout = 5.0
+        gpio.load_trace(PIN, frame_edges(with_checksum(55, 0, 24, 3)))
+        start = time.monotonic()
+        assert sensor.read() == (55.0, 24.3)
+        assert time.monotonic() - start < 1.0
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+import shared
+from acquisition import READY, STARTING, STOPPED
+from shared import SharedAcquisition, SharedRecord, SharedWriter, decode, encode
+from store import LatestStore, Snapshot
+
+
+class StandInAcquisition:
+    """What SharedWriter reads of an Acquisition"""
+
+    def __init__(self):
+        self.store = LatestStore()
+        self.state = READY
+
+    def details(self):
+        return {'status': {'error': None, 'sensors': {}}}
+
+    def metrics(self):
+        return 'dht_reads_total 1\n'
+
+
+@pytest.fixture
+def name():
+    return f'dht-test-{os.getpid()}'
+
+
+def test_codec_round_trip():
+    snapshots = {
+        4: Snapshot(50.0, 21.5, 1000.0, 7, 4),
+        17: Snapshot(None, None, None, 3, 17, 'no response'),
+    }
+    epoch, store_seq, state, written, decoded, details = decode(
+        encode(123, 9, READY, snapshots, {'a': 1}))
+    assert (epoch, store_seq, state, details) == (123, 9, READY, b'{"a":1}')
+    assert [(s.sensor_id, s.humidity, s.temperature, s.timestamp, s.seq, s.error)
+            for s in decoded.values()] == [(4, 50.0, 21.5, 1000.0, 7, None),
+                                           (17, None, None, None, 3, 'no response')]
+
+
+def test_long_errors_are_cut_to_the_slot():
+    error = 'x' + 'é' * 60      # 121 bytes of UTF-8
+    snapshot = Snapshot(None, None, None, 1, 4, error)
+    decoded = decode(encode(1, 1, READY, {4: snapshot}, {}))[4][4]
+    # Cut to 96 bytes, in the middle of a character, which is replaced
+    assert decoded.error == 'x' + 'é' * 47 + '\ufffd'
+
+
+def test_record_readers_see_whole_writes(name):
+    writer = SharedRecord(name, create=True, size=4096)
+    reader = SharedRecord(name)
+    assert reader.read() is None
+    writer.write(b'first')
+    writer.write(b'second')
+    assert reader.read() == (4, b'second')
+    assert reader.sequence() == 4
+    with pytest.raises(ValueError):
+        writer.write(b'x' * 4096)
+    reader.close()
+    writer.close()
+
+
+def test_reader_follows_the_writer_and_its_successor(name, wait_for, monkeypatch):
+    monkeypatch.setattr(shared, 'HEARTBEAT_TIMEOUT', 0.3)
+    updates = []
+    reader = SharedAcquisition(name, on_update=lambda: updates.append((reader.epoch, reader.seq)), poll_interval=0.01)
+    reader.start()
+    assert reader.state == STARTING
+
+    acquisition = StandInAcquisition()
+    writer = SharedWriter(acquisition, name)
+    acquisition.store.publish(4, 50.0, 20.0)
+    writer.publish()
+    assert wait_for(lambda: reader.seq == 1)
+    assert reader.get(4).humidity == 50.0
+    assert reader.status()['state'] == READY
+    assert reader.metrics() == 'dht_reads_total 1\n'
+
+    # The writer dies; its successor starts a new store
+    writer.close()
+    assert wait_for(lambda: reader.state == STOPPED)
+    successor = StandInAcquisition()
+    writer = SharedWriter(successor, name)
+    successor.store.publish(4, 60.0, 21.0)
+    writer.publish()
+    assert wait_for(lambda: reader.epoch == successor.store.epoch)
+    assert reader.get(4).humidity == 60.0
+    assert updates[0] == (acquisition.store.epoch, 1)
+    assert updates[-1] == (successor.store.epoch, 1)
+    reader.close()
+    writer.close()
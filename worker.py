@@ -0,0 +1,154 @@
+"""Acquisition in a process of its own
+
+The sensors are read in a separate process, optionally pinned to CPUs
+and scheduled SCHED_FIFO, so HTTP requests, template rendering and GC
+pauses in the web process never compete with a capture for the GIL.
+Readings reach the web processes through a shared.SharedRecord, and
+the history and rollup files are written here only.
+
+Run it on its own for a multi-worker web server:
+    python worker.py
+    DHT_ACQUISITION=attach gunicorn -w 4 'app:create_app()'
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+
+from acquisition import Acquisition
+from alerts import AlertEngine, Webhook
+from filters import FilterBank
+from history import DEFAULT_CAPACITY, History
+from logs import setup_logging
+from publisher import Publisher
+from rollup import Rollup
+from shared import DEFAULT_NAME, SharedWriter
+
+log = logging.getLogger(__name__)
+
+# How often the record is rewritten without new readings (state, metrics, heartbeat)
+REFRESH_INTERVAL = 1.0
+
+
+def set_realtime(cpus=None, priority=0):
+    """Pin this process to cpus and switch it to SCHED_FIFO at priority
+
+    Both are best effort: without permission (SCHED_FIFO needs root or
+    CAP_SYS_NICE) the process keeps the normal scheduler.
+    """
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+            log.info("Acquisition pinned to CPU %s", ', '.join(map(str, sorted(cpus))))
+        except (AttributeError, OSError) as e:
+            log.warning("Cannot set CPU affinity: %s", e)
+    if priority:
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            log.info("Acquisition running SCHED_FIFO at priority %d", priority)
+        except (AttributeError, OSError) as e:
+            log.warning("SCHED_FIFO not permitted, using the default scheduler: %s", e)
+
+
+def parse_cpus(value):
+    """'2,3' -> {2, 3}; empty -> None"""
+    cpus = {int(cpu) for cpu in value.split(',') if cpu.strip()}
+    return cpus or None
+
+
+def run(pins, history_path, capacity=DEFAULT_CAPACITY, name=DEFAULT_NAME, cpus=None, priority=0,
+        stop=None, log_level=None):
+    """Read the sensors on pins and publish to the shared record until stop is set"""
+    listener = setup_logging(log_level) if log_level is not None else None
+    stop = stop if stop is not None else threading.Event()
+    set_realtime(cpus, priority)
+
+    directory = os.path.dirname(os.path.abspath(history_path))
+    history = History(history_path, capacity)
+    rollup = Rollup(directory)
+    # Sends readings to DHT_COLLECTOR_URL if set
+    publisher = Publisher.from_env(directory)
+
+    def on_result(sensor, humidity, temperature):
+        if humidity is not None and temperature is not None:
+            log.info("GPIO%d: Temperature: %s°C, Humidity: %s%%", sensor.pin, temperature, humidity)
+            history.append(sensor.last_reading, sensor.pin, humidity, temperature)
+            rollup.add(sensor.last_reading, sensor.pin, humidity, temperature)
+            if publisher is not None:
+                publisher.submit(sensor.last_reading, sensor.pin, humidity, temperature)
+        else:
+            log.warning("GPIO%d: Failed to get reading", sensor.pin)
+        writer.publish()
+
+    # Sends alert changes to DHT_ALERT_WEBHOOK if set
+    alerts = AlertEngine()
+    webhook = Webhook.from_env()
+    if webhook is not None:
+        alerts.subscribe(webhook)
+    acquisition = Acquisition(pins, on_result, filters=FilterBank(), alerts=alerts)
+    writer = SharedWriter(acquisition, name)
+    try:
+        writer.publish()
+        if publisher is not None:
+            publisher.start()
+        if webhook is not None:
+            webhook.start()
+        acquisition.start()
+        while not stop.wait(REFRESH_INTERVAL):
+            writer.publish()
+    finally:
+        acquisition.close()
+        if publisher is not None:
+            publisher.close()
+        if webhook is not None:
+            webhook.close()
+        writer.publish()    # Final state: stopped
+        writer.close()
+        history.close()
+        rollup.close()
+        if listener is not None:
+            listener.stop()
+
+
+def _child(*args):
+    # Ctrl-C reaches the whole process group; the parent stops us through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run(*args)
+
+
+class AcquisitionProcess:
+    """run() in a child process, started from the web process"""
+
+    def __init__(self, pins, history_path, capacity=DEFAULT_CAPACITY, name=DEFAULT_NAME,
+                 cpus=None, priority=0):
+        # A fresh interpreter: no threads or locks inherited from the web process
+        context = multiprocessing.get_context('spawn')
+        self._stop = context.Event()
+        self.process = context.Process(
+            target=_child, name='dht-acquisition', daemon=True,
+            args=(list(pins), history_path, capacity, name, cpus, priority, self._stop,
+                  logging.getLogger().getEffectiveLevel()))
+
+    def start(self):
+        self.process.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+
+if __name__ == '__main__':
+    from app import (ACQUISITION_CPUS, ACQUISITION_PRIORITY, HISTORY_CAPACITY, HISTORY_PATH,
+                     SENSOR_PINS, SHARED_NAME)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+    run(SENSOR_PINS, HISTORY_PATH, HISTORY_CAPACITY, SHARED_NAME,
+        ACQUISITION_CPUS, ACQUISITION_PRIORITY,
+        stop=stop,
+        log_level=os.environ.get('DHT_LOG_LEVEL', 'INFO').upper())